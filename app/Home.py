@@ -12,6 +12,9 @@ import streamlit as st
 from database.db import init_db, get_user_by_email
 from auth.auth import login_user, register_user, is_logged_in, logout_user, get_last_login_email, set_last_login_email
 from app.styles import PROFESSIONAL_CSS
+from app.debug_panel import render_query_debug_panel
+from database import instrumentation
+from app import profiler
 
 # set_page_config debe ser la primera llamada a Streamlit (requisito de Streamlit)
 st.set_page_config(
@@ -22,6 +25,10 @@ st.set_page_config(
     menu_items={"Get help": None, "Report a Bug": None, "About": None},
 )
 st.markdown(PROFESSIONAL_CSS, unsafe_allow_html=True)
+# Totales de consultas SQL por rerun (panel de depuración: ?debug=db o ALPHAWHEEL_DB_DEBUG=1)
+instrumentation.begin_rerun()
+# Perfil por tramos del rerun (cascada al pie: ?debug=profile o ALPHAWHEEL_PROFILE=1)
+profiler.begin_rerun("cockpit")
 
 try:
     init_db()
@@ -101,4 +108,8 @@ if not is_logged_in():
 
 # Usuario logueado: cargar cockpit principal
 from app.cockpit import run
-run()
+try:
+    run()
+finally:
+    profiler.render_profile_waterfall()
+    render_query_debug_panel()
@@ -0,0 +1,224 @@
+# AlphaWheel Pro - Lecturas cacheadas (Tradier y datos de la cuenta) sin UI
+# Módulo ligero: main_app y el screener lo importan sin cargar el cockpit completo.
+import requests
+import streamlit as st
+
+from app import profiler
+from business.wheel import get_position_summary
+from dashboard import PnlAtExpiry, option_symbols, pnl_at_expiry
+from database.db import get_trades_by_account
+from providers.tradier import fetch_quotes, quote_mid
+import config
+
+# Cache Tradier: TTL largo (30 min) y opcionalmente compartido entre usuarios (mismo ticker = caché único)
+_TRADIER_CACHE_TTL = 1800  # 30 minutos
+_TRADIER_SHARED_TTL = 1800  # 30 min para caché compartido (keyed solo por symbol/api_base)
+
+def _get_shared_tradier_token():
+    return getattr(config, "get_shared_tradier_token", lambda: "")()
+
+
+@st.cache_data(ttl=_TRADIER_SHARED_TTL, show_spinner=False)
+def _shared_tradier_quote(symbol: str, api_base: str) -> dict:
+    """Caché compartida por ticker: cualquier usuario que consulte el mismo ticker reutiliza el resultado."""
+    token = _get_shared_tradier_token()
+    if not (symbol and token and api_base):
+        return {}
+    try:
+        r = requests.get(
+            f"{api_base}markets/quotes",
+            params={"symbols": symbol},
+            headers={"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"},
+            timeout=10,
+        )
+        return r.json() or {}
+    except Exception:
+        return {}
+
+
+@st.cache_data(ttl=_TRADIER_SHARED_TTL, show_spinner=False)
+def _shared_tradier_expirations(symbol: str, api_base: str) -> dict:
+    """Caché compartida por ticker para expiraciones."""
+    token = _get_shared_tradier_token()
+    if not (symbol and token and api_base):
+        return {}
+    try:
+        r = requests.get(
+            f"{api_base}markets/options/expirations",
+            params={"symbol": symbol},
+            headers={"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"},
+            timeout=10,
+        )
+        return r.json() or {}
+    except Exception:
+        return {}
+
+
+@st.cache_data(ttl=_TRADIER_SHARED_TTL, show_spinner=False)
+def _shared_tradier_chain(symbol: str, expiration: str, api_base: str) -> dict:
+    """Caché compartida por ticker + expiración para cadenas de opciones."""
+    token = _get_shared_tradier_token()
+    if not (symbol and expiration and token and api_base):
+        return {}
+    try:
+        r = requests.get(
+            f"{api_base}markets/options/chains",
+            params={"symbol": symbol, "expiration": expiration, "greeks": "true"},
+            headers={"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"},
+            timeout=10,
+        )
+        return r.json() or {}
+    except Exception:
+        return {}
+
+
+@st.cache_data(ttl=_TRADIER_CACHE_TTL, show_spinner=False)
+def _cached_tradier_quote(symbol: str, api_base: str, token: str) -> dict:
+    if not (symbol and token):
+        return {}
+    try:
+        r = requests.get(
+            f"{api_base}markets/quotes",
+            params={"symbols": symbol},
+            headers={"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"},
+            timeout=10,
+        )
+        return r.json() or {}
+    except Exception:
+        return {}
+
+
+@st.cache_data(ttl=_TRADIER_CACHE_TTL, show_spinner=False)
+def _cached_tradier_expirations(symbol: str, api_base: str, token: str) -> dict:
+    if not (symbol and token):
+        return {}
+    try:
+        r = requests.get(
+            f"{api_base}markets/options/expirations",
+            params={"symbol": symbol},
+            headers={"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"},
+            timeout=10,
+        )
+        return r.json() or {}
+    except Exception:
+        return {}
+
+
+@st.cache_data(ttl=_TRADIER_CACHE_TTL, show_spinner=False)
+def _cached_tradier_chain(symbol: str, expiration: str, api_base: str, token: str) -> dict:
+    if not (symbol and expiration and token):
+        return {}
+    try:
+        r = requests.get(
+            f"{api_base}markets/options/chains",
+            params={"symbol": symbol, "expiration": expiration, "greeks": "true"},
+            headers={"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"},
+            timeout=10,
+        )
+        return r.json() or {}
+    except Exception:
+        return {}
+
+
+def get_tradier_quote_cached(symbol: str, api_base: str, token: str) -> dict:
+    """Devuelve cotización: primero caché compartida (si hay token compartido), sino caché por usuario."""
+    if _get_shared_tradier_token():
+        out = _shared_tradier_quote(symbol, api_base)
+        if out:
+            return out
+    return _cached_tradier_quote(symbol, api_base, token or "")
+
+
+def get_tradier_expirations_cached(symbol: str, api_base: str, token: str) -> dict:
+    """Devuelve expiraciones: primero caché compartida, sino por usuario."""
+    if _get_shared_tradier_token():
+        out = _shared_tradier_expirations(symbol, api_base)
+        if out:
+            return out
+    return _cached_tradier_expirations(symbol, api_base, token or "")
+
+
+def get_tradier_chain_cached(symbol: str, expiration: str, api_base: str, token: str) -> dict:
+    """Devuelve cadena de opciones: primero caché compartida, sino por usuario."""
+    if _get_shared_tradier_token():
+        out = _shared_tradier_chain(symbol, expiration, api_base)
+        if out:
+            return out
+    return _cached_tradier_chain(symbol, expiration, api_base, token or "")
+
+
+@st.cache_data(ttl=_TRADIER_SHARED_TTL, show_spinner=False)
+def _shared_tradier_quotes(symbols: tuple, api_base: str) -> dict:
+    """Caché compartida de cotizaciones en lote (tickers y opciones OCC), keyed por la tupla ordenada de símbolos."""
+    return fetch_quotes(symbols, api_base, _get_shared_tradier_token())
+
+
+@st.cache_data(ttl=_TRADIER_CACHE_TTL, show_spinner=False)
+def _cached_tradier_quotes(symbols: tuple, api_base: str, token: str) -> dict:
+    return fetch_quotes(symbols, api_base, token)
+
+
+def get_tradier_quotes_cached(symbols, api_base: str, token: str) -> dict:
+    """
+    Cotizaciones de varios símbolos en peticiones de hasta 100 (providers.tradier.fetch_quotes) en lugar de una
+    petición por símbolo. Devuelve {SÍMBOLO: quote}; primero caché compartida y, para los símbolos que la cuenta
+    compartida no devuelve (p. ej. opciones sin permiso de datos), caché por usuario con su token.
+    """
+    key = tuple(sorted({(s or "").strip().upper() for s in symbols} - {""}))
+    if not key:
+        return {}
+    if _get_shared_tradier_token():
+        out = _shared_tradier_quotes(key, api_base)
+        missing = tuple(s for s in key if s not in out)
+        if not (missing and token):
+            return out
+        return {**out, **_cached_tradier_quotes(missing, api_base, token)}
+    return _cached_tradier_quotes(key, api_base, token or "")
+
+
+def get_market_quotes(tickers, summaries, token: str, environment: str = "sandbox") -> tuple:
+    """
+    Precios de mercado del dashboard en una sola tanda de peticiones: subyacentes y opciones vendidas abiertas
+    (símbolos OCC de summaries). Devuelve (mkt_prices {ticker: last}, option_marks {OCC: medio bid/ask},
+    leg_symbols). Sin token o sin cotización: precio 0.0 y la opción queda fuera de option_marks (valor intrínseco).
+    """
+    tickers = list(tickers)
+    leg_symbols = [sym for sym in option_symbols(summaries) if sym]
+    mkt_prices = {t: 0.0 for t in tickers}
+    option_marks = {}
+    with profiler.span(f"http: cotizaciones Tradier ({len(tickers)} tickers + {len(leg_symbols)} opciones)"):
+        if token:
+            api_base = "https://api.tradier.com/v1/" if (environment or "").lower() == "prod" else "https://sandbox.tradier.com/v1/"
+            quotes = get_tradier_quotes_cached(tickers + leg_symbols, api_base, token)
+            for t in tickers:
+                mkt_prices[t] = float((quotes.get(t.strip().upper()) or {}).get("last") or 0)
+            for sym in leg_symbols:
+                mid = quote_mid(quotes.get(sym))
+                if mid is not None:
+                    option_marks[sym] = mid
+    return mkt_prices, option_marks, leg_symbols
+
+
+# --- Datos de la cuenta cacheados por versión (db.get_data_version): sin TTL, exactos tras cada escritura ---
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_position_summary_cached(account_id: int, data_version: int) -> list:
+    """Resumen de posiciones; se recalcula solo cuando cambia la versión de datos de la cuenta."""
+    return get_position_summary(account_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_open_trades_cached(account_id: int, data_version: int) -> list:
+    """Trades abiertos de la cuenta; se releen solo cuando cambia la versión de datos."""
+    return get_trades_by_account(account_id, status="OPEN")
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_ticker_trades_cached(account_id: int, ticker: str, data_version: int) -> list:
+    """Historial de trades de un ticker (orden cronológico) para el panel de campaña; por versión de datos."""
+    return sorted(get_trades_by_account(account_id, ticker=ticker), key=lambda x: (x.get("trade_date") or "", x.get("trade_id") or 0))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def get_pnl_at_expiry_cached(account_id: int, data_version: int, prices: tuple) -> PnlAtExpiry:
+    """Matriz P&L al vencimiento de todas las posiciones abiertas (Radiografía P&L); por versión de datos y precios."""
+    return pnl_at_expiry(get_position_summary_cached(account_id, data_version), dict(prices))
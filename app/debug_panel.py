@@ -0,0 +1,46 @@
+# AlphaWheel Pro - Panel de depuración: consultas SQL del rerun actual
+# Activación: variable de entorno ALPHAWHEEL_DB_DEBUG=1 o parámetro de URL ?debug=db
+import os
+
+import streamlit as st
+
+from database import instrumentation
+
+
+def db_debug_enabled() -> bool:
+    """True si el panel de consultas está activado (entorno o query param)."""
+    if (os.environ.get("ALPHAWHEEL_DB_DEBUG") or "").strip().lower() in ("1", "true", "yes", "on"):
+        return True
+    try:
+        flags = st.query_params.get_all("debug")
+    except Exception:
+        return False
+    return any(f.strip().lower() in ("db", "all", "1") for v in flags for f in str(v).split(","))
+
+
+def render_query_debug_panel(top_n: int = 20) -> None:
+    """Totales del rerun (consultas, ms, filas) y las top_n consultas por tiempo total, agrupadas por SQL y origen."""
+    if not db_debug_enabled():
+        return
+    stats = instrumentation.current_stats()
+    with st.expander(f"🛠️ Consultas SQL de este rerun — {stats.count} consultas · {stats.total_ms:,.1f} ms", expanded=False):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Consultas", f"{stats.count:,}")
+        c2.metric("Tiempo BD", f"{stats.total_ms:,.1f} ms")
+        c3.metric("Filas", f"{stats.rows:,}")
+        c4.metric("Consultas distintas", f"{len(stats.by_query):,}")
+        st.caption(
+            f"Log de consultas lentas: ≥ {instrumentation.slow_query_threshold_ms():,.0f} ms "
+            "(logger `alphawheel.db`, umbral ALPHAWHEEL_SLOW_QUERY_MS)."
+        )
+        top = stats.top(top_n)
+        if not top:
+            st.caption("Sin consultas en este rerun.")
+            return
+        import pandas as pd  # solo con el panel activo: la página de login no carga pandas
+
+        df = pd.DataFrame(top)[["count", "total_ms", "max_ms", "rows", "site", "sql"]]
+        df["total_ms"] = df["total_ms"].round(2)
+        df["max_ms"] = df["max_ms"].round(2)
+        df.columns = ["Veces", "Total ms", "Máx ms", "Filas", "Origen", "SQL"]
+        st.dataframe(df, width="stretch", hide_index=True)
@@ -3,8 +3,13 @@
 Gráfico tipo medidor (Gauge) para "Análisis del riesgo": Favorable / Desfavorable,
 Ganando / Perdiendo. Estilo "reloj futurista" con líneas radiales de métricas.
 """
+import copy
+import html
 import math
+from functools import lru_cache
+
 import plotly.graph_objects as go
+import plotly.io as pio
 
 
 def risk_analysis_score(
@@ -224,7 +229,50 @@ def build_gauge_price_axis(
     Medidor según boceto: semicírculo con escala, tres agujas (Strike, BE, Precio),
     DTE en el centro y caja de estado (Favorable / Evaluar / Desfavorable).
     Colores sutiles que no resaltan en fondo oscuro.
+    Memoizado por (strike, be, precio a céntimos, dte, estado, título): la figura devuelta se comparte entre
+    llamadas y no debe modificarse (st.plotly_chart la copia con to_dict al serializar).
     """
+    return _price_axis_gauge(_round_price(strike), _round_price(be), _round_price(precio), dte, status_label, title)
+
+
+# --- Fábrica de gauges: plantilla estática una vez por proceso; por llamada solo agujas, escala y textos ---
+# El template plotly_dark completo son ~7 KB de cada figura serializada; un gauge solo usa fuente, fondos, hover,
+# valores por defecto de anotaciones/formas y, en el polar, su eje y la traza scatterpolar. Se copian solo esas claves.
+_GAUGE_TEMPLATE_LAYOUT_KEYS = (
+    "annotationdefaults",
+    "colorway",
+    "font",
+    "hoverlabel",
+    "hovermode",
+    "paper_bgcolor",
+    "plot_bgcolor",
+    "shapedefaults",
+    "title",
+)
+
+
+def _gauge_template(extra_layout: tuple[str, ...] = (), traces: tuple[str, ...] = ()) -> dict:
+    """Subconjunto de plotly_dark con las claves de layout y los tipos de traza que dibuja un gauge."""
+    base = pio.templates["plotly_dark"].to_plotly_json()
+    layout = base.get("layout", {})
+    data = base.get("data", {})
+    return {
+        "layout": {k: layout[k] for k in _GAUGE_TEMPLATE_LAYOUT_KEYS + extra_layout if k in layout},
+        "data": {t: data[t] for t in traces if t in data},
+    }
+
+
+def _round_price(value: float | None) -> float | None:
+    return round(float(value), 2) if value is not None else None
+
+
+# Bandas del arco (pérdida / breakeven / ganancia) y colores de las agujas, compartidos por Plotly y SVG
+_ZONE_COLORS = ("rgba(200,80,80,0.5)", "rgba(180,160,80,0.5)", "rgba(80,180,100,0.5)")
+_NEEDLE_COLORS = {"Strike": "#ff9f43", "BE": "#dfe6e9", "Precio": "#00d2d3"}
+
+
+def _price_axis_scale(strike: float | None, be: float | None, precio: float | None, status_label: str) -> dict:
+    """Escala del medidor de precios: rango con margen, posiciones 0-100 de cada aguja, etiquetas y colores del estado."""
     # Eje de precios: rango con margen
     vals = [v for v in (strike, be, precio) if v is not None and v > 0]
     if not vals:
@@ -235,10 +283,6 @@ def build_gauge_price_axis(
         min_val = mn - margin
         max_val = mx + margin
 
-    pos_strike = _price_axis_position(strike or 0, min_val, max_val)
-    pos_be = _price_axis_position(be or 0, min_val, max_val)
-    pos_precio = _price_axis_position(precio or 0, min_val, max_val)
-
     # Zonas sutiles (no resaltan en oscuro)
     if status_label.lower().startswith("fav"):
         zone_color = "#3d6b4a"  # verde muy suave
@@ -255,42 +299,77 @@ def build_gauge_price_axis(
         return min_val + (pos / 100.0) * (max_val - min_val)
 
     tickvals = [0, 25, 50, 75, 100]
-    ticktext = [f"{price_at(p):.0f}" for p in tickvals]
-
-    # Zonas con contraste frente al fondo oscuro
-    pos_be_clamp = max(1.0, min(99.0, pos_be))
-    steps_zones = [
-        {"range": [0, pos_be_clamp - 1], "color": "rgba(200,80,80,0.5)"},
-        {"range": [pos_be_clamp - 1, pos_be_clamp + 1], "color": "rgba(180,160,80,0.5)"},
-        {"range": [pos_be_clamp + 1, 100], "color": "rgba(80,180,100,0.5)"},
-    ]
-
+    pos_be = _price_axis_position(be or 0, min_val, max_val)
+    return {
+        "pos_strike": _price_axis_position(strike or 0, min_val, max_val),
+        "pos_be": pos_be,
+        "pos_precio": _price_axis_position(precio or 0, min_val, max_val),
+        "pos_be_clamp": max(1.0, min(99.0, pos_be)),
+        "tickvals": tickvals,
+        "ticktext": [f"{price_at(p):.0f}" for p in tickvals],
+        "zone_color": zone_color,
+        "bar_color": bar_color,
+    }
+
+
+@lru_cache(maxsize=1)
+def _price_axis_base() -> dict:
+    """Figura base del medidor de precios, validada una vez: arco, borde, fuentes, márgenes y template."""
     fig = go.Figure(
         go.Indicator(
             mode="gauge",
-            value=pos_precio,
-            title={"text": title, "font": {"size": 15}},
+            value=50,
+            title={"font": {"size": 15}},
             gauge={
                 "axis": {
                     "range": [0, 100],
                     "tickwidth": 1,
-                    "tickvals": tickvals,
-                    "ticktext": ticktext,
                     "tickfont": {"size": 11, "color": "#8b949e"},
                 },
-                "bar": {"color": bar_color, "thickness": 0.5},
+                "bar": {"thickness": 0.5},
                 "bgcolor": "rgba(24,28,36,0.98)",
                 "borderwidth": 1,
                 "bordercolor": "#30363d",
-                "steps": steps_zones,
                 "threshold": {
                     "line": {"color": "rgba(0,0,0,0)", "width": 0},
                     "thickness": 0,
-                    "value": pos_precio,
                 },
             },
-        )
+        ),
+        # El template va en el constructor: update_layout(template=dict) lo fusionaría con el template por defecto
+        layout=dict(
+            template=_gauge_template(),
+            height=340,
+            margin=dict(l=55, r=55, t=60, b=50),
+            paper_bgcolor="rgba(22,27,34,0.98)",
+            font=dict(color="#b1bac4", size=13),
+        ),
     )
+    return fig.to_dict()
+
+
+@lru_cache(maxsize=256)
+def _price_axis_gauge(
+    strike: float | None,
+    be: float | None,
+    precio: float | None,
+    dte: int,
+    status_label: str,
+    title: str,
+) -> go.Figure:
+    """Medidor de precios sobre la figura base: solo cambian agujas, escala, bandas y textos."""
+    scale = _price_axis_scale(strike, be, precio, status_label)
+    pos_strike, pos_be, pos_precio = scale["pos_strike"], scale["pos_be"], scale["pos_precio"]
+    zone_color, bar_color = scale["zone_color"], scale["bar_color"]
+    tickvals, ticktext = scale["tickvals"], scale["ticktext"]
+
+    # Zonas con contraste frente al fondo oscuro
+    pos_be_clamp = scale["pos_be_clamp"]
+    steps_zones = [
+        {"range": [0, pos_be_clamp - 1], "color": _ZONE_COLORS[0]},
+        {"range": [pos_be_clamp - 1, pos_be_clamp + 1], "color": _ZONE_COLORS[1]},
+        {"range": [pos_be_clamp + 1, 100], "color": _ZONE_COLORS[2]},
+    ]
 
     cx, cy = 0.5, 0.14
     r_inner = 0.17   # Origen de las agujas (no en el centro para no tapar el DTE)
@@ -307,9 +386,9 @@ def build_gauge_price_axis(
         y1 = cy + r_outer * math.sin(a)
         return (x0, y0, x1, y1)
 
-    color_strike = "#ff9f43"
-    color_be = "#dfe6e9"
-    color_precio = "#00d2d3"
+    color_strike = _NEEDLE_COLORS["Strike"]
+    color_be = _NEEDLE_COLORS["BE"]
+    color_precio = _NEEDLE_COLORS["Precio"]
     line_w = 2.5  # Mismo grosor para las tres agujas (Strike, BE, Precio)
 
     shapes: list[dict] = []
@@ -362,16 +441,135 @@ def build_gauge_price_axis(
         },
     ]
 
-    fig.update_layout(
-        template="plotly_dark",
-        height=340,
-        margin=dict(l=55, r=55, t=60, b=50),
-        paper_bgcolor="rgba(22,27,34,0.98)",
-        font=dict(color="#b1bac4", size=13),
-        shapes=shapes,
-        annotations=annotations,
+    spec = copy.deepcopy(_price_axis_base())
+    indicator = spec["data"][0]
+    indicator["value"] = pos_precio
+    indicator["title"]["text"] = title
+    gauge = indicator["gauge"]
+    gauge["axis"]["tickvals"] = tickvals
+    gauge["axis"]["ticktext"] = ticktext
+    gauge["bar"]["color"] = bar_color
+    gauge["steps"] = steps_zones
+    gauge["threshold"]["value"] = pos_precio
+    spec["layout"]["shapes"] = shapes
+    spec["layout"]["annotations"] = annotations
+    return go.Figure(spec)
+
+
+GAUGE_RENDERERS = ("plotly", "svg")
+
+
+def gauge_renderer_for(view: str, spec: str = "") -> str:
+    """
+    Renderizador del medidor para una vista según spec: "svg" (todas las vistas) o "posicion=svg,screener=plotly".
+    Lo específico de la vista gana al valor global; sin spec o con valores desconocidos, "plotly".
+    """
+    chosen = {}
+    for part in (spec or "").split(","):
+        name, sep, value = part.strip().lower().partition("=")
+        if not sep:
+            name, value = "", name
+        if value in GAUGE_RENDERERS:
+            chosen[name] = value
+    return chosen.get(view, chosen.get("", "plotly"))
+
+
+# --- Renderizador SVG del medidor de precios (alternativa ligera a Plotly) ---
+# Mismo contenido que build_gauge_price_axis (escala de precios, bandas, barra de precio, agujas Strike/BE/Precio,
+# DTE y estado) como un <svg> en línea de ~2 KB: no necesita plotly.js en el navegador ni JSON de la figura.
+# Geometría fija en un viewBox; el SVG escala al ancho del contenedor.
+_SVG_W, _SVG_H = 360, 250
+_SVG_CX, _SVG_CY, _SVG_R = 180.0, 190.0, 130.0
+_SVG_BAND = (0.62, 1.0)  # radios interior / exterior del arco (fracción de _SVG_R)
+_SVG_BAR = (0.72, 0.9)  # barra del precio: mitad central de la banda, como thickness=0.5 en Plotly
+_SVG_NEEDLE = (0.25, 0.5)  # origen y punta de las agujas (mismas proporciones que r_inner / r_outer)
+
+
+def _svg_point(pos: float, r: float) -> tuple[float, float]:
+    """Punto del semicírculo para una posición 0-100 (0 = izquierda) a radio r."""
+    a = math.pi * (1.0 - pos / 100.0)
+    return (_SVG_CX + r * math.cos(a), _SVG_CY - r * math.sin(a))
+
+
+def _svg_band(pos0: float, pos1: float, r0: float, r1: float, fill: str) -> str:
+    """Sector de corona entre dos posiciones 0-100 y dos radios (fracción de _SVG_R)."""
+    if pos1 <= pos0:
+        return ""
+    (ax, ay), (bx, by) = _svg_point(pos0, r1 * _SVG_R), _svg_point(pos1, r1 * _SVG_R)
+    (cx, cy), (dx, dy) = _svg_point(pos1, r0 * _SVG_R), _svg_point(pos0, r0 * _SVG_R)
+    return (
+        f'<path d="M{ax:.1f} {ay:.1f}A{r1 * _SVG_R:.1f} {r1 * _SVG_R:.1f} 0 0 1 {bx:.1f} {by:.1f}'
+        f'L{cx:.1f} {cy:.1f}A{r0 * _SVG_R:.1f} {r0 * _SVG_R:.1f} 0 0 0 {dx:.1f} {dy:.1f}Z" fill="{fill}"/>'
     )
-    return fig
+
+
+def build_gauge_price_axis_svg(
+    strike: float,
+    be: float,
+    precio: float,
+    dte: int,
+    status_label: str,
+    title: str = "Análisis del riesgo",
+    is_put: bool = True,
+) -> str:
+    """
+    Mismo medidor que build_gauge_price_axis como SVG en línea (para st.markdown(..., unsafe_allow_html=True)).
+    Memoizado con las mismas entradas redondeadas.
+    """
+    return _price_axis_svg(_round_price(strike), _round_price(be), _round_price(precio), dte, status_label, title)
+
+
+@lru_cache(maxsize=256)
+def _price_axis_svg(
+    strike: float | None,
+    be: float | None,
+    precio: float | None,
+    dte: int,
+    status_label: str,
+    title: str,
+) -> str:
+    scale = _price_axis_scale(strike, be, precio, status_label)
+    pos_be_clamp = scale["pos_be_clamp"]
+    band_r0, band_r1 = _SVG_BAND
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_SVG_W} {_SVG_H}" width="100%" '
+        f'style="max-width:{_SVG_W * 1.5:.0f}px;display:block;margin:0 auto;background:rgba(22,27,34,0.98);border-radius:8px" '
+        f'role="img" aria-label="{html.escape(title)}: {html.escape(status_label)}" font-family="sans-serif" text-anchor="middle">',
+        f'<text x="{_SVG_CX:.0f}" y="26" font-size="15" fill="#b1bac4">{html.escape(title)}</text>',
+        # Fondo y bandas pérdida / breakeven / ganancia
+        _svg_band(0, 100, band_r0, band_r1, "rgba(24,28,36,0.98)"),
+        _svg_band(0, pos_be_clamp - 1, band_r0, band_r1, _ZONE_COLORS[0]),
+        _svg_band(pos_be_clamp - 1, pos_be_clamp + 1, band_r0, band_r1, _ZONE_COLORS[1]),
+        _svg_band(pos_be_clamp + 1, 100, band_r0, band_r1, _ZONE_COLORS[2]),
+        # Barra del precio actual
+        _svg_band(0, scale["pos_precio"], _SVG_BAR[0], _SVG_BAR[1], scale["bar_color"]),
+    ]
+    # Marcas y etiquetas de la escala de precios
+    for pos, text in zip(scale["tickvals"], scale["ticktext"]):
+        (x0, y0), (x1, y1) = _svg_point(pos, band_r1 * _SVG_R), _svg_point(pos, band_r1 * _SVG_R + 5)
+        lx, ly = _svg_point(pos, band_r1 * _SVG_R + 16)
+        parts.append(f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{x1:.1f}" y2="{y1:.1f}" stroke="#30363d"/>')
+        parts.append(
+            f'<text x="{lx:.1f}" y="{ly + 4:.1f}" font-size="11" fill="#8b949e">{html.escape(text)}</text>'
+        )
+    # Agujas (mismo origen y longitud) con su etiqueta un poco más allá de la punta
+    for name, pos in (("Strike", scale["pos_strike"]), ("BE", scale["pos_be"]), ("Precio", scale["pos_precio"])):
+        color = _NEEDLE_COLORS[name]
+        (x0, y0), (x1, y1) = _svg_point(pos, _SVG_NEEDLE[0] * _SVG_R), _svg_point(pos, _SVG_NEEDLE[1] * _SVG_R)
+        lx, ly = _svg_point(pos, _SVG_NEEDLE[1] * _SVG_R * 1.12 + 6)
+        parts.append(
+            f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{x1:.1f}" y2="{y1:.1f}" stroke="{color}" stroke-width="2.5" stroke-linecap="round"/>'
+        )
+        parts.append(f'<text x="{lx:.1f}" y="{ly + 3:.1f}" font-size="10" fill="{color}">{name}</text>')
+    # DTE en el centro y caja de estado debajo
+    status_w = 14 + 9 * len(status_label)
+    parts.extend([
+        f'<text x="{_SVG_CX:.0f}" y="{_SVG_CY - 2:.0f}" font-size="20" fill="#e6edf3">{html.escape(str(dte))} DTE</text>',
+        f'<rect x="{_SVG_CX - status_w / 2:.1f}" y="{_SVG_CY + 14:.0f}" width="{status_w}" height="26" rx="4" fill="rgba(22,27,34,0.9)"/>',
+        f'<text x="{_SVG_CX:.0f}" y="{_SVG_CY + 33:.0f}" font-size="16" fill="{scale["zone_color"]}">{html.escape(status_label)}</text>',
+        "</svg>",
+    ])
+    return "".join(parts)
 
 
 def _normalize_0_100(value: float, low: float, high: float) -> float:
@@ -485,9 +683,64 @@ def build_gauge_spectacular(
     - screener: probabilidad de entrada (Precio, Strike, BE, Prima, DTE, Ret.%).
     - position: realidad de la posición (+ P&L, Max ganancia).
     Centro: score y zona (Favorable/Desfavorable) + Ganando/Perdiendo si aplica.
+    Memoizado como build_gauge_price_axis (métricas a 2 decimales; del P&L solo cuenta el signo).
     """
-    if metrics is None:
-        metrics = []
+    winning = None if pnl_actual is None else pnl_actual >= 0
+    key_metrics = tuple((label, round(float(value), 2)) for label, value in (metrics or []))
+    return _spectacular_gauge(score, title, mode, winning, key_metrics)
+
+
+@lru_cache(maxsize=1)
+def _spectacular_base() -> dict:
+    """Figura base del medidor polar, validada una vez: sector, ejes, leyenda, márgenes y template."""
+    fig = go.Figure(
+        layout=dict(
+            template=_gauge_template(extra_layout=("polar",), traces=("scatterpolar",)),
+            polar=dict(
+                sector=[90, 270],  # semicírculo (90°–270°)
+                radialaxis=dict(
+                    range=[0, 105],
+                    showticklabels=True,
+                    tickvals=[25, 50, 75, 100],
+                    tickfont=dict(size=10, color="#8b949e"),
+                    gridcolor="rgba(33,38,45,0.8)",
+                ),
+                angularaxis=dict(
+                    tickfont=dict(size=11, color="#e6edf3"),
+                    gridcolor="rgba(33,38,45,0.5)",
+                    rotation=0,
+                    direction="clockwise",
+                ),
+                bgcolor="rgba(13,17,23,0.98)",
+            ),
+            showlegend=True,
+            legend=dict(
+                orientation="h",
+                yanchor="top",
+                y=1.12,
+                xanchor="center",
+                x=0.5,
+                font=dict(size=10),
+            ),
+            title=dict(x=0.5, xanchor="center"),
+            height=420,
+            margin=dict(l=80, r=80, t=100, b=60),
+            paper_bgcolor="rgba(22,27,34,0.98)",
+            font=dict(color="#e6edf3", size=12),
+        )
+    )
+    return fig.to_dict()
+
+
+@lru_cache(maxsize=256)
+def _spectacular_gauge(
+    score: int,
+    title: str,
+    mode: str,
+    winning: bool | None,
+    metrics: tuple[tuple[str, float], ...],
+) -> go.Figure:
+    """Medidor polar sobre la figura base: solo cambian las cuñas, las etiquetas del eje angular y el título."""
     if score <= 33:
         zone_label = "Desfavorable"
         zone_color = "#f85149"
@@ -498,8 +751,8 @@ def build_gauge_spectacular(
         zone_label = "Favorable"
         zone_color = "#3fb950"
     pnl_text = ""
-    if pnl_actual is not None:
-        pnl_text = " — Ganando" if pnl_actual >= 0 else " — Perdiendo"
+    if winning is not None:
+        pnl_text = " — Ganando" if winning else " — Perdiendo"
     if mode == "screener":
         subtitle = "Probabilidad de que la entrada sea favorable"
     else:
@@ -510,67 +763,79 @@ def build_gauge_spectacular(
     base_angle = 90.0  # sector 90°–270° (semicírculo)
     theta_center_deg = [base_angle + (i + 0.5) * angle_span for i in range(n)]
 
-    fig = go.Figure()
+    traces: list[dict] = []
     for i, (label, value_0_100) in enumerate(metrics):
         r_val = max(1.0, min(100.0, value_0_100))
         color = RADIAL_COLORS[i % len(RADIAL_COLORS)]
         t0 = base_angle + i * angle_span
         t1 = base_angle + (i + 1) * angle_span
         # Wedge: theta en grados (Plotly polar), r de 0 a r_val
-        theta_deg = [t0, t0, t1, t1]
-        r = [0, r_val, r_val, 0]
-        fig.add_trace(
-            go.Scatterpolar(
-                r=r,
-                theta=theta_deg,
-                fill="toself",
-                fillcolor=color,
-                line=dict(color=color, width=1.5),
-                name=label,
-                legendgroup=label,
-            )
+        traces.append(
+            {
+                "type": "scatterpolar",
+                "r": [0, r_val, r_val, 0],
+                "theta": [t0, t0, t1, t1],
+                "fill": "toself",
+                "fillcolor": color,
+                "line": {"color": color, "width": 1.5},
+                "name": label,
+                "legendgroup": label,
+            }
         )
 
+    spec = copy.deepcopy(_spectacular_base())
+    spec["data"] = traces
     # Ejes: un tick por métrica con su etiqueta
+    angular = spec["layout"]["polar"]["angularaxis"]
+    angular["tickvals"] = theta_center_deg
+    angular["ticktext"] = [m[0] for m in metrics]
+    spec["layout"]["title"]["text"] = (
+        f"{title}<br><span style='font-size:12px;color:#8b949e'>{subtitle}</span>"
+        f"<br><span style='font-size:14px;color:{zone_color}'>Score: {score}/100</span>"
+    )
+    return go.Figure(spec)
+
+
+def build_pnl_expiry_figure(
+    x,
+    pnl,
+    marks: dict[str, float] | None = None,
+    title: str = "Radiografía P&L (al vencimiento)",
+    x_title: str = "Precio del subyacente ($)",
+) -> go.Figure:
+    """
+    Curva Precio vs Ganancia/Pérdida al vencimiento (una fila de dashboard.payoff.PnlAtExpiry o la suma de la
+    cartera). Relleno verde sobre 0 y rojo bajo 0; marks: líneas verticales con nombre (Strike, BE, Precio…).
+    """
+    x = [float(v) for v in x]
+    pnl = [float(v) for v in pnl]
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=[max(0.0, v) for v in pnl], fill="tozeroy", mode="none",
+                             fillcolor="rgba(63,185,80,0.25)", hoverinfo="skip", showlegend=False))
+    fig.add_trace(go.Scatter(x=x, y=[min(0.0, v) for v in pnl], fill="tozeroy", mode="none",
+                             fillcolor="rgba(248,81,73,0.25)", hoverinfo="skip", showlegend=False))
+    fig.add_trace(go.Scatter(x=x, y=pnl, mode="lines", line=dict(color="#58a6ff", width=2.5), name="P&L",
+                             hovertemplate="%{x:,.2f} → $%{y:,.2f}<extra></extra>"))
+    fig.add_hline(y=0, line_color="#30363d", line_width=1)
+    for name, value in (marks or {}).items():
+        if value is None or not (min(x) <= float(value) <= max(x)):
+            continue
+        color = _NEEDLE_COLORS.get(name, "#8b949e")
+        fig.add_vline(x=float(value), line_dash="dot", line_color=color, line_width=1.5,
+                      annotation_text=name, annotation_position="top", annotation_font_color=color)
     fig.update_layout(
-        polar=dict(
-            sector=[90, 270],  # semicírculo (90°–270°)
-            radialaxis=dict(
-                range=[0, 105],
-                showticklabels=True,
-                tickvals=[25, 50, 75, 100],
-                tickfont=dict(size=10, color="#8b949e"),
-                gridcolor="rgba(33,38,45,0.8)",
-            ),
-            angularaxis=dict(
-                tickvals=theta_center_deg,
-                ticktext=[m[0] for m in metrics],
-                tickfont=dict(size=11, color="#e6edf3"),
-                gridcolor="rgba(33,38,45,0.5)",
-                rotation=0,
-                direction="clockwise",
-            ),
-            bgcolor="rgba(13,17,23,0.98)",
-        ),
-        showlegend=True,
-        legend=dict(
-            orientation="h",
-            yanchor="top",
-            y=1.12,
-            xanchor="center",
-            x=0.5,
-            font=dict(size=10),
-        ),
-        title=dict(
-            text=f"{title}<br><span style='font-size:12px;color:#8b949e'>{subtitle}</span><br><span style='font-size:14px;color:{zone_color}'>Score: {score}/100</span>",
-            x=0.5,
-            xanchor="center",
-        ),
         template="plotly_dark",
-        height=420,
-        margin=dict(l=80, r=80, t=100, b=60),
+        title=dict(text=title, font=dict(size=15)),
+        height=320,
+        margin=dict(l=60, r=30, t=60, b=50),
+        xaxis_title=x_title,
+        yaxis_title="P&L ($)",
+        showlegend=False,
         paper_bgcolor="rgba(22,27,34,0.98)",
+        plot_bgcolor="rgba(13,17,23,0.98)",
         font=dict(color="#e6edf3", size=12),
+        xaxis=dict(gridcolor="rgba(48,54,61,0.5)"),
+        yaxis=dict(gridcolor="rgba(48,54,61,0.5)", tickprefix="$"),
     )
     return fig
 
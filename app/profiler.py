@@ -0,0 +1,158 @@
+# AlphaWheel Pro - Perfilador por rerun (opt-in): tramos con nombre y cascada al pie de la página
+# Activación: ALPHAWHEEL_PROFILE=1 o parámetro de URL ?debug=profile (?debug=all activa también el panel SQL).
+# Cada tramo guarda inicio, duración, profundidad y las consultas SQL / ms de BD que hubo dentro
+# (vía database.instrumentation). Volcado JSON por descarga y, si ALPHAWHEEL_PROFILE_DIR está definido,
+# un archivo por rerun en ese directorio para comparar offline.
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+from database import instrumentation
+
+_local = threading.local()
+
+
+def profiling_enabled() -> bool:
+    """True si el perfilador está activado (entorno o query param)."""
+    if (os.environ.get("ALPHAWHEEL_PROFILE") or "").strip().lower() in ("1", "true", "yes", "on"):
+        return True
+    try:
+        flags = st.query_params.get_all("debug")
+    except Exception:
+        return False
+    return any(f.strip().lower() in ("profile", "all") for v in flags for f in str(v).split(","))
+
+
+def begin_rerun(page: str) -> None:
+    """Inicia el perfil del rerun actual (llamar al inicio de la página). Sin efecto si no está activado."""
+    _local.enabled = profiling_enabled()
+    _local.page = page
+    _local.t0 = time.perf_counter()
+    _local.started_at = datetime.now().isoformat(timespec="seconds")
+    _local.spans = []
+    _local.depth = 0
+
+
+def _enabled() -> bool:
+    return getattr(_local, "enabled", False)
+
+
+def start(name: str) -> Optional[Dict[str, Any]]:
+    """Abre un tramo; devuelve un token para stop(). Para bloques largos donde un `with` obligaría a reindentar."""
+    if not _enabled():
+        return None
+    stats = instrumentation.current_stats()
+    sp = {
+        "name": name,
+        "depth": _local.depth,
+        "start_ms": (time.perf_counter() - _local.t0) * 1000.0,
+        "_q0": stats.count,
+        "_db0": stats.total_ms,
+    }
+    _local.spans.append(sp)
+    _local.depth += 1
+    return sp
+
+
+def stop(sp: Optional[Dict[str, Any]]) -> None:
+    if sp is None or "duration_ms" in sp:
+        return
+    stats = instrumentation.current_stats()
+    sp["duration_ms"] = (time.perf_counter() - _local.t0) * 1000.0 - sp["start_ms"]
+    sp["queries"] = stats.count - sp.pop("_q0")
+    sp["db_ms"] = stats.total_ms - sp.pop("_db0")
+    _local.depth = max(0, _local.depth - 1)
+
+
+@contextmanager
+def span(name: str):
+    """Tramo con nombre: `with profiler.span("db: trades abiertos"): ...`."""
+    sp = start(name)
+    try:
+        yield
+    finally:
+        stop(sp)
+
+
+def profile_dump() -> Dict[str, Any]:
+    """Perfil del rerun actual como dict serializable (tramos abiertos se cierran al momento del volcado)."""
+    spans: List[Dict[str, Any]] = []
+    for sp in getattr(_local, "spans", []):
+        if "duration_ms" not in sp:
+            stop(sp)
+        spans.append({k: (round(v, 3) if isinstance(v, float) else v) for k, v in sp.items()})
+    stats = instrumentation.current_stats()
+    return {
+        "page": getattr(_local, "page", ""),
+        "started_at": getattr(_local, "started_at", ""),
+        "total_ms": round((time.perf_counter() - getattr(_local, "t0", time.perf_counter())) * 1000.0, 3),
+        "db_queries": stats.count,
+        "db_ms": round(stats.total_ms, 3),
+        "spans": spans,
+    }
+
+
+def render_profile_waterfall() -> None:
+    """Cascada de tramos del rerun (Plotly) + tabla + descarga JSON. Llamar al final de la página."""
+    if not _enabled():
+        return
+    dump = profile_dump()
+    out_dir = (os.environ.get("ALPHAWHEEL_PROFILE_DIR") or "").strip()
+    if out_dir:
+        try:
+            Path(out_dir).mkdir(parents=True, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            (Path(out_dir) / f"profile_{dump['page']}_{stamp}.json").write_text(json.dumps(dump, indent=2), encoding="utf-8")
+        except OSError:
+            pass
+
+    import pandas as pd
+    import plotly.graph_objects as go
+
+    spans = dump["spans"]
+    with st.expander(f"⏱️ Perfil del rerun — {dump['total_ms']:,.0f} ms · {dump['db_queries']} consultas SQL ({dump['db_ms']:,.0f} ms)", expanded=True):
+        if spans:
+            labels = [(" " * sp["depth"]) + sp["name"] for sp in spans]
+            fig = go.Figure(
+                go.Bar(
+                    y=labels,
+                    x=[sp["duration_ms"] for sp in spans],
+                    base=[sp["start_ms"] for sp in spans],
+                    orientation="h",
+                    marker_color=["#f85149" if sp["db_ms"] > sp["duration_ms"] * 0.5 else "#58a6ff" for sp in spans],
+                    text=[f"{sp['duration_ms']:,.0f} ms" for sp in spans],
+                    textposition="outside",
+                    hovertemplate="%{y}<br>inicio %{base:,.1f} ms · %{x:,.1f} ms<extra></extra>",
+                )
+            )
+            fig.update_layout(
+                template="plotly_dark",
+                height=max(240, 26 * len(spans) + 80),
+                margin=dict(l=10, r=40, t=20, b=30),
+                xaxis_title="ms desde el inicio del rerun (rojo = >50% del tramo en BD)",
+                yaxis=dict(autorange="reversed"),
+                paper_bgcolor="rgba(22,27,34,0.98)",
+                plot_bgcolor="rgba(22,27,34,0.98)",
+                font=dict(color="#e6edf3"),
+                showlegend=False,
+            )
+            st.plotly_chart(fig, use_container_width=True)
+            df = pd.DataFrame(spans)[["name", "start_ms", "duration_ms", "queries", "db_ms"]].round(1)
+            df.columns = ["Tramo", "Inicio ms", "Duración ms", "Consultas", "BD ms"]
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.caption("Sin tramos registrados en este rerun.")
+        st.download_button(
+            "Descargar perfil (JSON)",
+            data=json.dumps(dump, indent=2),
+            file_name=f"alphawheel_profile_{dump['page']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key="profiler_download_json",
+        )
@@ -0,0 +1,1076 @@
+# AlphaWheel Pro - Screener de opciones (barrido Tradier + Alpha Vantage / Yahoo Finance)
+# Se importa solo al abrir el Screener: yfinance y el código del barrido no se cargan en el arranque del cockpit.
+
+import io
+from datetime import datetime, date, timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import requests
+import streamlit as st
+import yfinance as yf
+
+from database.db import (
+    get_user_screener_settings,
+    update_user_av_key,
+    get_user_bunkers,
+    get_bunker_by_id,
+    create_bunker,
+    update_bunker,
+    delete_bunker,
+)
+from engine.calculations import occ_symbol
+from business.wheel import register_csp_opening, register_cc_opening, get_stock_quantity
+from app.data_cache import get_tradier_chain_cached, get_tradier_expirations_cached, get_tradier_quote_cached
+from app.session_helpers import get_current_account_id
+from app.cockpit import _fragment, _get_tradier_token_for_user, _render_risk_gauge, _rerun_panel, fmt2
+import config
+
+# --- Caché compartida Alpha Vantage (earnings + overview): TTL largos, compartida entre usuarios ---
+_AV_SHARED_EARNINGS_TTL = 172800   # 48 h
+_AV_SHARED_OVERVIEW_TTL = 86400    # 24 h
+
+
+def _get_shared_av_key():
+    return getattr(config, "get_shared_av_key", lambda: "")()
+
+
+@st.cache_data(ttl=_AV_SHARED_EARNINGS_TTL, show_spinner=False)
+def _shared_earnings_calendar() -> dict:
+    """Calendario de earnings compartido por ticker; cualquier usuario reutiliza el resultado."""
+    av_key = _get_shared_av_key()
+    if not av_key:
+        return {}
+    try:
+        r = requests.get(
+            "https://www.alphavantage.co/query",
+            params={
+                "function": "EARNINGS_CALENDAR",
+                "horizon": "3month",
+                "apikey": av_key,
+            },
+            timeout=15,
+        )
+        return pd.read_csv(io.StringIO(r.text)).set_index("symbol")["reportDate"].to_dict()
+    except Exception:
+        return {}
+
+
+@st.cache_data(ttl=_AV_SHARED_OVERVIEW_TTL, show_spinner=False)
+def _shared_overview(sym: str) -> Optional[dict]:
+    """Overview por ticker compartido (Alpha Vantage + fallback Yahoo); cualquier usuario reutiliza."""
+    av_key = _get_shared_av_key()
+    if av_key:
+        try:
+            r = requests.get(
+                "https://www.alphavantage.co/query",
+                params={"function": "OVERVIEW", "symbol": sym, "apikey": av_key},
+                timeout=8,
+            ).json()
+            if "Symbol" in r and float(r.get("AnalystTargetPrice", 0)) > 0:
+                return {
+                    "target": round(float(r.get("AnalystTargetPrice", 0)), 2),
+                    "margin": round(float(r.get("OperatingMarginTTM", 0)) * 100, 2),
+                    "roe": round(float(r.get("ReturnOnEquityTTM", 0)) * 100, 2),
+                    "debt": round(float(r.get("DebtToEquityRatio", 0)), 2),
+                    "source": "Alpha Vantage",
+                }
+        except Exception:
+            pass
+    try:
+        t = yf.Ticker(sym)
+        info = t.info
+        return {
+            "target": round(info.get("targetMeanPrice", 0), 2),
+            "margin": round(info.get("operatingMargins", 0) * 100, 2),
+            "roe": round(info.get("returnOnEquity", 0) * 100, 2),
+            "debt": round((info.get("debtToEquity", 0) or 0) / 100, 2),
+            "source": "Yahoo Finance",
+        }
+    except Exception:
+        return None
+
+
+@st.cache_data(ttl=86400, show_spinner=False)  # 24 h por ticker
+def _get_hybrid_overview(sym: str, av_key_local: str):
+    if av_key_local:
+        try:
+            r = requests.get(
+                "https://www.alphavantage.co/query",
+                params={"function": "OVERVIEW", "symbol": sym, "apikey": av_key_local},
+                timeout=8,
+            ).json()
+            if "Symbol" in r and float(r.get("AnalystTargetPrice", 0)) > 0:
+                return {
+                    "target": round(float(r.get("AnalystTargetPrice", 0)), 2),
+                    "margin": round(float(r.get("OperatingMarginTTM", 0)) * 100, 2),
+                    "roe": round(float(r.get("ReturnOnEquityTTM", 0)) * 100, 2),
+                    "debt": round(float(r.get("DebtToEquityRatio", 0)), 2),
+                    "source": "Alpha Vantage",
+                }
+        except Exception:
+            pass
+    try:
+        t = yf.Ticker(sym)
+        info = t.info
+        return {
+            "target": round(info.get("targetMeanPrice", 0), 2),
+            "margin": round(info.get("operatingMargins", 0) * 100, 2),
+            "roe": round(info.get("returnOnEquity", 0) * 100, 2),
+            "debt": round((info.get("debtToEquity", 0) or 0) / 100, 2),
+            "source": "Yahoo Finance",
+        }
+    except Exception:
+        return None
+
+def _parse_thinkorswim_symbol(s: str) -> Optional[dict]:
+    """
+    Parsea símbolo tipo Thinkorswim: .NOW260227P105 (CSP) o .NOW260227C108 (CC).
+    Formato: [.]ROOT + YYMMDD + P/C + STRIKE → ticker, exp (YYYY-MM-DD), option_type, strike.
+    Devuelve dict con: ticker, exp_str, exp_date, option_type ('put'|'call'), strike, occ_symbol (para Tradier).
+    """
+    import re
+    s = (s or "").strip().upper()
+    if not s:
+        return None
+    s = s.lstrip(".")
+    # ROOT (letras) + 6 dígitos (YYMMDD) + P o C + strike (número)
+    m = re.match(r"^([A-Z]+)(\d{6})([PC])(\d+(?:\.\d+)?)$", s)
+    if not m:
+        return None
+    root, yymmdd, pc, strike_str = m.group(1), m.group(2), m.group(3), m.group(4)
+    strike = float(strike_str)
+    yy, mm, dd = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:6])
+    year = 2000 + yy if yy < 50 else 1900 + yy
+    try:
+        exp_date = date(year, mm, dd)
+    except ValueError:
+        return None
+    exp_str = exp_date.isoformat()
+    option_type = "put" if pc == "P" else "call"
+    return {
+        "ticker": root,
+        "exp_str": exp_str,
+        "exp_date": exp_date,
+        "option_type": option_type,
+        "strike": strike,
+        # Tradier usa formato compacto: ROOT + YYMMDD + C/P + strike*1000 (8 dígitos), sin espacios (ej. NVDA250919C00175000)
+        "occ_symbol": occ_symbol(root, exp_date, pc, strike),
+    }
+
+
+def _screen_chain_options(
+    opts: list,
+    sym: str,
+    d_str: str,
+    dte: int,
+    price: float,
+    techs: tuple,
+    e_date: Optional[str],
+    estrategia: str,
+    delta_r: tuple,
+    f_sma: bool,
+    f_stoch: bool,
+    f_earnings: bool,
+    roi_min_f: float,
+    colateral_disponible: float,
+    today: datetime,
+) -> list:
+    """
+    Etapa de filtrado del screener para una cadena (ticker + expiración): aplica delta, SMA 200,
+    estocástico, earnings, ROI anualizado mínimo y colateral disponible. Sin red ni Streamlit
+    (se puede medir con datos sintéticos). techs = (sma200, sma40, stoch, atr, hv).
+    """
+    sma200, sma40, stoch_v, atr_v, hv_v = techs
+    out = []
+    for opt in opts:
+        if not isinstance(opt, dict):
+            continue
+        opt_type = "put" if estrategia == "Cash Secured Put (CSP)" else "call"
+        if opt.get("option_type") != opt_type:
+            continue
+        try:
+            strike = float(opt.get("strike") or 0)
+        except (TypeError, ValueError):
+            continue
+        bid = opt.get("bid") or 0.0
+        ask = opt.get("ask") or 0.0
+        premium = round(float((bid + ask) / 2), 2)
+        greeks = opt.get("greeks")
+        if not isinstance(greeks, dict):
+            greeks = {}
+        delta = float(greeks.get("delta") or 0)
+
+        if estrategia == "Cash Secured Put (CSP)":
+            base = strike
+        else:
+            base = price
+
+        lo, hi = min(delta_r[0], delta_r[1]), max(delta_r[0], delta_r[1])
+        if not (lo <= delta <= hi):
+            continue
+
+        if f_sma and sma200 and strike >= sma200:
+            continue
+        if f_stoch and stoch_v >= 30:
+            continue
+
+        es_earn = "SÍ" if e_date and d_str >= e_date >= today.strftime("%Y-%m-%d") else "NO"
+        if f_earnings and es_earn == "SÍ":
+            continue
+
+        roi_a = round(((premium / base) * 100) * (365 / max(dte, 1)), 2)
+        if roi_a < roi_min_f:
+            continue
+        colateral_req = strike * 100 if estrategia == "Cash Secured Put (CSP)" else price * 100
+        if colateral_disponible and colateral_disponible > 0 and colateral_req > colateral_disponible:
+            continue
+        be_val = (
+            round(strike - premium, 2)
+            if estrategia == "Cash Secured Put (CSP)"
+            else round(price - premium, 2)
+        )
+        out.append(
+            {
+                "Ticker": sym,
+                "Exp": d_str,
+                "DTE": dte,
+                "Precio": price,
+                "Strike": strike,
+                "Prima": premium,
+                "Ret. %": round((premium / base) * 100, 2),
+                "ROI Ann %": roi_a,
+                "Delta": round(delta, 2),
+                "POP %": round((1 + delta) * 100, 2),
+                "BE": be_val,
+                "Earnings": es_earn,
+                "earn_date": e_date,
+                "Stoch": stoch_v,
+                "sma200_val": sma200,
+                "sma40_val": sma40,
+                "atr_val": atr_v,
+                "hv": hv_v,
+                "iv": (float(greeks.get("mid_iv") or 0) * 100),
+            }
+        )
+    return out
+
+
+def _render_screener_sidebar_form(user_id: int) -> bool:
+    """Renderiza el formulario del Screener en la barra lateral. Devuelve True si se pulsó Iniciar barrido."""
+    settings = get_user_screener_settings(user_id) if user_id else {}
+    saved_av = (settings.get("av_api_key") or "").strip()
+    bunkers = get_user_bunkers(user_id) if user_id else []
+    # Contenedor explícito para que Streamlit siempre pinte el formulario en el sidebar
+    with st.container():
+        estrategia = st.radio("Estrategia", ["Cash Secured Put (CSP)", "Covered Call (CC)"], horizontal=True, key="scr_estrategia")
+        st.caption("DTE / Delta / ROI. Colateral: 0 = sin filtro.")
+        col_dte1, col_dte2 = st.columns(2)
+        with col_dte1:
+            st.number_input("DTE mín (días)", min_value=0, max_value=365, value=7, step=1, key="scr_dte_min")
+        with col_dte2:
+            st.number_input("DTE máx (días)", min_value=0, max_value=365, value=30, step=1, key="scr_dte_max")
+        delta_default_lo = -0.20 if estrategia == "Cash Secured Put (CSP)" else 0.10
+        delta_default_hi = -0.10 if estrategia == "Cash Secured Put (CSP)" else 0.20
+        col_dl1, col_dl2 = st.columns(2)
+        with col_dl1:
+            st.number_input("Delta mín", min_value=-0.50, max_value=0.50, value=float(delta_default_lo), step=0.05, format="%.2f", key="scr_delta_lo")
+        with col_dl2:
+            st.number_input("Delta máx", min_value=-0.50, max_value=0.50, value=float(delta_default_hi), step=0.05, format="%.2f", key="scr_delta_hi")
+        st.number_input("ROI mín (%)", value=20.0, step=1.0, key="scr_roi")
+        st.number_input("Colateral ($)", value=10000.0, min_value=0.0, step=1000.0, format="%.0f", key="scr_colateral")
+        st.markdown("---")
+        av_key = st.text_input("Alpha Vantage Key", value=saved_av, type="password", placeholder="API key", key="screener_av_key")
+        if st.button("Verificar y guardar clave", key="scr_av_btn"):
+            if av_key and av_key.strip() and user_id:
+                try:
+                    r = requests.get("https://www.alphavantage.co/query", params={"function": "OVERVIEW", "symbol": "IBM", "apikey": av_key.strip()}, timeout=10)
+                    data = r.json() if r.ok else {}
+                    if isinstance(data, dict) and data.get("Error Message"):
+                        st.error("Clave inválida.")
+                    elif isinstance(data, dict) and data.get("Symbol"):
+                        update_user_av_key(user_id, av_key.strip())
+                        st.success("Clave guardada.")
+                        st.rerun()
+                    elif isinstance(data, dict) and data.get("Note") and ("rate" in str(data.get("Note", "")).lower() or "frequency" in str(data.get("Note", "")).lower()):
+                        update_user_av_key(user_id, av_key.strip())
+                        st.warning("Clave válida (límite excedido). Guardada.")
+                        st.rerun()
+                    else:
+                        st.error("No se pudo verificar la clave.")
+                except Exception as e:
+                    st.error(f"Error: {e}")
+            else:
+                st.warning("Escribe la clave y guarda.")
+        st.checkbox("Strikes bajo SMA 200", value=False, key="scr_sma")
+        st.checkbox("Stoch < 30", value=False, key="scr_stoch")
+        st.checkbox("Evitar earnings", value=False, key="scr_earn")
+        st.markdown("---")
+        st.caption("**Origen del barrido**")
+        origen_sel = st.selectbox(
+            "Escaneo por",
+            ["🎯 Ticker individual", "🏗️ Búnker (lista de tickers)"],
+            key="origen_escaneo",
+            help="Ticker individual: un solo símbolo. Búnker: lista de tickers que creas abajo.",
+        )
+        bunker_options = [(b["bunker_id"], f"{b['name']} ({len([x for x in (b.get('tickers_text') or '').split(',') if x.strip()])} tickers)") for b in bunkers]
+        if origen_sel == "🎯 Ticker individual" or estrategia == "Covered Call (CC)":
+            st.text_input("Ticker a escanear", value=st.session_state.get("single_ticker", "NVDA"), placeholder="Ej. NVDA, AAPL", key="single_ticker")
+        else:
+            if not bunker_options:
+                st.caption("Crea un búnker abajo para barrer por varios tickers.")
+            else:
+                st.selectbox("Búnker a escanear", range(len(bunker_options)), format_func=lambda i: bunker_options[i][1], key="scr_bunker_sel")
+        st.markdown("---")
+        with st.expander("🏗️ Crear y editar búnkers", expanded=False):
+            st.caption("Los búnkers son listas de tickers (ej. Tech: AAPL, MSFT, NVDA). Elige **Búnker** arriba y luego **Iniciar barrido**.")
+            st.markdown("**Crear nuevo**")
+            new_bunker_name = st.text_input("Nombre del búnker", value="", placeholder="Ej. Tech", key="new_bunker_name")
+            new_bunker_tickers = st.text_area("Tickers separados por coma", value="", height=50, key="new_bunker_ta", placeholder="AAPL, MSFT, NVDA")
+            if st.button("➕ Crear búnker", key="create_bunker_btn"):
+                if user_id and new_bunker_name and new_bunker_name.strip():
+                    bid = create_bunker(user_id, new_bunker_name.strip(), new_bunker_tickers or "")
+                    if bid:
+                        st.success(f"Búnker «{new_bunker_name.strip()}» creado. Elige **Búnker** arriba y este búnker para barrer.")
+                        st.rerun()
+                    else:
+                        st.warning("Nombre ya existe.")
+                else:
+                    st.warning("Escribe un nombre.")
+            if bunkers:
+                st.markdown("---")
+                st.markdown("**Editar o eliminar**")
+                edit_options = [(b["bunker_id"], b["name"]) for b in bunkers]
+                edit_idx = st.selectbox("Seleccionar búnker", range(len(edit_options)), format_func=lambda i: edit_options[i][1], key="edit_bunker_sel")
+                edit_bunker_id = edit_options[edit_idx][0]
+                edit_bunker = get_bunker_by_id(edit_bunker_id, user_id)
+                edit_name = st.text_input("Nombre", value=edit_bunker.get("name", "") if edit_bunker else "", key="edit_bunker_name")
+                edit_tickers = st.text_area("Tickers (coma)", value=edit_bunker.get("tickers_text", "") if edit_bunker else "", height=50, key="edit_bunker_ta")
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    if st.button("💾 Guardar cambios", key="save_edit_bunker_btn"):
+                        if user_id and edit_name and edit_name.strip():
+                            if update_bunker(edit_bunker_id, user_id, edit_name.strip(), edit_tickers or ""):
+                                st.success("Búnker actualizado.")
+                                st.rerun()
+                with col_b:
+                    if st.button("🗑️ Eliminar búnker", key="del_bunker_btn"):
+                        if delete_bunker(edit_bunker_id, user_id):
+                            st.success("Búnker eliminado.")
+                            st.rerun()
+        run_scan = st.button("🚀 Iniciar barrido", type="primary", use_container_width=True, key="scr_run_btn")
+        st.markdown("---")
+        st.caption("Analizar contrato (Thinkorswim)")
+        manual_symbol = st.text_input("Símbolo opción", value=st.session_state.get("screener_manual_symbol", ""), placeholder=".NOW260227P105", key="manual_option_symbol")
+        col_an, col_cl = st.columns(2)
+        with col_an:
+            if st.button("Analizar contrato", key="analyze_manual_btn"):
+                if manual_symbol and manual_symbol.strip():
+                    st.session_state["screener_manual_symbol"] = manual_symbol.strip()
+                    st.rerun()
+        with col_cl:
+            if st.button("Limpiar", key="clear_manual_btn"):
+                if "screener_manual_symbol" in st.session_state:
+                    del st.session_state["screener_manual_symbol"]
+                st.rerun()
+    return bool(run_scan)
+
+
+def render_screener_page(user_id: int, run_scan: bool = False) -> None:
+    """
+    Screener: resultados en contenido principal. Filtros se leen de session state (formulario en barra lateral).
+    """
+    token, env = _get_tradier_token_for_user(user_id)
+    api_tradier = "https://api.tradier.com/v1/" if (env or "sandbox") == "prod" else "https://sandbox.tradier.com/v1/"
+    headers_tradier = {"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"} if token else {}
+    bunkers = get_user_bunkers(user_id) if user_id else []
+    estrategia = st.session_state.get("scr_estrategia", "Cash Secured Put (CSP)")
+    dte_min = st.session_state.get("scr_dte_min", 7)
+    dte_max = st.session_state.get("scr_dte_max", 30)
+    delta_lo = st.session_state.get("scr_delta_lo", -0.20)
+    delta_hi = st.session_state.get("scr_delta_hi", -0.10)
+    dte_r = (min(dte_min, dte_max), max(dte_min, dte_max))
+    delta_r = (min(delta_lo, delta_hi), max(delta_lo, delta_hi))
+    roi_min_f = st.session_state.get("scr_roi", 20.0)
+    colateral_disponible = st.session_state.get("scr_colateral", 10000.0)
+    f_sma = st.session_state.get("scr_sma", False)
+    f_stoch = st.session_state.get("scr_stoch", False)
+    f_earnings = st.session_state.get("scr_earn", False)
+    bunker_options = [(b["bunker_id"], f"{b['name']} ({len([x for x in (b.get('tickers_text') or '').split(',') if x.strip()])} tickers)") for b in bunkers]
+    scr_bunker_idx = st.session_state.get("scr_bunker_sel", 0)
+    scr_bunker_idx = min(max(0, scr_bunker_idx), len(bunker_options) - 1) if bunker_options else 0
+    selected_bunker_id = bunker_options[scr_bunker_idx][0] if bunker_options else None
+    tickers_clean = []
+    if selected_bunker_id:
+        bunker_data = get_bunker_by_id(selected_bunker_id, user_id)
+        if bunker_data and bunker_data.get("tickers_text"):
+            tickers_clean = sorted({x.strip().upper() for x in bunker_data["tickers_text"].split(",") if x.strip()})
+    origen_sel = st.session_state.get("origen_escaneo", "🎯 Ticker individual")
+    single_ticker = (st.session_state.get("single_ticker") or "NVDA").strip().upper()
+    if origen_sel == "🎯 Ticker individual" or estrategia == "Covered Call (CC)":
+        tickers_lista = [single_ticker] if single_ticker else []
+    else:
+        tickers_lista = list(tickers_clean)
+
+    av_key = (st.session_state.get("screener_av_key") or "").strip() or (get_user_screener_settings(user_id) or {}).get("av_api_key") or ""
+
+    # ---------- Mensajes si falta config o datos ----------
+    if not token:
+        st.info("Configura el **token Tradier** en **Mi cuenta** (cambia de vista arriba) para ejecutar el barrido.")
+        return
+    if not tickers_lista and not st.session_state.get("screener_manual_symbol"):
+        st.info("En la **barra lateral**: elige **Búnker** y un búnker (o créalo en **Crear y editar búnkers**), o elige **Ticker individual** y escribe un símbolo. Luego pulsa **Iniciar barrido**. También puedes pegar un símbolo Thinkorswim abajo para analizar un contrato.")
+        return
+
+    @st.cache_data(ttl=172800, show_spinner=False)  # 48 h: mismo ticker no se vuelve a consultar
+    def _sync_global_earnings(av_key_local: str):
+        if not av_key_local:
+            return {}
+        try:
+            r = requests.get(
+                "https://www.alphavantage.co/query",
+                params={
+                    "function": "EARNINGS_CALENDAR",
+                    "horizon": "3month",
+                    "apikey": av_key_local,
+                },
+                timeout=15,
+            )
+            return pd.read_csv(io.StringIO(r.text)).set_index("symbol")["reportDate"].to_dict()
+        except Exception:
+            return {}
+
+    @st.cache_data(ttl=3600, show_spinner=False)
+    def _get_market_techs(sym: str):
+        params = {
+            "symbol": sym,
+            "interval": "daily",
+            "start": (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"),
+        }
+        try:
+            r = requests.get(
+                f"{api_tradier}markets/history",
+                params=params,
+                headers=headers_tradier,
+                timeout=10,
+            ).json()
+            df = pd.DataFrame(r["history"]["day"])
+            close = df["close"].astype(float)
+            sma200 = close.iloc[-200:].mean()
+            sma40 = close.iloc[-40:].mean()
+            low_14 = df["low"].astype(float).rolling(14).min()
+            high_14 = df["high"].astype(float).rolling(14).max()
+            stoch = 100 * ((close - low_14) / (high_14 - low_14))
+            tr = np.maximum(
+                df["high"].astype(float) - df["low"].astype(float),
+                abs(df["high"].astype(float) - close.shift(1)),
+            )
+            hv = np.log(close / close.shift(1)).std() * np.sqrt(252) * 100
+            return round(sma200, 2), round(sma40, 2), round(stoch.rolling(3).mean().iloc[-1], 2), round(
+                tr.rolling(14).mean().iloc[-1], 2
+            ), round(hv, 2)
+        except Exception:
+            return None, None, 50.0, 0.0, 0.0
+
+    earnings_db = _shared_earnings_calendar() if _get_shared_av_key() else _sync_global_earnings(av_key)
+
+    # Analizar contrato manual (formato Thinkorswim)
+    manual_sym = st.session_state.get("screener_manual_symbol")
+    if manual_sym:
+        col_back_tos, _ = st.columns([1, 4])
+        with col_back_tos:
+            if st.button("← Volver al menú", type="secondary", key="back_from_tos", use_container_width=True):
+                if "screener_manual_symbol" in st.session_state:
+                    del st.session_state["screener_manual_symbol"]
+                st.rerun()
+        parsed = _parse_thinkorswim_symbol(manual_sym)
+        if not parsed:
+            st.error("Formato de símbolo no válido. Usa formato Thinkorswim: .ROOTYYMMDDP/CSTRIKE (ej. .NOW260227P105 o .NOW260227C108)")
+        else:
+            occ = parsed["occ_symbol"]
+            ticker = parsed["ticker"]
+            exp_str = parsed["exp_str"]
+            exp_date = parsed["exp_date"]
+            option_type = parsed["option_type"]
+            strike = parsed["strike"]
+            today = datetime.now()
+            dte = (exp_date - today.date()).days
+
+            try:
+                opt_q = requests.get(
+                    f"{api_tradier}markets/quotes",
+                    params={"symbols": occ},
+                    headers=headers_tradier,
+                    timeout=10,
+                ).json()
+                und_q = requests.get(
+                    f"{api_tradier}markets/quotes",
+                    params={"symbols": ticker},
+                    headers=headers_tradier,
+                    timeout=10,
+                ).json()
+            except Exception as e:
+                st.error(f"Error al obtener cotizaciones: {e}")
+            else:
+                # Tradier puede devolver quote como objeto o como lista de uno
+                def _normalize_quote(resp: dict, key: str = "quote") -> Optional[dict]:
+                    q = (resp.get("quotes") or {}).get(key) or resp.get(key)
+                    if q is None:
+                        return None
+                    if isinstance(q, list):
+                        return q[0] if q else None
+                    return q
+
+                opt_quote = _normalize_quote(opt_q)
+                und_quote = _normalize_quote(und_q)
+                if not und_quote:
+                    st.error("No se pudo obtener cotización del subyacente. Comprueba que el ticker sea correcto.")
+                elif not opt_quote:
+                    # Fallback: obtener contrato desde la chain de opciones (símbolo + vencimiento)
+                    try:
+                        chain = requests.get(
+                            f"{api_tradier}markets/options/chains",
+                            params={"symbol": ticker, "expiration": exp_str, "greeks": "true"},
+                            headers=headers_tradier,
+                            timeout=10,
+                        ).json()
+                    except Exception as e:
+                        st.error(f"No se encontró el contrato y falló la chain: {e}")
+                    else:
+                        opts = (chain or {}).get("options", {}).get("option")
+                        if not opts:
+                            st.error("No se pudo obtener cotización de la opción. Ese vencimiento o strike puede no existir en Tradier.")
+                        else:
+                            if isinstance(opts, dict):
+                                opts = [opts]
+                            opt = None
+                            for o in opts:
+                                if o.get("option_type") == option_type and abs(float(o.get("strike", 0)) - strike) < 0.01:
+                                    opt = o
+                                    break
+                            if not opt:
+                                st.error("No se encontró ese strike/tipo en la chain. Comprueba el símbolo.")
+                            else:
+                                price = float(und_quote.get("last") or und_quote.get("close") or 0)
+                                bid = float(opt.get("bid") or 0)
+                                ask = float(opt.get("ask") or 0)
+                                premium = round((bid + ask) / 2, 2) if (bid or ask) else 0.0
+                                greeks = opt.get("greeks") or {}
+                                delta = float(greeks.get("delta") or 0) if isinstance(greeks, dict) else 0.0
+                                mid_iv = float(greeks.get("mid_iv") or 0) * 100 if isinstance(greeks, dict) else 0.0
+                                sma200, sma40, stoch_v, atr_v, hv_v = _get_market_techs(ticker) or (None, None, 50.0, 0.0, 0.0)
+                                e_date = earnings_db.get(ticker)
+                                es_earn = "SÍ" if e_date and exp_str >= e_date >= today.strftime("%Y-%m-%d") else "NO"
+                                is_put = option_type == "put"
+                                base = strike if is_put else price
+                                be_val = round(strike - premium, 2) if is_put else round(price - premium, 2)
+                                roi_a = round(((premium / base) * 100) * (365 / max(dte, 1)), 2)
+                                row = {
+                                    "Ticker": ticker,
+                                    "Exp": exp_str,
+                                    "DTE": dte,
+                                    "Precio": price,
+                                    "Strike": strike,
+                                    "Prima": premium,
+                                    "Ret. %": round((premium / base) * 100, 2),
+                                    "ROI Ann %": roi_a,
+                                    "Delta": round(delta, 2),
+                                    "POP %": round((1 + delta) * 100, 2),
+                                    "BE": be_val,
+                                    "Earnings": es_earn,
+                                    "earn_date": e_date,
+                                    "Stoch": stoch_v or 50.0,
+                                    "sma200_val": sma200,
+                                    "sma40_val": sma40,
+                                    "atr_val": atr_v or 0.0,
+                                    "hv": hv_v or 0.0,
+                                    "iv": mid_iv,
+                                }
+                                st.markdown("### 🔍 Análisis de contrato (Thinkorswim)")
+                                st.caption(f"Símbolo: {manual_sym} (desde chain)")
+                                st.markdown("---")
+                                st.subheader(f"🔍 Ficha Sniper: {row['Ticker']} · Strike ${row['Strike']:,.2f}")
+                                c1, c2, c3, c4 = st.columns(4)
+                                with c1:
+                                    st.markdown(f"<div class='metric-card'><b style='color:#2ecc71'>ROI ANUAL</b><br><h3>{row['ROI Ann %']:,.2f}%</h3><b>DTE: {row['DTE']}</b></div>", unsafe_allow_html=True)
+                                with c2:
+                                    st.markdown(f"<div class='metric-card'><b>RETORNO PERIODO</b><br><h3>{row['Ret. %']:,.2f}%</h3><b>{int(row.get('DTE', 0))} días</b></div>", unsafe_allow_html=True)
+                                with c3:
+                                    st.markdown(f"<div class='metric-card'><b>COLLATERAL</b><br><h3>${(row['Strike']*100):,.2f}</h3><b>PRIMA: ${(row['Prima']*100):,.2f}</b></div>", unsafe_allow_html=True)
+                                with c4:
+                                    st.markdown(f"<div class='metric-card'><b style='color:#e74c3c'>CAPITAL RIESGO</b><br><h3>${(row['Strike'] - row['Prima']) * 100:,.2f}</h3><b>BE: ${row['BE']:,.2f}</b></div>", unsafe_allow_html=True)
+                                st.markdown(f"""<div class='vola-master'><h3 style='margin:0; color:#9b59b6;'>📡 Radar de Volatilidad & Riesgo</h3><table style='width:100%; border-collapse: collapse; margin-top:15px;'><tr style='font-size:16px;'><td style='padding:8px;'><b>IV actual:</b> {row['iv']:,.2f}%</td><td style='padding:8px;'><b>HV (histórica):</b> {row['hv']:,.2f}%</td><td style='padding:8px;'><b>ATR (14D):</b> ${row['atr_val']:,.2f}</td><td style='padding:8px; background: rgba(0,242,255,0.1); border-radius:10px; text-align:center;'>{'🎯 <b style="color:#2ecc71">RECOMENDACIÓN: vender prima</b>' if row['iv'] > row['hv'] and row['Earnings'] == 'NO' else '⚖️ <b style="color:#f39c12">RECOMENDACIÓN: evaluar riesgo</b>'}</td></tr></table></div>""", unsafe_allow_html=True)
+                                sma200_cf = row.get("sma200_val")
+                                strike_ok_cf = (sma200_cf is None or (isinstance(sma200_cf, float) and np.isnan(sma200_cf)) or float(row["Strike"]) < float(sma200_cf))
+                                stoch_cf = row.get("Stoch") or 50.0
+                                stoch_ok_cf = float(stoch_cf) < 30 if stoch_cf is not None else False
+                                earn_ok_cf = row.get("Earnings") != "SÍ"
+                                st.markdown(f"""<div class='vola-master' style='margin-top:12px;'><h3 style='margin:0; color:#9b59b6;'>⚠️ Riesgos del contrato</h3><table style='width:100%; border-collapse: collapse; margin-top:10px;'><tr style='font-size:15px;'><td style='padding:8px;'><b>SMA 200:</b> {'✅ Strike bajo SMA 200' if strike_ok_cf else '⚠️ Strike sobre SMA 200'}</td><td style='padding:8px;'><b>Stochastic full &lt;30:</b> {'✅ Cumple' if stoch_ok_cf else '⚠️ No cumple'}</td><td style='padding:8px;'><b>Earnings:</b> {'✅ No hay' if earn_ok_cf else '⚠️ Hay earnings'}</td></tr></table></div>""", unsafe_allow_html=True)
+                                if _get_shared_av_key() or av_key:
+                                    av = _shared_overview(row["Ticker"]) if _get_shared_av_key() else _get_hybrid_overview(row["Ticker"], av_key)
+                                    if av:
+                                        up = round(((av["target"] - row["Precio"]) / row["Precio"]) * 100, 2)
+                                        st.markdown(f"""<div class='fundamental-box'><b>📊 Perfil financiero ({av['source']}):</b><br>Márgenes: <b class='status-ok'>{av['margin']:,.2f}%</b> · ROE: <b class='status-ok'>{av['roe']:,.2f}%</b> · Deuda/Eq: <b class='status-ok'>{av['debt']:,.2f}</b><br>Target analistas: <b class='status-ok'>${av['target']:,.2f}</b> · Potencial: <b class='status-ok'>{up:,.2f}%</b></div>""", unsafe_allow_html=True)
+                                st.markdown("### Análisis del riesgo (medidor)")
+                                prems_f = row["Prima"] * 100
+                                strk_f, be_f, mkt_f = strike, row["BE"], row["Precio"]
+                                is_put_f = option_type == "put"
+                                pnl_f = prems_f - (max(0, (strk_f - mkt_f) * 100) if is_put_f else max(0, (mkt_f - strk_f) * 100))
+                                dte_f = int(row.get("DTE", 0) or 0)
+                                ret_pct_f = float(row.get("Ret. %", 0))
+                                earnings_ok_f = row.get("Earnings") != "SÍ"
+                                from app.position_chart_utils import risk_analysis_score, build_copyable_summary_from_row
+                                score_f = risk_analysis_score(pnl_f, mkt_f, be_f, is_put_f, dte_f, ret_pct_f, earnings_ok_f)
+                                status_f = "Favorable" if score_f > 66 else ("Evaluar" if score_f > 33 else "Desfavorable")
+                                _render_risk_gauge("cadena", strike, be_f, mkt_f, dte_f, status_f, is_put_f)
+                                pop_f = float(row.get("POP %", 0) or 0)
+                                st.markdown(f"""<div class="rad-metrics rad-metrics-grid"><div class="rad-metric"><span class="k">Precio (actual)</span><span class="v">${fmt2(mkt_f)}</span></div><div class="rad-metric"><span class="k">Strike (ejercicio)</span><span class="v">${fmt2(strike)}</span></div><div class="rad-metric"><span class="k">BE (breakeven)</span><span class="v">${fmt2(be_f)}</span></div><div class="rad-metric"><span class="k">DTE (días a venc.)</span><span class="v">{dte_f} días</span></div><div class="rad-metric"><span class="k">Ret. periodo (%)</span><span class="v">{ret_pct_f:,.2f}%</span></div><div class="rad-metric"><span class="k">POP %</span><span class="v">{pop_f:,.2f}%</span></div><div class="rad-metric"><span class="k">P&L actual ($)</span><span class="v">${fmt2(pnl_f)}</span></div><div class="rad-metric"><span class="k">Max ganancia ($)</span><span class="v" style="color:#3fb950">${fmt2(prems_f)}</span></div></div>""", unsafe_allow_html=True)
+                                with st.expander("📋 Copiar / Compartir resumen del contrato", expanded=False):
+                                    copy_text_f = build_copyable_summary_from_row(row, "CSP" if is_put_f else "CC")
+                                    st.text_area("Resumen", value=copy_text_f, height=160, key="copy_chain_fallback", disabled=True, label_visibility="collapsed")
+                                    st.caption("Selecciona todo el texto y cópialo para compartir.")
+                else:
+                    price = float(und_quote.get("last") or und_quote.get("close") or 0)
+                    bid = float(opt_quote.get("bid") or 0)
+                    ask = float(opt_quote.get("ask") or 0)
+                    premium = round((bid + ask) / 2, 2) if (bid or ask) else 0.0
+                    greeks = opt_quote.get("greeks") or {}
+                    if isinstance(greeks, dict):
+                        delta = float(greeks.get("delta") or 0)
+                        mid_iv = float(greeks.get("mid_iv") or 0) * 100
+                    else:
+                        delta = 0.0
+                        mid_iv = 0.0
+                    sma200, sma40, stoch_v, atr_v, hv_v = _get_market_techs(ticker) or (None, None, 50.0, 0.0, 0.0)
+                    e_date = earnings_db.get(ticker)
+                    es_earn = "SÍ" if e_date and exp_str >= e_date >= today.strftime("%Y-%m-%d") else "NO"
+                    is_put = option_type == "put"
+                    base = strike if is_put else price
+                    be_val = round(strike - premium, 2) if is_put else round(price - premium, 2)
+                    roi_a = round(((premium / base) * 100) * (365 / max(dte, 1)), 2)
+                    row = {
+                        "Ticker": ticker,
+                        "Exp": exp_str,
+                        "DTE": dte,
+                        "Precio": price,
+                        "Strike": strike,
+                        "Prima": premium,
+                        "Ret. %": round((premium / base) * 100, 2),
+                        "ROI Ann %": roi_a,
+                        "Delta": round(delta, 2),
+                        "POP %": round((1 + delta) * 100, 2),
+                        "BE": be_val,
+                        "Earnings": es_earn,
+                        "earn_date": e_date,
+                        "Stoch": stoch_v or 50.0,
+                        "sma200_val": sma200,
+                        "sma40_val": sma40,
+                        "atr_val": atr_v or 0.0,
+                        "hv": hv_v or 0.0,
+                        "iv": mid_iv,
+                    }
+                    st.markdown("### 🔍 Análisis de contrato (Thinkorswim)")
+                    st.caption(f"Símbolo: {manual_sym}")
+                    st.markdown("---")
+                    st.subheader(f"🔍 Ficha Sniper: {row['Ticker']} · Strike ${row['Strike']:,.2f}")
+
+                    c1, c2, c3, c4 = st.columns(4)
+                    with c1:
+                        st.markdown(
+                            f"<div class='metric-card'><b style='color:#2ecc71'>ROI ANUAL</b><br><h3>{row['ROI Ann %']:,.2f}%</h3><b>DTE: {row['DTE']}</b></div>",
+                            unsafe_allow_html=True,
+                        )
+                    with c2:
+                        st.markdown(
+                            f"<div class='metric-card'><b>RETORNO PERIODO</b><br><h3>{row['Ret. %']:,.2f}%</h3><b>{int(row.get('DTE', 0))} días</b></div>",
+                            unsafe_allow_html=True,
+                        )
+                    with c3:
+                        st.markdown(
+                            f"<div class='metric-card'><b>COLLATERAL</b><br><h3>${(row['Strike']*100):,.2f}</h3><b>PRIMA: ${(row['Prima']*100):,.2f}</b></div>",
+                            unsafe_allow_html=True,
+                        )
+                    with c4:
+                        st.markdown(
+                            f"<div class='metric-card'><b style='color:#e74c3c'>CAPITAL RIESGO</b><br><h3>${(row['Strike'] - row['Prima']) * 100:,.2f}</h3><b>BE: ${row['BE']:,.2f}</b></div>",
+                            unsafe_allow_html=True,
+                        )
+
+                    st.markdown(
+                        f"""
+                        <div class='vola-master'>
+                            <h3 style='margin:0; color:#9b59b6;'>📡 Radar de Volatilidad & Riesgo</h3>
+                            <table style='width:100%; border-collapse: collapse; margin-top:15px;'>
+                                <tr style='font-size:16px;'>
+                                    <td style='padding:8px;'><b>IV actual:</b> {row['iv']:,.2f}%</td>
+                                    <td style='padding:8px;'><b>HV (histórica):</b> {row['hv']:,.2f}%</td>
+                                    <td style='padding:8px;'><b>ATR (14D):</b> ${row['atr_val']:,.2f}</td>
+                                    <td style='padding:8px; background: rgba(0,242,255,0.1); border-radius:10px; text-align:center;'>
+                                        {'🎯 <b style="color:#2ecc71">RECOMENDACIÓN: vender prima</b>' if row['iv'] > row['hv'] and row['Earnings'] == 'NO' else '⚖️ <b style="color:#f39c12">RECOMENDACIÓN: evaluar riesgo</b>'}
+                                    </td>
+                                </tr>
+                            </table>
+                        </div>
+                        """,
+                        unsafe_allow_html=True,
+                    )
+
+                    # Riesgos: SMA200, Stochastic full <30, Earnings
+                    sma200_r = row.get("sma200_val")
+                    strike_ok_sma = (sma200_r is None or (isinstance(sma200_r, float) and np.isnan(sma200_r)) or float(row["Strike"]) < float(sma200_r))
+                    stoch_v = row.get("Stoch") or 50.0
+                    stoch_ok = float(stoch_v) < 30 if stoch_v is not None else False
+                    earn_ok = row.get("Earnings") != "SÍ"
+                    st.markdown(
+                        f"""
+                        <div class='vola-master' style='margin-top:12px;'>
+                            <h3 style='margin:0; color:#9b59b6;'>⚠️ Riesgos del contrato</h3>
+                            <table style='width:100%; border-collapse: collapse; margin-top:10px;'>
+                                <tr style='font-size:15px;'>
+                                    <td style='padding:8px;'><b>SMA 200:</b> {'✅ Strike bajo SMA 200 (sin riesgo)' if strike_ok_sma else '⚠️ Strike sobre SMA 200 (riesgo)'}</td>
+                                    <td style='padding:8px;'><b>Stochastic full &lt;30:</b> {'✅ Cumple (sobreventa)' if stoch_ok else '⚠️ No cumple'}</td>
+                                    <td style='padding:8px;'><b>Earnings:</b> {'✅ No hay en periodo' if earn_ok else '⚠️ Hay earnings en el periodo'}</td>
+                                </tr>
+                            </table>
+                        </div>
+                        """,
+                        unsafe_allow_html=True,
+                    )
+
+                    if _get_shared_av_key() or av_key:
+                        av = _shared_overview(row["Ticker"]) if _get_shared_av_key() else _get_hybrid_overview(row["Ticker"], av_key)
+                        if av:
+                            up = round(((av["target"] - row["Precio"]) / row["Precio"]) * 100, 2)
+                            st.markdown(
+                                f"""
+                                <div class='fundamental-box'>
+                                   <b>📊 Perfil financiero ({av['source']}):</b><br>
+                                   Márgenes: <b class='status-ok'>{av['margin']:,.2f}%</b> · ROE: <b class='status-ok'>{av['roe']:,.2f}%</b> · Deuda/Eq: <b class='status-ok'>{av['debt']:,.2f}</b><br>
+                                   Target analistas: <b class='status-ok'>${av['target']:,.2f}</b> · Potencial: <b class='status-ok'>{up:,.2f}%</b>
+                                </div>
+                                """,
+                                unsafe_allow_html=True,
+                            )
+
+                    st.markdown("### Análisis del riesgo (medidor)")
+                    is_put_chart = option_type == "put"
+                    prems_m = row["Prima"] * 100
+                    strk_m = strike
+                    be_m = row["BE"]
+                    mkt_m = row["Precio"]
+                    pnl_m = prems_m - (max(0, (strk_m - mkt_m) * 100) if is_put_chart else max(0, (mkt_m - strk_m) * 100))
+                    dte_m = int(row.get("DTE", 0) or 0)
+                    ret_pct_m = float(row.get("Ret. %", 0))
+                    earnings_ok_m = row.get("Earnings") != "SÍ"
+                    from app.position_chart_utils import risk_analysis_score, build_copyable_summary_from_row
+                    score_m = risk_analysis_score(pnl_m, mkt_m, be_m, is_put_chart, dte_m, ret_pct_m, earnings_ok_m)
+                    status_m = "Favorable" if score_m > 66 else ("Evaluar" if score_m > 33 else "Desfavorable")
+                    _render_risk_gauge("cadena", strike, be_m, mkt_m, dte_m, status_m, is_put_chart)
+                    pop_m = float(row.get("POP %", 0) or 0)
+                    st.markdown(
+                        f"""
+                        <div class="rad-metrics rad-metrics-grid">
+                            <div class="rad-metric"><span class="k">Precio (actual)</span><span class="v">${fmt2(mkt_m)}</span></div>
+                            <div class="rad-metric"><span class="k">Strike (ejercicio)</span><span class="v">${fmt2(strike)}</span></div>
+                            <div class="rad-metric"><span class="k">BE (breakeven)</span><span class="v">${fmt2(be_m)}</span></div>
+                            <div class="rad-metric"><span class="k">DTE (días a venc.)</span><span class="v">{dte_m} días</span></div>
+                            <div class="rad-metric"><span class="k">Ret. periodo (%)</span><span class="v">{ret_pct_m:,.2f}%</span></div>
+                            <div class="rad-metric"><span class="k">POP %</span><span class="v">{pop_m:,.2f}%</span></div>
+                            <div class="rad-metric"><span class="k">P&L actual ($)</span><span class="v">${fmt2(pnl_m)}</span></div>
+                            <div class="rad-metric"><span class="k">Max ganancia ($)</span><span class="v" style="color:#3fb950">${fmt2(prems_m)}</span></div>
+                        </div>
+                        """,
+                        unsafe_allow_html=True,
+                    )
+                    with st.expander("📋 Copiar / Compartir resumen del contrato", expanded=False):
+                        copy_text_m = build_copyable_summary_from_row(row, "CSP" if is_put_chart else "CC")
+                        st.text_area("Resumen (selecciona y copia)", value=copy_text_m, height=160, key="copy_manual_quote", disabled=True, label_visibility="collapsed")
+                        st.caption("Selecciona todo el texto y cópialo para compartir (móvil: mantén pulsado).")
+        return
+
+    if run_scan:
+        res_list = []
+        st.markdown("### 🔎 Screener — Resultados del barrido")
+        prog = st.progress(0.0)
+        today = datetime.now()
+        total = len(tickers_lista)
+
+        for idx, sym in enumerate(tickers_lista):
+            if not sym:
+                continue
+            q_res = get_tradier_quote_cached(sym, api_tradier, token or "")
+            quote_data = (q_res or {}).get("quotes", {}).get("quote")
+            if not quote_data:
+                continue
+            price = float(quote_data.get("last", 0) or 0)
+            sma200, sma40, stoch_v, atr_v, hv_v = _get_market_techs(sym)
+
+            e_date = earnings_db.get(sym)
+            exps = get_tradier_expirations_cached(sym, api_tradier, token or "")
+            if not exps or "expirations" not in exps:
+                continue
+            exp_data = exps.get("expirations")
+            if exp_data is None:
+                continue
+            # Tradier puede devolver {"date": ["...", ...]} o a veces otra estructura
+            if isinstance(exp_data, dict) and exp_data.get("date") is not None:
+                date_list = exp_data["date"] if isinstance(exp_data["date"], list) else [exp_data["date"]]
+            elif isinstance(exp_data, list):
+                date_list = exp_data
+            else:
+                continue
+            for d_str in date_list:
+                try:
+                    d_str = str(d_str).strip() if d_str is not None else ""
+                    if not d_str:
+                        continue
+                    dte = (datetime.strptime(d_str[:10], "%Y-%m-%d") - today).days
+                except (ValueError, TypeError):
+                    continue
+                if not (dte_r[0] <= dte <= dte_r[1]):
+                    continue
+                chain = get_tradier_chain_cached(sym, d_str, api_tradier, token or "")
+                if not chain or "options" not in chain or not chain["options"]:
+                    continue
+                opts = chain["options"]["option"]
+                if isinstance(opts, dict):
+                    opts = [opts]
+
+                res_list.extend(
+                    _screen_chain_options(
+                        opts, sym, d_str, dte, price, (sma200, sma40, stoch_v, atr_v, hv_v), e_date, estrategia,
+                        delta_r, f_sma, f_stoch, f_earnings, roi_min_f, colateral_disponible, today,
+                    )
+                )
+            prog.progress((idx + 1) / float(total))
+
+        df_res = pd.DataFrame(res_list)
+        st.session_state["screener_res"] = df_res
+
+    _render_screener_results(st.session_state.get("screener_res"), user_id, estrategia, av_key)
+
+
+@_fragment
+def _render_screener_results(df: Optional[pd.DataFrame], user_id: int, estrategia: str, av_key: str) -> None:
+    """
+    Resultados del barrido (fragmento): tabla con selección de fila, ficha del contrato y registro del trade.
+    Seleccionar otra fila o volver a resultados solo relanza este panel; el barrido no se repite.
+    """
+    if df is None or df.empty:
+        st.markdown("### 🔎 Screener")
+        st.caption("Usa el botón **Iniciar barrido** en la **barra lateral** (Filtros del Screener) para ejecutar el escaneo. Los resultados aparecerán aquí.")
+        return
+
+    st.markdown("### 📊 Dashboard de resultados")
+    df_v = df.copy()
+    df_v["SMA 200"] = df_v.apply(
+        lambda r: "✅" if r["sma200_val"] and r["Strike"] < r["sma200_val"] else "⚠️",
+        axis=1,
+    )
+    df_v["Stoch 📉"] = df_v["Stoch"].map(lambda v: "✅" if v < 30 else "⚠️")
+    for col in ["Precio", "Strike", "Prima", "BE", "Delta", "ROI Ann %", "Ret. %", "POP %"]:
+        df_v[col] = df_v[col].map("{:,.2f}".format)
+
+    df_show_scr = df_v[
+        [
+            "Ticker",
+            "Exp",
+            "DTE",
+            "Precio",
+            "Strike",
+            "Prima",
+            "Ret. %",
+            "ROI Ann %",
+            "Delta",
+            "POP %",
+            "BE",
+            "Earnings",
+            "SMA 200",
+            "Stoch 📉",
+        ]
+    ]
+
+    def _style_earnings(s):
+        if s.name != "Earnings":
+            return [""] * len(s)
+        return [
+            "background-color: rgba(63,185,80,0.22); color: #3fb950; font-weight: 600;"
+            if v == "NO"
+            else "background-color: rgba(248,81,73,0.25); color: #f85149; font-weight: 600;"
+            for v in s
+        ]
+
+    styled_scr = df_show_scr.style.apply(_style_earnings, axis=0)
+
+    event = st.dataframe(
+        styled_scr,
+        width="stretch",
+        hide_index=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key="screener_results_df",
+    )
+
+    # Acceso a filas seleccionadas: por atributos o por dict (según versión Streamlit); key persiste selección
+    selected_rows = None
+    try:
+        sel_obj = getattr(event, "selection", None) or (event.get("selection") if isinstance(event, dict) else None)
+        if sel_obj is not None:
+            selected_rows = getattr(sel_obj, "rows", None) or (sel_obj.get("rows") if isinstance(sel_obj, dict) else None)
+    except Exception:
+        pass
+    if not selected_rows and "screener_results_df" in st.session_state:
+        try:
+            ss = st.session_state.get("screener_results_df") or {}
+            selected_rows = (ss.get("selection") or {}).get("rows")
+        except Exception:
+            pass
+    if selected_rows:
+        # Al seleccionar otra fila distinta a la que se cerró, volver a mostrar la ficha
+        if selected_rows[0] != st.session_state.get("screener_closed_row_index", -1):
+            st.session_state["screener_show_ficha"] = True
+    if selected_rows and st.session_state.get("screener_show_ficha", True):
+        row = df.iloc[selected_rows[0]]
+        col_back_scr, _ = st.columns([1, 4])
+        with col_back_scr:
+            if st.button("← Volver a resultados", type="secondary", key="back_from_screener_ficha", use_container_width=True):
+                st.session_state["screener_show_ficha"] = False
+                st.session_state["screener_closed_row_index"] = selected_rows[0]
+                _rerun_panel()
+        st.markdown("---")
+        st.subheader(f"🔍 Ficha Sniper: {row['Ticker']} · Strike ${row['Strike']:,.2f}")
+
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            st.markdown(
+                f"<div class='metric-card'><b style='color:#2ecc71'>ROI ANUAL</b><br><h3>{row['ROI Ann %']:,.2f}%</h3><b>DTE: {row['DTE']}</b></div>",
+                unsafe_allow_html=True,
+            )
+        with c2:
+            st.markdown(
+                f"<div class='metric-card'><b>RETORNO PERIODO</b><br><h3>{row['Ret. %']:,.2f}%</h3><b>Prima/base · {int(row.get('DTE', 0))} días</b></div>",
+                unsafe_allow_html=True,
+            )
+        with c3:
+            st.markdown(
+                f"<div class='metric-card'><b>COLLATERAL</b><br><h3>${(row['Strike']*100):,.2f}</h3><b>PRIMA: ${(row['Prima']*100):,.2f}</b></div>",
+                unsafe_allow_html=True,
+            )
+        with c4:
+            st.markdown(
+                f"<div class='metric-card'><b style='color:#e74c3c'>CAPITAL RIESGO</b><br><h3>${(row['Strike'] - row['Prima']) * 100:,.2f}</h3><b>BE: ${row['BE']:,.2f}</b></div>",
+                unsafe_allow_html=True,
+            )
+
+        st.markdown(
+            f"""
+            <div class='vola-master'>
+                <h3 style='margin:0; color:#9b59b6;'>📡 Radar de Volatilidad & Riesgo</h3>
+                <table style='width:100%; border-collapse: collapse; margin-top:15px;'>
+                    <tr style='font-size:16px;'>
+                        <td style='padding:8px;'><b>IV actual:</b> {row['iv']:,.2f}%</td>
+                        <td style='padding:8px;'><b>HV (histórica):</b> {row['hv']:,.2f}%</td>
+                        <td style='padding:8px;'><b>ATR (14D):</b> ${row['atr_val']:,.2f}</td>
+                        <td style='padding:8px; background: rgba(0,242,255,0.1); border-radius:10px; text-align:center;'>
+                            {'🎯 <b style="color:#2ecc71">RECOMENDACIÓN: vender prima</b>' if row['iv'] > row['hv'] and row['Earnings'] == 'NO' else '⚖️ <b style="color:#f39c12">RECOMENDACIÓN: evaluar riesgo</b>'}
+                        </td>
+                    </tr>
+                </table>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+
+        if _get_shared_av_key() or av_key:
+            av = _shared_overview(row["Ticker"]) if _get_shared_av_key() else _get_hybrid_overview(row["Ticker"], av_key)
+            if av:
+                up = round(((av["target"] - row["Precio"]) / row["Precio"]) * 100, 2)
+                st.markdown(
+                    f"""
+                    <div class='fundamental-box'>
+                       <b>📊 Perfil financiero ({av['source']}):</b><br>
+                       Márgenes: <b class='status-ok'>{av['margin']:,.2f}%</b> · ROE: <b class='status-ok'>{av['roe']:,.2f}%</b> · Deuda/Eq: <b class='status-ok'>{av['debt']:,.2f}</b><br>
+                       Target analistas: <b class='status-ok'>${av['target']:,.2f}</b> · Potencial: <b class='status-ok'>{up:,.2f}%</b>
+                    </div>
+                    """,
+                    unsafe_allow_html=True,
+                )
+
+        st.markdown("### Análisis del riesgo (medidor)")
+        is_put = estrategia == "Cash Secured Put (CSP)"
+        prems = row["Prima"] * 100
+        strike = float(row["Strike"])
+        be = float(row["BE"])
+        mkt = float(row["Precio"])
+        strk = strike or (mkt * 0.9)
+        pnl_scr = prems - (max(0, (strk - mkt) * 100) if is_put else max(0, (mkt - strk) * 100))
+        dte_scr = int(row.get("DTE", 0) or 0)
+        ret_pct = float(row.get("Ret. %", 0))
+        earnings_ok_scr = row.get("Earnings") != "SÍ"
+        from app.position_chart_utils import risk_analysis_score, build_copyable_summary_from_row
+        score_scr = risk_analysis_score(pnl_scr, mkt, be, is_put, dte_scr, ret_pct, earnings_ok_scr)
+        status_scr = "Favorable" if score_scr > 66 else ("Evaluar" if score_scr > 33 else "Desfavorable")
+        _render_risk_gauge("screener", strike, be, mkt, dte_scr, status_scr, is_put)
+        pop_scr = float(row.get("POP %", 0) or 0)
+        st.markdown(
+            f"""
+            <div class="rad-metrics rad-metrics-grid">
+                <div class="rad-metric"><span class="k">Precio (actual)</span><span class="v">${fmt2(mkt)}</span></div>
+                <div class="rad-metric"><span class="k">Strike (ejercicio)</span><span class="v">${fmt2(strike)}</span></div>
+                <div class="rad-metric"><span class="k">BE (breakeven)</span><span class="v">${fmt2(be)}</span></div>
+                <div class="rad-metric"><span class="k">DTE (días a venc.)</span><span class="v">{dte_scr} días</span></div>
+                <div class="rad-metric"><span class="k">Ret. periodo (%)</span><span class="v">{ret_pct:,.2f}%</span></div>
+                <div class="rad-metric"><span class="k">POP %</span><span class="v">{pop_scr:,.2f}%</span></div>
+                <div class="rad-metric"><span class="k">P&L actual ($)</span><span class="v">${fmt2(pnl_scr)}</span></div>
+                <div class="rad-metric"><span class="k">Max ganancia ($)</span><span class="v" style="color:#3fb950">${fmt2(prems)}</span></div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
+        with st.expander("📋 Copiar / Compartir resumen del contrato", expanded=False):
+            copy_text_scr = build_copyable_summary_from_row(row, "CSP" if is_put else "CC")
+            st.text_area("Resumen (selecciona y copia para compartir)", value=copy_text_scr, height=180, key="copy_screener_row", disabled=True, label_visibility="collapsed")
+            st.caption("Selecciona todo el texto de arriba y cópialo (Ctrl+C o mantén pulsado en móvil) para compartir por mensaje o correo.")
+
+        account_id_scr = get_current_account_id()
+        with st.expander("📝 Abrir trade desde esta ficha", expanded=False):
+            if not account_id_scr:
+                st.info("Selecciona una cuenta en **Mi cuenta** (pestaña Dashboard) para poder registrar el trade aquí.")
+            else:
+                st.caption("Pre-rellenado con los datos del contrato seleccionado. Ajusta si quieres y registra.")
+                try:
+                    exp_date_row = datetime.strptime(str(row["Exp"])[:10], "%Y-%m-%d").date()
+                except Exception:
+                    exp_date_row = date.today() + timedelta(days=30)
+                trade_date_scr = st.date_input("Fecha", value=date.today(), key="scr_trade_date").isoformat()
+                ticker_scr = st.text_input("Ticker", value=str(row["Ticker"]), key="scr_ticker").strip().upper()
+                qty_scr = st.number_input("Contratos", min_value=1, value=1, key="scr_qty")
+                strike_scr = st.number_input("Strike", min_value=0.0, value=float(row["Strike"]), step=0.5, key="scr_strike")
+                premium_scr = st.number_input("Prima por contrato", min_value=0.0, value=float(row["Prima"]), step=0.01, key="scr_premium")
+                exp_scr = st.date_input("Expiración", value=exp_date_row, key="scr_exp")
+                comment_scr = st.text_area("Comentario", value="", key="scr_comment")
+                if estrategia == "Cash Secured Put (CSP)":
+                    if st.button("Registrar CSP desde ficha", key="scr_btn_csp"):
+                        if ticker_scr and strike_scr > 0:
+                            register_csp_opening(account_id_scr, user_id, ticker_scr, qty_scr, strike_scr, premium_scr, exp_scr.isoformat(), trade_date_scr, comment_scr or None)
+                            st.success("CSP registrado.")
+                            st.rerun()
+                        else:
+                            st.error("Ticker y strike obligatorios.")
+                else:
+                    shares_needed_scr = qty_scr * 100
+                    shares_now_scr = get_stock_quantity(account_id_scr, ticker_scr) if ticker_scr else 0
+                    if ticker_scr and shares_now_scr < shares_needed_scr:
+                        st.warning(f"Covered Call requiere tener las acciones. Tienes **{shares_now_scr}** de {ticker_scr}; necesitas **{shares_needed_scr}**.")
+                    if st.button("Registrar CC desde ficha", key="scr_btn_cc"):
+                        if not ticker_scr:
+                            st.error("Indica el ticker.")
+                        elif strike_scr <= 0:
+                            st.error("Strike mayor que 0.")
+                        elif get_stock_quantity(account_id_scr, ticker_scr) < qty_scr * 100:
+                            st.error("No tienes suficientes acciones. Registra antes compra directa o asignación.")
+                        else:
+                            register_cc_opening(account_id_scr, user_id, ticker_scr, qty_scr, strike_scr, premium_scr, exp_scr.isoformat(), trade_date_scr, comment_scr or None)
+                            st.success("CC registrado.")
+                            st.rerun()
@@ -0,0 +1 @@
+# AlphaWheel Pro - Benchmarks de rutas críticas (negocio, reportes, screener)
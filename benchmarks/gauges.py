@@ -0,0 +1,80 @@
+# AlphaWheel Pro - Comparación de renderizadores del medidor "Análisis del riesgo": Plotly vs SVG
+# Para N posiciones sintéticas mide, sin caché (memo vaciado), el tiempo de construir cada medidor y de dejarlo
+# listo para el navegador (Plotly: figura + to_json como hace st.plotly_chart; SVG: la cadena), y el tamaño enviado.
+# Plotly necesita además el runtime plotly.js en el navegador (varios MB, una vez por sesión); el SVG no.
+#
+# Uso:
+#   python -m benchmarks.gauges                  # 50 medidores
+#   python -m benchmarks.gauges --count 200 --repeat 5
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import plotly.io as pio
+
+from app import position_chart_utils as charts
+
+
+def _inputs(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        strike = round(rng.uniform(5, 500), 2)
+        rows.append((
+            strike,
+            round(strike * rng.uniform(0.9, 1.0), 2),
+            round(strike * rng.uniform(0.8, 1.2), 2),
+            rng.randint(0, 60),
+            rng.choice(["Favorable", "Evaluar", "Desfavorable"]),
+        ))
+    return rows
+
+
+def _plotly(row) -> int:
+    return len(pio.to_json(charts.build_gauge_price_axis(*row), validate=False).encode("utf-8"))
+
+
+def _svg(row) -> int:
+    return len(charts.build_gauge_price_axis_svg(*row).encode("utf-8"))
+
+
+def run(count: int, repeat: int) -> dict:
+    rows = _inputs(count)
+    results = {}
+    for name, render, clear in (
+        ("plotly", _plotly, charts._price_axis_gauge.cache_clear),
+        ("svg", _svg, charts._price_axis_svg.cache_clear),
+    ):
+        times = []
+        for _ in range(repeat):
+            clear()
+            t0 = time.perf_counter()
+            sizes = [render(r) for r in rows]
+            times.append((time.perf_counter() - t0) / count)
+        results[name] = {"ms_per_gauge": statistics.median(times) * 1000, "bytes_per_gauge": statistics.mean(sizes)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Medidor de riesgo: Plotly vs SVG (tiempo y tamaño por medidor)")
+    parser.add_argument("--count", type=int, default=50, help="medidores distintos por repetición")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    # Calentar: plantilla base de Plotly e imports
+    charts.build_gauge_price_axis(100, 98, 103, 10, "Favorable")
+    results = run(args.count, args.repeat)
+    print(f"{'renderizador':<14}{'ms/medidor':>12}{'bytes/medidor':>16}")
+    for name, r in results.items():
+        print(f"{name:<14}{r['ms_per_gauge']:>12.3f}{r['bytes_per_gauge']:>16,.0f}")
+    p, s = results["plotly"], results["svg"]
+    print(f"SVG: {p['ms_per_gauge'] / max(s['ms_per_gauge'], 1e-9):.0f}× más rápido, "
+          f"{p['bytes_per_gauge'] / max(s['bytes_per_gauge'], 1):.1f}× más pequeño (sin contar plotly.js)")
+
+
+if __name__ == "__main__":
+    main()
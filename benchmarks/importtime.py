@@ -0,0 +1,126 @@
+# AlphaWheel Pro - Presupuesto de importación (arranque en frío y primer pintado)
+# Cada punto de entrada se importa en un intérprete nuevo con `python -X importtime`.
+# Señales duras (deterministas, no dependen de la máquina):
+#   - ningún punto de entrada carga dependencias que solo hacen falta al usarlas (yfinance y el Screener al
+#     abrirlo, reportlab/openpyxl/fpdf al exportar, pandas fuera de la UI) ni crea una base de datos al importar;
+#   - nº de módulos cargados además de los de un `import streamlit` pelado, con presupuesto por punto de entrada
+#     (pandas solo ya suma ~400: una dependencia pesada nueva lo supera).
+# El tiempo (suma del tiempo propio de los módulos, mínimo de --repeat ejecuciones) se informa como múltiplo del
+# `import streamlit` medido en la misma ejecución; por encima de su presupuesto es un aviso, o un fallo con
+# --strict-time (el reloj varía ±10-20 % entre ejecuciones en la misma máquina).
+#
+# Uso:
+#   python -m benchmarks.importtime                  # sale con código 1 si algo queda fuera de presupuesto
+#   python -m benchmarks.importtime --strict-time --repeat 5   # el tiempo también cuenta como fallo
+#   python -m benchmarks.importtime --show 15        # además, los 15 módulos más lentos de cada entrada
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# plotly no figura: streamlit ya importa plotly.graph_objects; lo caro son las figuras (app.position_chart_utils)
+_DEFERRED = ("yfinance", "reportlab", "openpyxl", "fpdf", "app.screener", "app.position_chart_utils")
+
+# Referencia: todo punto de entrada de la app importa al menos streamlit
+BASELINE = "import streamlit"
+
+# (nombre, sentencia de import, máx. módulos además de BASELINE, tiempo máx. en múltiplos de BASELINE,
+#  módulos que no deben cargarse)
+ENTRY_POINTS = (
+    (
+        "login (app/Home.py)",
+        "import database.db, auth.auth, app.styles, app.debug_panel, app.profiler, database.instrumentation",
+        60,
+        1.5,
+        _DEFERRED + ("pandas", "numpy", "app.cockpit"),
+    ),
+    ("cockpit", "import app.cockpit", 650, 2.6, _DEFERRED),
+    (
+        "main_app (cabecera)",
+        "import app.data_cache, dashboard, reports.bitacora, providers.tradier, business.wheel, app.debug_panel",
+        650,
+        2.6,
+        _DEFERRED + ("app.cockpit",),
+    ),
+    ("reports (CLI)", "import reports.bitacora", 160, 1.6, _DEFERRED + ("pandas",)),
+    ("trading_logic", "import trading_logic", 30, 0.25, _DEFERRED + ("streamlit", "pandas")),
+)
+
+
+def measure(statement: str) -> tuple:
+    """(ms totales, {módulo: µs propios}) de un import en un intérprete nuevo; en un directorio temporal vacío."""
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, PYTHONPATH=str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", statement],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{statement!r} falló:\n{proc.stderr[-2000:]}")
+        created = sorted(os.listdir(cwd))
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _cumulative, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = int(self_us)
+    return sum(modules.values()) / 1000.0, modules, created
+
+
+def run(repeat: int, strict_time: bool, show: int) -> tuple:
+    """Mide cada punto de entrada. Devuelve (incumplimientos, avisos de tiempo)."""
+    failures, warnings = [], []
+    base = [measure(BASELINE) for _ in range(repeat)]
+    base_ms = min(r[0] for r in base)
+    base_modules = set(base[-1][1])
+    print(f"referencia: {BASELINE!r} = {base_ms:.1f} ms (mínimo de {repeat}), {len(base_modules)} módulos\n")
+    print(f"{'punto de entrada':<24}{'módulos +':>10}{'máx.':>6}{'ms (mín.)':>12}{'× ref.':>9}{'máx.':>7}")
+    for name, statement, max_extra, max_ratio, forbidden in ENTRY_POINTS:
+        runs = [measure(statement) for _ in range(repeat)]
+        total = min(r[0] for r in runs)
+        modules, created = runs[-1][1], runs[-1][2]
+        extra = len(set(modules) - base_modules)
+        ratio = total / base_ms if base_ms else 0.0
+        print(f"{name:<24}{extra:>10}{max_extra:>6}{total:>12.1f}{ratio:>9.2f}{max_ratio:>7.2f}")
+        if extra > max_extra:
+            failures.append(f"{name}: {extra} módulos además de streamlit > {max_extra}")
+        loaded = sorted(f for f in forbidden if f in modules)
+        if loaded:
+            failures.append(f"{name}: carga {', '.join(loaded)} al importar")
+        if created:
+            failures.append(f"{name}: crea {', '.join(created)} al importar")
+        if ratio > max_ratio:
+            (failures if strict_time else warnings).append(
+                f"{name}: {ratio:.2f}× la referencia > {max_ratio:.2f}× ({total:.0f} ms)"
+            )
+        for mod, us in sorted(modules.items(), key=lambda kv: -kv[1])[:show]:
+            print(f"    {us / 1000.0:>8.1f} ms  {mod}")
+    return failures, warnings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Presupuesto de importación de los puntos de entrada.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--strict-time", action="store_true", help="El tiempo fuera de presupuesto también falla.")
+    parser.add_argument("--show", type=int, default=0, help="Mostrar los N módulos con más tiempo propio.")
+    args = parser.parse_args(argv)
+    failures, warnings = run(max(1, args.repeat), args.strict_time, args.show)
+    if warnings:
+        print("\nAviso (tiempo, no falla sin --strict-time):")
+        for line in warnings:
+            print(f"  - {line}")
+    if failures:
+        print("\nFUERA DE PRESUPUESTO:")
+        for line in failures:
+            print(f"  - {line}")
+        return 1
+    print("\nTodos los puntos de entrada dentro de presupuesto.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
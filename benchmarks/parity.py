@@ -0,0 +1,178 @@
+# AlphaWheel Pro - Paridad de las lecturas de reportes (filtro por rango en SQL) entre SQLite y PostgreSQL
+# Comprueba que db.get_trades_in_range / iter_trades_in_range y las filas de reporte (bitacora._get_trades_for_report
+# e iter_trades_for_report) devuelven lo mismo:
+#   - frente a una referencia en Python (todos los trades de la cuenta filtrados fila a fila, como antes del SQL);
+#   - entre backends: el mismo dataset sintético (database.synthetic, misma semilla) en SQLite y en el PostgreSQL
+#     de --database-url, caso a caso (rangos de fechas, límites de un día, filtros ticker/estrategia/estado).
+# Se comparan todas las columnas salvo created_at (la pone la BD al insertar); los float con tolerancia relativa
+# 1e-6 (REAL en PostgreSQL es de 4 bytes). Código de salida 1 si algún caso difiere.
+#
+# Uso:
+#   python -m benchmarks.parity                                   # SQLite frente a la referencia
+#   python -m benchmarks.parity --database-url postgresql://localhost/alphawheel_bench   # ¡se vacía la BD!
+#   python -m benchmarks.parity --size 5000 --years 4
+import argparse
+import math
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+from benchmarks.run import _prepare_backend
+from database import db
+
+_IGNORED_FIELDS = ("created_at",)
+
+
+def _normalize(rows) -> list:
+    """Filas (TradeRecord / ReportRecord) como dicts comparables, en el orden devuelto."""
+    out = []
+    for r in rows:
+        d = r.to_dict()
+        for name in _IGNORED_FIELDS:
+            d.pop(name, None)
+        out.append(d)
+    return out
+
+
+def _same_value(a, b) -> bool:
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is b
+        return math.isclose(float(a), float(b), rel_tol=1e-6, abs_tol=1e-9)
+    return a == b
+
+
+def _first_difference(left: list, right: list):
+    """Primera diferencia legible entre dos listas de filas, o None si son iguales."""
+    if len(left) != len(right):
+        return f"{len(left)} filas vs {len(right)}"
+    for i, (a, b) in enumerate(zip(left, right)):
+        for key in sorted(set(a) | set(b)):
+            if not _same_value(a.get(key), b.get(key)):
+                return f"fila {i} (trade_id {a.get('trade_id')}): {key} = {a.get(key)!r} vs {b.get(key)!r}"
+    return None
+
+
+def _reference_in_range(account_id: int, date_from, date_to, ticker=None, strategy=None, status=None) -> list:
+    """Referencia en Python: todos los trades de la cuenta y filtro por fecha (apertura O cierre) fila a fila."""
+    def in_range(value):
+        day = (value or "")[:10]
+        return bool(day) and date_from[:10] <= day <= date_to[:10]
+
+    def matches(value, wanted):
+        return not wanted or (value or "").strip().upper() == wanted.strip().upper()
+
+    rows = [
+        t for t in db.get_trades_by_account(account_id)
+        if (not (date_from and date_to) or in_range(t.trade_date) or in_range(t.closed_date))
+        and matches(t.ticker, ticker) and matches(t.strategy_type, strategy) and matches(t.status, status)
+    ]
+    rows.sort(key=lambda t: (t.trade_date, t.trade_id), reverse=True)
+    return rows
+
+
+def _cases(account_id: int) -> list:
+    """
+    (nombre, date_from, date_to, filtros) derivados del propio dataset (mismos en ambos backends): historial
+    completo, último trimestre, un mes, un solo día con aperturas y con cierres, sin fechas y fechas no ISO.
+    """
+    trades = db.get_trades_by_account(account_id)
+    opened = sorted({t.trade_date[:10] for t in trades if t.trade_date})
+    closed = sorted({t.closed_date[:10] for t in trades if t.closed_date})
+    first, last = opened[0], max(opened[-1], closed[-1] if closed else opened[-1])
+    mid_day = opened[len(opened) // 2]
+    close_day = closed[len(closed) // 2] if closed else mid_day
+    month_from = mid_day[:8] + "01"
+    month_to = (date.fromisoformat(month_from) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    quarter_from = (date.fromisoformat(last) - timedelta(days=90)).isoformat()
+    ticker = Counter(t.ticker for t in trades).most_common(1)[0][0]
+    strategy = Counter(t.strategy_type for t in trades).most_common(1)[0][0]
+    return [
+        ("historial completo", first, last, {}),
+        ("último trimestre", quarter_from, last, {}),
+        ("un mes", month_from, month_to.isoformat(), {}),
+        ("día con aperturas", mid_day, mid_day, {}),
+        ("día con cierres", close_day, close_day, {}),
+        ("ticker (minúsculas y espacios)", first, last, {"ticker": f" {ticker.lower()} "}),
+        ("estrategia", quarter_from, last, {"strategy": strategy.lower()}),
+        ("estado CLOSED", month_from, month_to.isoformat(), {"status": "closed"}),
+        ("estado OPEN + ticker", first, last, {"status": "OPEN", "ticker": ticker}),
+        ("sin fechas", None, None, {}),
+        ("fechas no ISO (sin filtro de rango)", "01/02/2024", "28/02/2024", {}),
+    ]
+
+
+def collect(account_id: int) -> tuple:
+    """
+    ({caso: filas normalizadas}, [diferencias frente a la referencia en Python]) en el backend activo.
+    Por caso: get_trades_in_range, iter_trades_in_range, _get_trades_for_report e iter_trades_for_report.
+    """
+    from reports import bitacora
+
+    outputs, mismatches = {}, []
+    for name, d_from, d_to, filters in _cases(account_id):
+        # Las lecturas de BD reciben las fechas ya normalizadas por la bitácora (no ISO → sin filtro de rango)
+        b_from, b_to = bitacora._report_date_bounds(d_from, d_to)
+        in_range = _normalize(db.get_trades_in_range(account_id, b_from, b_to, **filters))
+        report = _normalize(bitacora._get_trades_for_report(account_id, d_from, d_to, **filters))
+        outputs[f"{name}: get_trades_in_range"] = in_range
+        outputs[f"{name}: _get_trades_for_report"] = report
+        checks = [
+            ("iter_trades_in_range", in_range, _normalize(db.iter_trades_in_range(account_id, b_from, b_to, **filters))),
+            ("iter_trades_for_report", report, _normalize(bitacora.iter_trades_for_report(account_id, d_from, d_to, **filters))),
+            ("referencia Python", _normalize(_reference_in_range(account_id, b_from, b_to, **filters)), in_range),
+        ]
+        for label, expected, got in checks:
+            diff = _first_difference(expected, got)
+            if diff:
+                mismatches.append(f"{name}: {label}: {diff}")
+    return outputs, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paridad SQLite / PostgreSQL de las lecturas de reportes.")
+    parser.add_argument("--size", type=int, default=2000, help="Trades de la cuenta sintética.")
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--database-url", default="", help="PostgreSQL local desechable (se vacía antes de generar).")
+    args = parser.parse_args(argv)
+
+    # Sin runtime de Streamlit, st.cache_data avisa en cada función decorada: silenciar
+    try:
+        from streamlit import logger as st_logger
+        st_logger.set_log_level("error")
+    except Exception:
+        pass
+
+    backends = ["sqlite"] + (["postgres"] if args.database_url else [])
+    outputs, failures = {}, []
+    with tempfile.TemporaryDirectory(prefix="alphawheel_parity_") as workdir:
+        for backend in backends:
+            account_id = _prepare_backend(backend, args.size, args.years, args.database_url, workdir)
+            outputs[backend], mismatches = collect(account_id)
+            failures += [f"{backend}: {m}" for m in mismatches]
+            rows = sum(len(v) for v in outputs[backend].values())
+            print(f"{backend:<9} {len(outputs[backend])} consultas, {rows} filas, {len(mismatches)} diferencias con la referencia")
+    config.DATABASE_URL = ""
+
+    if "postgres" in outputs:
+        for key, rows in outputs["sqlite"].items():
+            diff = _first_difference(rows, outputs["postgres"].get(key, []))
+            if diff:
+                failures.append(f"sqlite vs postgres: {key}: {diff}")
+
+    if failures:
+        print("\nDIFERENCIAS:")
+        for line in failures:
+            print(f"  - {line}")
+        return 1
+    print("\nSalida idéntica" + (" en SQLite y PostgreSQL." if "postgres" in outputs else " a la referencia (solo SQLite; --database-url para PostgreSQL)."))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+# AlphaWheel Pro - Suite de benchmarks de rutas críticas
+# Mide tiempo y número de consultas SQL de las rutas que escalan con el historial de la cuenta:
+#   get_position_summary, get_campaign_premiums, _get_trades_for_report, tax_efficiency_summary,
+#   export_trades_excel, export_trades_pdf, la tabla del dashboard (dashboard.metrics), la matriz P&L al
+#   vencimiento (dashboard.payoff) y la etapa de filtrado del screener.
+# Cada tamaño se genera con database.synthetic (una cuenta con N trades) en SQLite y, si se indica,
+# en un PostgreSQL local. Los resultados se comparan con benchmarks/baseline.json:
+#   - señal dura: más consultas SQL o más conexiones que la referencia (deterministas) → código de salida 1;
+#   - tiempo: mínimo de --repeat ejecuciones (el valor menos ruidoso) frente al mínimo de la referencia; solo se
+#     marca si es > referencia × (1 + --tolerance) y además al menos --min-delta-ms más lento. Es un aviso, salvo
+#     con --strict-time (el reloj varía de una ejecución a otra sin cambios de código).
+#
+# Uso:
+#   python -m benchmarks.run                                  # SQLite, tamaños por defecto
+#   python -m benchmarks.run --sizes 500 2000 --repeat 5
+#   python -m benchmarks.run --database-url postgresql://localhost/alphawheel_bench   # ¡se vacía la BD!
+#   python -m benchmarks.run --save-baseline                  # guarda los resultados como nueva referencia
+#   python -m benchmarks.run --repeat 7 --strict-time         # el tiempo también cuenta como regresión
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import config
+from database import db
+from database.synthetic import SyntheticWheelGenerator
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_SIZES = (500, 2000, 5000)
+_SQL_VERBS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+# --- Conteo de consultas (sin tocar el código de producción) ---
+class QueryCounter:
+    """Cuenta conexiones abiertas y sentencias SQL ejecutadas mientras está activo patch()."""
+
+    def __init__(self):
+        self.queries = 0
+        self.connections = 0
+
+    def reset(self):
+        self.queries = 0
+        self.connections = 0
+
+    def _trace(self, sql):
+        if sql.lstrip()[:6].upper().startswith(_SQL_VERBS):
+            self.queries += 1
+
+    @contextmanager
+    def patch(self):
+        orig_get_conn = db.get_conn
+        orig_pg_connect = db.psycopg2.connect if db.psycopg2 else None
+        counter = self
+
+        def counting_get_conn():
+            conn = orig_get_conn()
+            if isinstance(conn, sqlite3.Connection):
+                counter.connections += 1
+                conn.set_trace_callback(counter._trace)
+            return conn
+
+        def counting_pg_connect(*args, **kwargs):
+            counter.connections += 1
+            return _CountingPgConn(orig_pg_connect(*args, **kwargs), counter)
+
+        db.get_conn = counting_get_conn
+        if orig_pg_connect:
+            db.psycopg2.connect = counting_pg_connect
+        try:
+            yield self
+        finally:
+            db.get_conn = orig_get_conn
+            if orig_pg_connect:
+                db.psycopg2.connect = orig_pg_connect
+
+
+class _CountingPgCursor:
+    def __init__(self, cur, counter):
+        self._cur = cur
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter.queries += 1
+        return self._cur.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter.queries += 1
+        return self._cur.executemany(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class _CountingPgConn:
+    def __init__(self, conn, counter):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_counter", counter)
+
+    def cursor(self, *args, **kwargs):
+        return _CountingPgCursor(self._conn.cursor(*args, **kwargs), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+
+# --- Preparación de datos ---
+_PG_TABLES = 'TradeComment, CampaignAdjustment, PositionAdjustment, Dividend, Trade, UserBunker, Account, "User"'
+
+
+def _prepare_backend(backend: str, size: int, years: float, database_url: str, workdir: str) -> int:
+    """Genera una cuenta con ~size trades en el backend indicado y devuelve su account_id."""
+    if backend == "postgres":
+        config.DATABASE_URL = database_url
+        db.init_db()
+        conn = db.psycopg2.connect(database_url)
+        try:
+            conn.cursor().execute(f"TRUNCATE {_PG_TABLES} RESTART IDENTITY CASCADE")
+            conn.commit()
+        finally:
+            conn.close()
+    else:
+        config.DATABASE_URL = ""
+        config.DB_PATH = os.path.join(workdir, f"bench_{size}.db")
+        if os.path.exists(config.DB_PATH):
+            os.remove(config.DB_PATH)
+    SyntheticWheelGenerator(trades=size, users=1, accounts_per_user=1, years=years, seed=size).run()
+    conn = db.get_conn()
+    try:
+        row = conn.execute("SELECT MAX(account_id) AS account_id FROM Account").fetchone()
+        return int(row["account_id"])
+    finally:
+        conn.close()
+
+
+def _first_open_option(account_id: int):
+    trades = db.get_trades_by_account(account_id, status="OPEN")
+    opts = [t for t in trades if (t.get("asset_type") or "").upper() == "OPTION"]
+    return opts[0]["trade_id"] if opts else (trades[0]["trade_id"] if trades else None)
+
+
+def _synthetic_chain(n: int, seed: int):
+    """Cadena de opciones sintética (formato Tradier) con n contratos, mitad puts y mitad calls."""
+    rng = random.Random(seed)
+    price = 100.0
+    opts = []
+    for i in range(n):
+        is_put = i % 2 == 0
+        strike = round(price * rng.uniform(0.7, 1.3), 1)
+        bid = round(max(0.01, rng.uniform(0.05, 6.0)), 2)
+        delta = -rng.uniform(0.01, 0.6) if is_put else rng.uniform(0.01, 0.6)
+        opts.append({
+            "option_type": "put" if is_put else "call",
+            "strike": strike,
+            "bid": bid,
+            "ask": round(bid + rng.uniform(0.01, 0.3), 2),
+            "greeks": {"delta": delta, "mid_iv": rng.uniform(0.2, 0.9)},
+        })
+    return price, opts
+
+
+# --- Casos ---
+def _cases(account_id: int, size: int, date_from: str, date_to: str):
+    from business.wheel import get_position_summary, get_campaign_premiums
+    from reports import bitacora
+    from app.screener import _screen_chain_options
+    from dashboard import metrics as dash
+    from dashboard import payoff
+
+    trade_id = _first_open_option(account_id)
+    price, chain = _synthetic_chain(size, seed=size)
+    today = datetime.now()
+    d_exp = (today + timedelta(days=21)).strftime("%Y-%m-%d")
+    # Dashboard: resúmenes y trades abiertos ya cargados (como en la UI, desde caché); se mide solo el cálculo
+    summaries = get_position_summary(account_id)
+    open_trades = db.get_trades_by_account(account_id, status="OPEN")
+    prices = {t["ticker"]: 100.0 for t in open_trades}
+
+    def screener():
+        for estrategia in ("Cash Secured Put (CSP)", "Covered Call (CC)"):
+            _screen_chain_options(
+                chain, "BENCH", d_exp, 21, price, (95.0, 98.0, 25.0, 2.5, 30.0), None, estrategia,
+                (-0.30, 0.30), True, False, True, 5.0, 20000.0, today,
+            )
+
+    def dashboard():
+        colateral = dash.collateral_total(summaries)
+        dash.market_value(summaries, prices, max(0.0, 100000.0 - colateral))
+        dash.dashboard_frame(summaries, prices, 100000.0, free_shares=dash.free_shares_by_ticker(open_trades))
+
+    return [
+        ("get_position_summary", lambda: get_position_summary(account_id)),
+        ("get_campaign_premiums", lambda: get_campaign_premiums(account_id, trade_id) if trade_id else None),
+        ("_get_trades_for_report", lambda: bitacora._get_trades_for_report(account_id, date_from, date_to)),
+        ("tax_efficiency_summary", lambda: bitacora.tax_efficiency_summary(account_id, date_from, date_to)),
+        ("export_trades_excel", lambda: bitacora.export_trades_excel(account_id, date_from, date_to, "Bench")),
+        ("export_trades_pdf", lambda: bitacora.export_trades_pdf(account_id, date_from, date_to, "Bench")),
+        ("dashboard_frame", dashboard),
+        ("pnl_at_expiry", lambda: payoff.pnl_at_expiry(summaries, prices).portfolio()),
+        ("screener_filter", screener),
+    ]
+
+
+def _measure(fn, repeat: int, counter: QueryCounter) -> dict:
+    times = []
+    queries = connections = 0
+    for i in range(repeat):
+        counter.reset()
+        with counter.patch():
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+        if i == 0:
+            queries, connections = counter.queries, counter.connections
+    return {
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(min(times), 6),
+        "queries": queries,
+        "connections": connections,
+    }
+
+
+def run_suite(backends, sizes, repeat: int, years: float, database_url: str = "", only=None) -> dict:
+    results = {}
+    counter = QueryCounter()
+    date_to = date.today().isoformat()
+    date_from = (date.today() - timedelta(days=int(years * 365) + 30)).isoformat()
+    with tempfile.TemporaryDirectory(prefix="alphawheel_bench_") as workdir:
+        for backend in backends:
+            for size in sizes:
+                account_id = _prepare_backend(backend, size, years, database_url, workdir)
+                for name, fn in _cases(account_id, size, date_from, date_to):
+                    if only and name not in only:
+                        continue
+                    key = f"{backend}:{size}:{name}"
+                    results[key] = _measure(fn, repeat, counter)
+                    r = results[key]
+                    print(f"{key:<45} {r['min_s'] * 1000:>10.1f} ms (mín.)  {r['queries']:>7} q  {r['connections']:>6} conn")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_s: float = 0.03) -> tuple:
+    """
+    (regresiones, avisos de tiempo) frente a la referencia.
+    Regresión: más consultas o más conexiones que la referencia. Aviso de tiempo: mínimo > mínimo de referencia
+    × (1 + tolerance) y al menos min_delta_s más lento (por debajo de eso es ruido del reloj).
+    """
+    regressions, slow = [], []
+    for key, r in results.items():
+        b = baseline.get(key)
+        if not b:
+            continue
+        for field, label in (("queries", "consultas"), ("connections", "conexiones")):
+            if r[field] > b.get(field, r[field]):
+                regressions.append(f"{key}: {label} {b[field]} → {r[field]}")
+        ref = b.get("min_s", b.get("median_s"))
+        if ref is None:
+            continue
+        if r["min_s"] > ref * (1 + tolerance) and r["min_s"] - ref > min_delta_s:
+            slow.append(f"{key}: {ref * 1000:.1f} ms → {r['min_s'] * 1000:.1f} ms (mín.)")
+    return regressions, slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de rutas críticas de AlphaWheel.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Trades por cuenta.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--database-url", default="", help="PostgreSQL local desechable (se vacía antes de cada tamaño).")
+    parser.add_argument("--only", nargs="+", default=None, help="Solo estos casos (p. ej. get_position_summary).")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar (fusionar) los resultados como referencia.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Margen relativo de tiempo (0.25 = +25%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=30.0, help="Diferencias de tiempo menores se ignoran.")
+    parser.add_argument("--strict-time", action="store_true", help="Los avisos de tiempo también cuentan como regresión.")
+    parser.add_argument("--output", default=None, help="Escribir resultados en JSON.")
+    args = parser.parse_args(argv)
+
+    # Sin runtime de Streamlit, st.cache_data avisa en cada función decorada: silenciar
+    try:
+        from streamlit import logger as st_logger
+        st_logger.set_log_level("error")
+    except Exception:
+        pass
+
+    backends = ["sqlite"] + (["postgres"] if args.database_url else [])
+    results = run_suite(backends, args.sizes, max(1, args.repeat), args.years, args.database_url, args.only)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    if args.save_baseline:
+        baseline.update(results)
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Referencia guardada en {baseline_path}")
+        return 0
+
+    regressions, slow = compare(results, baseline, args.tolerance, args.min_delta_ms / 1000.0)
+    if args.strict_time:
+        regressions += slow
+    elif slow:
+        print("\nAviso (tiempo, no falla sin --strict-time):")
+        for line in slow:
+            print(f"  - {line}")
+    if regressions:
+        print("\nREGRESIONES respecto a la referencia:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    print("\nSin regresiones respecto a la referencia." if baseline else "\nSin referencia guardada (usa --save-baseline).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
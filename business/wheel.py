@@ -3,6 +3,7 @@ from datetime import date
 from typing import List, Dict, Any, Optional
 
 from database import db
+from database.records import TradeRecord
 from engine.calculations import round2, safe_float, net_cost_basis
 
 
@@ -49,27 +50,28 @@ def register_assignment(
 ) -> int:
     """
     Registra asignación: Put expira ITM → se reciben acciones.
-    Cierra el CSP (parent) y crea trade de stock con entry_type=ASSIGNMENT.
+    Cierra el CSP (parent) y crea trade de stock con entry_type=ASSIGNMENT, en una sola transacción.
     """
     trade_date = trade_date or str(date.today())
-    # Cerrar el CSP original
-    db.close_trade(parent_trade_id, account_id, trade_date)
-    # Registrar entrada de acciones por asignación
-    return db.insert_trade(
-        account_id=account_id,
-        ticker=ticker,
-        asset_type="STOCK",
-        quantity=quantity,
-        price=round2(assignment_price),
-        strike=None,
-        expiration_date=None,
-        strategy_type="ASSIGNMENT",
-        status="OPEN",
-        entry_type="ASSIGNMENT",
-        trade_date=trade_date,
-        parent_trade_id=parent_trade_id,
-        comment=comment,
-    )
+    with db.transaction():
+        # Cerrar el CSP original
+        db.close_trade(parent_trade_id, account_id, trade_date)
+        # Registrar entrada de acciones por asignación
+        return db.insert_trade(
+            account_id=account_id,
+            ticker=ticker,
+            asset_type="STOCK",
+            quantity=quantity,
+            price=round2(assignment_price),
+            strike=None,
+            expiration_date=None,
+            strategy_type="ASSIGNMENT",
+            status="OPEN",
+            entry_type="ASSIGNMENT",
+            trade_date=trade_date,
+            parent_trade_id=parent_trade_id,
+            comment=comment,
+        )
 
 
 def register_direct_purchase(
@@ -208,14 +210,14 @@ def _campaign_trade_ids(account_id: int, trade_id: int) -> set:
     chain_ids = set()
     t = db.get_trade_by_id(account_id, trade_id)
     while t:
-        chain_ids.add(t["trade_id"])
-        t = db.get_trade_by_id(account_id, t.get("parent_trade_id")) if t.get("parent_trade_id") else None
+        chain_ids.add(t.trade_id)
+        t = db.get_trade_by_id(account_id, t.parent_trade_id) if t.parent_trade_id else None
     all_trades = db.get_trades_by_account(account_id)
     while True:
         added = False
         for t in all_trades:
-            if t["trade_id"] not in chain_ids and t.get("parent_trade_id") in chain_ids:
-                chain_ids.add(t["trade_id"])
+            if t.trade_id not in chain_ids and t.parent_trade_id in chain_ids:
+                chain_ids.add(t.trade_id)
                 added = True
         if not added:
             break
@@ -233,15 +235,15 @@ def get_campaign_premiums(account_id: int, trade_id: int) -> float:
     all_trades = db.get_trades_by_account(account_id)
     total = 0.0
     for t in all_trades:
-        if t["trade_id"] not in campaign_ids:
+        if t.trade_id not in campaign_ids:
             continue
-        if (t.get("asset_type") or "").upper() != "OPTION":
+        if (t.asset_type or "").upper() != "OPTION":
             continue
         # Recompra: usar buyback_debit si está en BD (precisión); si no, price*qty*100 (price negativo)
-        if (t.get("close_type") or "").lower() == "buyback" and t.get("buyback_debit") is not None:
-            total -= safe_float(t.get("buyback_debit"))
+        if (t.close_type or "").lower() == "buyback" and t.buyback_debit is not None:
+            total -= safe_float(t.buyback_debit)
         else:
-            total += safe_float(t.get("price")) * int(t.get("quantity", 0)) * 100
+            total += safe_float(t.price) * int(t.quantity or 0) * 100
     root_id = get_campaign_root_id(account_id, trade_id)
     if root_id:
         adj = db.get_campaign_adjustment(account_id, root_id)
@@ -266,12 +268,14 @@ def close_trade_by_buyback(
     buyback_debit = total en USD pagado por recomprar (precio_por_acción × 100 × contratos recomprados).
     Ej: 0.02 $/acción y 2 contratos → total = 4 $.
 
+    Todas las escrituras van en una sola transacción (no queda una recompra a medio registrar).
+
     Devuelve el trade_id del nuevo trade de recompra o None si falla.
     """
     t = db.get_trade_by_id(account_id, trade_id)
-    if not t or (t.get("status") or "").upper() != "OPEN" or (t.get("asset_type") or "").upper() != "OPTION":
+    if not t or (t.status or "").upper() != "OPEN" or (t.asset_type or "").upper() != "OPTION":
         return None
-    qty = int(t.get("quantity") or 0)
+    qty = int(t.quantity or 0)
     if qty <= 0:
         return None
     qty_close = quantity_to_close if quantity_to_close is not None else qty
@@ -280,28 +284,29 @@ def close_trade_by_buyback(
     # Precio por acción (negativo = débito): total / (100 × contratos recomprados)
     price_per_contract = -(debit / (qty_close * 100)) if qty_close else 0.0
     price_stored = round(price_per_contract, 6) if price_per_contract else 0.0
-    recompra_id = db.insert_trade(
-        account_id=account_id,
-        ticker=t["ticker"],
-        asset_type="OPTION",
-        quantity=qty_close,
-        price=price_stored,
-        strike=t.get("strike"),
-        expiration_date=t.get("expiration_date"),
-        strategy_type=t.get("strategy_type") or "CSP",
-        status="CLOSED",
-        entry_type="CLOSING",
-        trade_date=closed_date,
-        closed_date=closed_date,
-        parent_trade_id=trade_id,
-        comment="Recompra",
-    )
-    if recompra_id:
-        db.set_trade_buyback(recompra_id, account_id, debit)
-    if qty_close >= qty:
-        db.close_trade(trade_id, account_id, closed_date)
-    else:
-        db.update_trade(trade_id, account_id, quantity=qty - qty_close)
+    with db.transaction():
+        recompra_id = db.insert_trade(
+            account_id=account_id,
+            ticker=t.ticker,
+            asset_type="OPTION",
+            quantity=qty_close,
+            price=price_stored,
+            strike=t.strike,
+            expiration_date=t.expiration_date,
+            strategy_type=t.strategy_type or "CSP",
+            status="CLOSED",
+            entry_type="CLOSING",
+            trade_date=closed_date,
+            closed_date=closed_date,
+            parent_trade_id=trade_id,
+            comment="Recompra",
+        )
+        if recompra_id:
+            db.set_trade_buyback(recompra_id, account_id, debit)
+        if qty_close >= qty:
+            db.close_trade(trade_id, account_id, closed_date)
+        else:
+            db.update_trade(trade_id, account_id, quantity=qty - qty_close)
     return recompra_id
 
 
@@ -321,10 +326,10 @@ def get_stock_quantity(account_id: int, ticker: str) -> int:
     total_shares = 0
     cc_contracts = 0
     for t in trades:
-        if (t.get("asset_type") or "").upper() == "STOCK":
-            total_shares += int(t.get("quantity") or 0)
-        elif (t.get("asset_type") or "").upper() == "OPTION" and (t.get("strategy_type") or "").upper() == "CC":
-            cc_contracts += int(t.get("quantity") or 0)
+        if (t.asset_type or "").upper() == "STOCK":
+            total_shares += int(t.quantity or 0)
+        elif (t.asset_type or "").upper() == "OPTION" and (t.strategy_type or "").upper() == "CC":
+            cc_contracts += int(t.quantity or 0)
 
     shares_committed = max(0, cc_contracts * 100)
     free_shares = max(0, total_shares - shares_committed)
@@ -334,14 +339,14 @@ def get_stock_quantity(account_id: int, ticker: str) -> int:
 def get_campaign_start_date(account_id: int, trade_id: int) -> Optional[str]:
     """Fecha de inicio de la campaña: trade_date del trade más antiguo en la cadena (raíz)."""
     t = db.get_trade_by_id(account_id, trade_id)
-    root_date = t.get("trade_date") if t else None
+    root_date = t.trade_date if t else None
     while t:
-        pid = t.get("parent_trade_id")
+        pid = t.parent_trade_id
         if not pid:
             break
         t = db.get_trade_by_id(account_id, pid)
-        if t and t.get("trade_date"):
-            root_date = t["trade_date"]
+        if t and t.trade_date:
+            root_date = t.trade_date
     return root_date
 
 
@@ -354,20 +359,20 @@ def get_campaign_days(account_id: int, trade_id: int) -> int:
     total_days = 0
     t = db.get_trade_by_id(account_id, trade_id)
     while t:
-        td = t.get("trade_date")
+        td = t.trade_date
         if not td:
-            pid = t.get("parent_trade_id")
+            pid = t.parent_trade_id
             t = db.get_trade_by_id(account_id, pid) if pid else None
             continue
         try:
             d0 = date.fromisoformat(str(td)[:10])
         except (ValueError, TypeError):
-            pid = t.get("parent_trade_id")
+            pid = t.parent_trade_id
             t = db.get_trade_by_id(account_id, pid) if pid else None
             continue
-        status = (t.get("status") or "").upper()
+        status = (t.status or "").upper()
         if status == "CLOSED":
-            cd = t.get("closed_date")
+            cd = t.closed_date
             if cd:
                 try:
                     d1 = date.fromisoformat(str(cd)[:10])
@@ -376,7 +381,7 @@ def get_campaign_days(account_id: int, trade_id: int) -> int:
                     pass
         else:
             total_days += max(0, (today - d0).days)
-        pid = t.get("parent_trade_id")
+        pid = t.parent_trade_id
         t = db.get_trade_by_id(account_id, pid) if pid else None
     return total_days
 
@@ -393,17 +398,49 @@ def get_campaign_root_id(account_id: int, trade_id: int) -> Optional[int]:
     t = db.get_trade_by_id(account_id, trade_id)
     if not t:
         return None
-    root_id = t.get("trade_id")
-    while t and t.get("parent_trade_id"):
-        pid = t["parent_trade_id"]
+    root_id = t.trade_id
+    while t and t.parent_trade_id:
+        pid = t.parent_trade_id
         parent = db.get_trade_by_id(account_id, pid)
         if not parent:
             break
-        root_id = parent.get("trade_id", root_id)
+        root_id = parent.trade_id
         t = parent
     return root_id
 
 
+def resolve_campaigns(parent_map: Dict[int, tuple]) -> Dict[int, tuple]:
+    """
+    Raíz y fecha de inicio de campaña de todos los trades en una sola pasada.
+
+    parent_map: {trade_id: (parent_trade_id, trade_date)} (ver db.get_trade_parent_map).
+    Devuelve {trade_id: (campaign_root_id, campaign_start_date)} con la misma semántica que
+    get_campaign_root_id / get_campaign_start_date, pero memoizando cada cadena: O(trades)
+    en lugar de una consulta por eslabón y trade.
+    """
+    # chain[tid] = (raíz, fecha no vacía más cercana a la raíz o None)
+    chain: Dict[int, tuple] = {}
+    for tid in parent_map:
+        if tid in chain:
+            continue
+        path, seen = [], set()
+        cur = tid
+        while cur is not None and cur not in chain and cur not in seen:
+            path.append(cur)
+            seen.add(cur)
+            pid = parent_map[cur][0]
+            cur = pid if pid and pid in parent_map else None
+        base = chain.get(cur) if cur is not None else None
+        for x in reversed(path):
+            own_date = parent_map[x][1] or None
+            if base is None:
+                base = (x, own_date)
+            else:
+                base = (base[0], base[1] or own_date)
+            chain[x] = base
+    return {tid: (root, start or parent_map[tid][1]) for tid, (root, start) in chain.items()}
+
+
 def get_position_summary(
     account_id: int,
     ticker: str = None,
@@ -427,7 +464,7 @@ def get_position_summary(
     # Agrupar trades abiertos por ticker, separando stock y opciones
     by_ticker: Dict[str, Dict[str, Any]] = {}
     for t in trades:
-        tk = t["ticker"]
+        tk = t.ticker
         bucket = by_ticker.setdefault(
             tk,
             {
@@ -435,7 +472,7 @@ def get_position_summary(
                 "options": [],  # trades de opciones abiertos
             },
         )
-        if (t.get("asset_type") or "").upper() == "STOCK":
+        if (t.asset_type or "").upper() == "STOCK":
             bucket["stocks"].append(t)
         else:
             bucket["options"].append(t)
@@ -457,11 +494,11 @@ def get_position_summary(
         options = buckets["options"]
 
         # Totales de acciones y primas por ticker (para calcular cost basis global)
-        total_stock_qty = sum(int(s.get("quantity") or 0) for s in stocks)
-        total_stock_cost = sum(safe_float(s.get("price")) * int(s.get("quantity") or 0) for s in stocks)
+        total_stock_qty = sum(int(s.quantity or 0) for s in stocks)
+        total_stock_cost = sum(safe_float(s.price) * int(s.quantity or 0) for s in stocks)
         total_premiums_all = 0.0
         for opt in options:
-            total_premiums_all += get_campaign_premiums(account_id, opt["trade_id"])
+            total_premiums_all += get_campaign_premiums(account_id, opt.trade_id)
 
         div_total = div_by_ticker.get(tk, 0.0)
         adj_total = adj_by_ticker.get(tk, 0.0)
@@ -484,10 +521,10 @@ def get_position_summary(
         # Acciones disponibles para CC (se asignan primero a campañas de CC)
         shares_available_for_cc = total_stock_qty
 
-        def _build_option_row(opt_trade: Dict[str, Any], assigned_shares: int) -> None:
+        def _build_option_row(opt_trade: TradeRecord, assigned_shares: int) -> None:
             """Crea una fila de resumen para una campaña de opciones (CSP o CC)."""
-            premiums_chain = get_campaign_premiums(account_id, opt_trade["trade_id"])
-            strategy = opt_trade.get("strategy_type")
+            premiums_chain = get_campaign_premiums(account_id, opt_trade.trade_id)
+            strategy = opt_trade.strategy_type
             is_cc = (strategy or "").upper() == "CC"
 
             # Datos base de la campaña
@@ -496,13 +533,13 @@ def get_position_summary(
                 "premiums_received": safe_float(premiums_chain),
                 "stock_quantity": int(assigned_shares or 0),
                 "stock_cost_total": safe_float(cost_per_share * assigned_shares) if assigned_shares else 0.0,
-                "option_contracts": int(opt_trade.get("quantity") or 0),
-                "strike": opt_trade.get("strike"),
-                "expiration_date": opt_trade.get("expiration_date"),
+                "option_contracts": int(opt_trade.quantity or 0),
+                "strike": opt_trade.strike,
+                "expiration_date": opt_trade.expiration_date,
                 "strategy_type": strategy,
-                "trade_date": get_campaign_start_date(account_id, opt_trade["trade_id"]) or opt_trade.get("trade_date"),
-                "trade_id_last": opt_trade.get("trade_id"),
-                "campaign_days": get_campaign_days(account_id, opt_trade["trade_id"]),
+                "trade_date": get_campaign_start_date(account_id, opt_trade.trade_id) or opt_trade.trade_date,
+                "trade_id_last": opt_trade.trade_id,
+                "campaign_days": get_campaign_days(account_id, opt_trade.trade_id),
             }
 
             # Distribuir cost basis, dividendos y ajustes proporcionalmente a las
@@ -520,11 +557,11 @@ def get_position_summary(
             out.append(row)
 
         # 1) Campañas de CC: se les vinculan acciones disponibles (Propias + CC).
-        cc_options = [o for o in options if (o.get("strategy_type") or "").upper() == "CC"]
-        other_options = [o for o in options if (o.get("strategy_type") or "").upper() != "CC"]
+        cc_options = [o for o in options if (o.strategy_type or "").upper() == "CC"]
+        other_options = [o for o in options if (o.strategy_type or "").upper() != "CC"]
 
         for opt in cc_options:
-            needed_shares = max(0, int(opt.get("quantity") or 0) * 100)
+            needed_shares = max(0, int(opt.quantity or 0) * 100)
             assigned = min(shares_available_for_cc, needed_shares)
             _build_option_row(opt, assigned_shares=assigned)
             shares_available_for_cc -= assigned
@@ -539,8 +576,8 @@ def get_position_summary(
             remaining_cost_total = safe_float(cost_per_share * remaining_qty) if cost_per_share else safe_float(total_stock_cost)
             # Fechas: tomamos la más antigua de las compras abiertas como inicio.
             trade_date_first = None
-            for st in sorted(stocks, key=lambda x: (x.get("trade_date") or "", x.get("trade_id") or 0)):
-                trade_date_first = st.get("trade_date")
+            for st in sorted(stocks, key=lambda x: (x.trade_date or "", x.trade_id or 0)):
+                trade_date_first = st.trade_date
                 break
 
             # Proporción para dividendos/ajustes sobre estas acciones "libres".
@@ -47,6 +47,19 @@ PRECISION_DECIMALS = 2
 # Alertas: DTE por debajo de este valor se considera "expiración cercana"
 ALERT_DTE_THRESHOLD = 5
 
+# Medidores "Análisis del riesgo": "plotly" (figura interactiva, por defecto) o "svg" (SVG en línea, ligero en móvil).
+# ALPHAWHEEL_GAUGE_RENDERER = "svg" para todas las vistas, o por vista: "posicion=svg,screener=plotly".
+# Vistas: posicion (detalle de posición del dashboard), screener (detalle de resultados), cadena (contrato de la cadena).
+# En la URL, ?gauge=svg (o ?gauge=posicion=svg) lo cambia solo para esa sesión.
+GAUGE_RENDERER = os.environ.get("ALPHAWHEEL_GAUGE_RENDERER", "").strip()
+
+# Caché en memoria de metadatos (cuentas, búnkeres, ajustes del screener) por usuario: las escrituras de este proceso
+# la invalidan al momento; las de otra réplica o de la CLI se ven como mucho tras estos segundos. 0 = sin caché.
+try:
+    METADATA_CACHE_TTL = max(0.0, float(os.environ.get("ALPHAWHEEL_METADATA_CACHE_TTL", "300")))
+except ValueError:
+    METADATA_CACHE_TTL = 300.0
+
 
 # --- Caché compartida entre usuarios (Tradier y Alpha Vantage) ---
 # Secrets o variables de entorno (se usa la que esté definida):
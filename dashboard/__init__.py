@@ -0,0 +1,20 @@
+# AlphaWheel Pro - Dashboard: métricas de posiciones y P&L al vencimiento sin UI (pandas / NumPy)
+from .metrics import (
+    collateral_total,
+    dashboard_frame,
+    free_shares_by_ticker,
+    market_value,
+    option_symbols,
+)
+from .payoff import DEFAULT_MOVES, PnlAtExpiry, pnl_at_expiry
+
+__all__ = [
+    "DEFAULT_MOVES",
+    "PnlAtExpiry",
+    "collateral_total",
+    "dashboard_frame",
+    "free_shares_by_ticker",
+    "market_value",
+    "option_symbols",
+    "pnl_at_expiry",
+]
@@ -0,0 +1,239 @@
+# AlphaWheel Pro - Métricas del dashboard (sin UI): colateral, valor a mercado y tabla de posiciones
+# Entrada: resúmenes de get_position_summary, precios por ticker y, para "Acciones libres", los trades abiertos
+# ya cargados (free_shares_by_ticker) en lugar de una consulta get_stock_quantity por fila.
+# Cada campo se extrae una vez como array NumPy y las fórmulas se aplican por columnas; round2_array aplica la
+# misma regla de 2 decimales que round2, así que la tabla coincide con el cálculo fila a fila anterior.
+from datetime import date
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from engine.calculations import occ_symbol, round2, round2_array
+
+# Orden de la tabla: en riesgo primero, luego perdiendo, luego el resto
+_DIAG_ORDER = {"Riesgo": 0, "Perdiendo": 1}
+
+
+def _num(rows: Sequence[Dict], key: str) -> np.ndarray:
+    """Campo numérico como array float (None / ausente → 0)."""
+    return np.nan_to_num(np.array([r.get(key) for r in rows], dtype=float), nan=0.0)
+
+
+def _text(rows: Sequence[Dict], key: str) -> np.ndarray:
+    """Campo de texto como array str (None / vacío → '')."""
+    return np.array([str(r.get(key) or "") for r in rows], dtype=str)
+
+
+def _prices(rows: Sequence[Dict], prices: Mapping[str, float]) -> np.ndarray:
+    prices = prices or {}
+    return np.nan_to_num(np.array([prices.get(r["ticker"], 0.0) for r in rows], dtype=float), nan=0.0)
+
+
+def _is_put(strategy: np.ndarray) -> np.ndarray:
+    upper = np.char.upper(strategy)
+    return (upper == "CSP") | (upper == "PUT")
+
+
+def free_shares_by_ticker(open_trades: Iterable[Dict]) -> Dict[str, int]:
+    """
+    Acciones libres por ticker a partir de los trades abiertos: acciones STOCK menos 100 × contratos CC abiertos
+    (mínimo 0). Misma regla que business.wheel.get_stock_quantity, sin una consulta por ticker.
+    """
+    trades = list(open_trades)
+    if not trades:
+        return {}
+    tickers, idx = np.unique(np.array([t["ticker"] for t in trades], dtype=str), return_inverse=True)
+    asset = np.char.upper(_text(trades, "asset_type"))
+    strategy = np.char.upper(_text(trades, "strategy_type"))
+    qty = np.array([int(t.get("quantity") or 0) for t in trades], dtype=np.int64)
+    shares = np.bincount(idx, weights=np.where(asset == "STOCK", qty, 0), minlength=len(tickers))
+    cc = np.bincount(idx, weights=np.where((asset == "OPTION") & (strategy == "CC"), qty, 0), minlength=len(tickers))
+    free = np.maximum(0, shares - np.maximum(0, cc * 100))
+    return {str(t): int(f) for t, f in zip(tickers, free)}
+
+
+def collateral_total(summaries: Sequence[Dict]) -> float:
+    """Colateral comprometido: strike × 100 × contratos en CSP, coste de las acciones en posiciones con acciones."""
+    if not summaries:
+        return 0.0
+    strike = _num(summaries, "strike")
+    csp = (_text(summaries, "strategy_type") == "CSP") & (strike != 0)
+    stock = _num(summaries, "stock_quantity") > 0
+    amount = np.where(
+        csp,
+        round2_array(strike) * 100 * _num(summaries, "option_contracts"),
+        np.where(stock, round2_array(_num(summaries, "stock_cost_total")), 0.0),
+    )
+    return round2(float(amount.sum()))
+
+
+def option_symbols(summaries: Sequence[Dict]) -> List[Optional[str]]:
+    """Símbolo OCC de la opción vendida de cada resumen (put si CSP/PUT, call si no); None sin contratos abiertos."""
+    return [
+        occ_symbol(r["ticker"], r.get("expiration_date"), "P" if put else "C", r.get("strike") or 0)
+        if q > 0 else None
+        for r, put, q in zip(summaries, _is_put(_text(summaries, "strategy_type")), _num(summaries, "option_contracts"))
+    ]
+
+
+def market_value(
+    summaries: Sequence[Dict],
+    prices: Mapping[str, float],
+    cash: float,
+    option_marks: Optional[Mapping[str, float]] = None,
+) -> float:
+    """
+    Valor a precios actuales: efectivo + acciones a mercado + colateral de puts − coste de recomprar las opciones
+    vendidas. option_marks: precio medio bid/ask por símbolo OCC (option_symbols); la opción sin cotización se
+    valora por su valor intrínseco, como antes.
+    """
+    if not summaries:
+        return round2(cash)
+    mkt = _prices(summaries, prices)
+    opt_q = _num(summaries, "option_contracts")
+    strike = _num(summaries, "strike")
+    is_put = _is_put(_text(summaries, "strategy_type"))
+    liability = np.where(is_put, np.maximum(0.0, strike - mkt), np.maximum(0.0, mkt - strike))
+    if option_marks:
+        marks = np.array([option_marks.get(sym, np.nan) if sym else np.nan for sym in option_symbols(summaries)], dtype=float)
+        liability = np.where(np.isnan(marks), liability, marks)
+    options = np.where(is_put, strike * 100 * opt_q, 0.0) - liability * 100 * opt_q
+    stocks = _num(summaries, "stock_quantity") * mkt
+    return round2(float(cash + stocks.sum() + np.where((opt_q != 0) & (strike != 0), options, 0.0).sum()))
+
+
+def _parse_dates(values: np.ndarray) -> pd.DatetimeIndex:
+    """Fechas YYYY-MM-DD (mismo criterio que strptime); inválidas → NaT."""
+    return pd.DatetimeIndex(pd.to_datetime(values, format="%Y-%m-%d", errors="coerce"))
+
+
+def _days(delta: pd.TimedeltaIndex) -> np.ndarray:
+    """Días de un TimedeltaIndex como float (NaT → NaN)."""
+    return np.asarray(delta.days, dtype=float)
+
+
+def _short_dates(raw: np.ndarray, parsed: pd.DatetimeIndex) -> np.ndarray:
+    """'Jan 05' si la fecha es válida; si no, los 10 primeros caracteres; '—' si no hay fecha."""
+    out = np.where(raw != "", raw.astype("<U10"), "—").astype(object)
+    ok = ~parsed.isna()
+    out[ok] = parsed[ok].strftime("%b %d")
+    return out
+
+
+def dashboard_frame(
+    summaries: Sequence[Dict],
+    prices: Mapping[str, float],
+    cap_total: float,
+    free_shares: Optional[Mapping[str, int]] = None,
+    today: Optional[date] = None,
+) -> pd.DataFrame:
+    """
+    Tabla del dashboard (una fila por resumen, ordenada: Riesgo, Perdiendo, resto) con breakeven, colateral,
+    asignación, retorno sobre capital, anualizado, zona ITM/OTM, diagnóstico y POP aproximada.
+    prices: último precio por ticker (0 si falta). free_shares: free_shares_by_ticker(trades abiertos).
+    Columnas de visualización (Activo, Estrategia, …) y auxiliares (SYMBOL, QTY, _DTE, _collat, …) como antes.
+    """
+    if not summaries:
+        return pd.DataFrame()
+    n = len(summaries)
+    tickers = [s["ticker"] for s in summaries]
+    mkt = _prices(summaries, prices)
+    strike = _num(summaries, "strike")
+    has_strike = strike != 0
+    prems = _num(summaries, "premiums_received")
+    contracts = _num(summaries, "option_contracts")
+    stock_qty = _num(summaries, "stock_quantity")
+    has_stock = stock_qty != 0
+    strategy = _text(summaries, "strategy_type")
+    is_put = _is_put(strategy)
+
+    # Fechas: DTE desde hoy; días de inicio a expiración para "Días posición" y el anualizado
+    open_raw = _text(summaries, "trade_date")
+    exp_raw = _text(summaries, "expiration_date")
+    d0 = _parse_dates(open_raw.astype("<U10"))
+    d1 = _parse_dates(exp_raw.astype("<U10"))
+    dte = np.nan_to_num(_days(_parse_dates(np.char.strip(exp_raw)) - pd.Timestamp(today or date.today())), nan=0.0)
+    dte = np.maximum(0, dte).astype(int)
+    span = _days(d1 - d0)
+    span_ok = ~np.isnan(span)
+    span_days = np.maximum(0, np.nan_to_num(span, nan=0.0)).astype(int)
+    campaign_days = np.array([s.get("campaign_days") for s in summaries], dtype=float)
+    dias_posicion = np.where(campaign_days >= 0, campaign_days, np.where(span_ok, span_days, 0)).astype(int)
+    dias_anualizado = np.where(span_ok, span_days, dte)
+
+    # Breakeven (calculate_breakeven): CSP strike − prima/acción; CC coste neto/acción − prima/acción,
+    # o strike + prima/acción si no hay coste; sin contratos, el strike
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cost_per_share = np.where(has_stock, _num(summaries, "net_cost_basis_total") / np.maximum(1, stock_qty), 0.0)
+        per_share = prems / (contracts * 100)
+        be = np.where(is_put, strike - per_share, np.where(cost_per_share > 0, cost_per_share - per_share, strike + per_share))
+    be = np.where(has_strike, round2_array(np.where(contracts > 0, be, strike)), 0.0)
+
+    zone = np.where(has_strike, np.where(np.where(is_put, mkt < strike, mkt > strike), "ITM", "OTM"), "—")
+    # + 0.0: sin strike (o con contratos negativos) el producto sería -0.0 y se mostraría "-0.00"
+    collat = np.where(is_put, strike * 100 * contracts, _num(summaries, "stock_cost_total")) + 0.0
+    alloc_pct = collat / cap_total * 100 if cap_total else np.zeros(n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roc = np.where(collat > 0, round2_array(prems / collat * 100.0), 0.0)
+        ann_ret = np.where(dias_anualizado > 0, round2_array(roc / dias_anualizado * 365.0), 0.0)
+        pop = round2_array(50 + np.abs(mkt - strike) / strike * 100 * 0.5)
+
+    diagnostico = np.where(
+        zone == "ITM", "Riesgo", np.where(has_stock, np.where(mkt >= cost_per_share, "Ganando", "Perdiendo"), "OK")
+    )
+    pop_label = [f"~{min(99, max(1, float(p)))}%" if ok else "N/A" for p, ok in zip(pop, has_strike)]
+    strategy_raw = np.where(strategy == "", "—", strategy)
+    upper = np.char.upper(strategy_raw)
+    paired = has_stock & (contracts != 0)
+    estrategia = np.select(
+        [paired & (upper == "CC"), paired & is_put, strategy_raw == "PROPIAS"],
+        ["Propias + CC", "Propias + CSP", "Propias"],
+        default=strategy_raw,
+    )
+    free_shares = free_shares or {}
+    libres = [int(free_shares.get(t.strip().upper(), 0)) for t in tickers]
+    costo_real = np.where(has_stock & (cost_per_share != 0), round2_array(cost_per_share).astype(object), "—")
+    strike_show = np.where(has_strike, round2_array(strike).astype(object), "—")
+    contracts_col = contracts.astype(int)
+    prems_show = round2_array(prems)
+    be_show = round2_array(be)
+    mkt_show = round2_array(mkt)
+
+    out = pd.DataFrame({
+        "Activo": tickers,
+        "Estrategia": estrategia,
+        "Contratos": contracts_col,
+        "Acciones libres": libres,
+        "Fecha inicio": np.where(open_raw != "", open_raw.astype("<U10"), "—"),
+        "Fecha exp.": np.where(exp_raw != "", exp_raw.astype("<U10"), "—"),
+        "Días posición": dias_posicion,
+        "Precio MKT": mkt_show,
+        "Strike": strike_show,
+        "Prima recibida": prems_show,
+        "Breakeven": be_show,
+        "Costo real ($/acc)": costo_real,
+        "Diagnostico": diagnostico,
+        "Retorno": round2_array(roc),
+        "Anualizado": round2_array(ann_ret),
+        "POP": pop_label,
+        "SYMBOL": tickers,
+        "QTY": contracts_col,
+        "NET PREM": prems_show,
+        "COLLAT": round2_array(collat),
+        "ALLOC %": round2_array(alloc_pct),
+        "OPEN": _short_dates(open_raw, d0),
+        "EXP": _short_dates(exp_raw, d1),
+        "DUR": [f"{d}d" for d in dte],
+        "BE": be_show,
+        "MKT": mkt_show,
+        "Estrategia_raw": strategy_raw,
+        "Zona": zone,
+        "Exp_Date": [s.get("expiration_date") or "" for s in summaries],
+        "Open_Date": [s.get("trade_date") or "" for s in summaries],
+        "_DTE": dte,
+        "_collat": collat,
+        "_prems": prems,
+    })
+    out["_sort_diag"] = [_DIAG_ORDER.get(d, 2) for d in diagnostico]
+    return out.sort_values("_sort_diag").drop(columns=["_sort_diag"])
@@ -0,0 +1,78 @@
+# AlphaWheel Pro - P&L al vencimiento (Radiografía P&L) de todas las posiciones abiertas en una sola matriz
+# Entrada: resúmenes de get_position_summary y precios por ticker. Rejilla común de movimientos del subyacente
+# (0,5× … 1,5× del precio de referencia de cada posición); una operación con broadcasting NumPy da la matriz
+# posiciones × precios. La curva de una posición es una fila; la de la cartera, la suma por columnas
+# (todos los subyacentes se mueven el mismo %).
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from dashboard.metrics import _is_put, _num, _prices, _text
+
+DEFAULT_MOVES = np.linspace(0.5, 1.5, 101)
+
+
+@dataclass(frozen=True)
+class PnlAtExpiry:
+    """Matriz de P&L al vencimiento: pnl[i, j] es el P&L de la posición i con su subyacente en prices[i, j]."""
+
+    tickers: List[str]
+    strategies: List[str]
+    moves: np.ndarray  # (G,) múltiplos del precio de referencia
+    prices: np.ndarray  # (P, G) precio del subyacente por posición
+    pnl: np.ndarray  # (P, G) P&L en $ al vencimiento
+
+    def position(self, i: int) -> tuple:
+        """(precios, P&L) de la posición i."""
+        return self.prices[i], self.pnl[i]
+
+    def portfolio(self) -> np.ndarray:
+        """P&L total de la cartera para cada movimiento de la rejilla."""
+        return self.pnl.sum(axis=0)
+
+
+def pnl_at_expiry(
+    summaries: Sequence[Dict],
+    prices: Mapping[str, float],
+    moves: Optional[np.ndarray] = None,
+) -> PnlAtExpiry:
+    """
+    P&L al vencimiento de cada resumen sobre la rejilla de movimientos (por defecto DEFAULT_MOVES).
+    Precio de referencia: último precio del ticker; sin cotización, el strike o el coste por acción.
+    - Sin acciones: primas cobradas − valor intrínseco de la opción vendida (put: K − S, call: S − K) × 100 × contratos.
+    - Con acciones (Propias, Propias + CC): acciones × S − coste neto (que ya descuenta las primas cobradas)
+      − valor intrínseco de la call vendida.
+    """
+    moves = DEFAULT_MOVES if moves is None else np.asarray(moves, dtype=float)
+    if not summaries:
+        empty = np.zeros((0, len(moves)))
+        return PnlAtExpiry([], [], moves, empty, empty.copy())
+    strike = _num(summaries, "strike")
+    contracts = _num(summaries, "option_contracts") * 100
+    stock_qty = _num(summaries, "stock_quantity")
+    has_stock = stock_qty > 0
+    net_cost = _num(summaries, "net_cost_basis_total")
+    basis = np.where(net_cost > 0, net_cost, _num(summaries, "stock_cost_total"))
+    strategy = _text(summaries, "strategy_type")
+    is_put = _is_put(strategy)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ref = _prices(summaries, prices)
+        ref = np.where(ref > 0, ref, np.where(strike > 0, strike, np.where(has_stock, basis / stock_qty, 0.0)))
+    ref = np.where(ref > 0, ref, 1.0)
+
+    s = ref[:, None] * moves[None, :]  # (P, G)
+    k = strike[:, None]
+    short_payoff = np.where(is_put[:, None], np.maximum(0.0, k - s), np.maximum(0.0, s - k)) * contracts[:, None]
+    short_payoff = np.where((strike > 0)[:, None], short_payoff, 0.0)
+    premiums = np.where(has_stock, 0.0, _num(summaries, "premiums_received"))
+    stock_leg = np.where(has_stock[:, None], stock_qty[:, None] * s - basis[:, None], 0.0)
+    pnl = premiums[:, None] + stock_leg - short_payoff
+    return PnlAtExpiry(
+        tickers=[r["ticker"] for r in summaries],
+        strategies=[str(r.get("strategy_type") or "") for r in summaries],
+        moves=moves,
+        prices=s,
+        pnl=pnl,
+    )
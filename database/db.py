@@ -4,10 +4,17 @@
 # directa psycopg2 cuando _is_postgres() para evitar fallos del wrapper en la versión web.
 import sqlite3
 import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import config
+from database.instrumentation import InstrumentedSqliteConnection, InstrumentedPgConnection
+from database.records import TradeRecord, row_factory
 
 try:
     import psycopg2
@@ -39,21 +46,10 @@ def _schema_path(name="schema.sql"):
     return Path(__file__).resolve().parent / name
 
 
-# --- Wrapper para PostgreSQL (misma API que SQLite: ? -> %s, lastrowid vía lastval()) ---
+# --- Wrapper para PostgreSQL (misma API que SQLite: ? -> %s). Sin lastrowid: los INSERT usan _insert_returning ---
 class _PgCursorWrapper:
     def __init__(self, cursor):
         self._cur = cursor
-        self._lastrowid = None
-        try:
-            self._cur.execute("SELECT lastval()")
-            row = self._cur.fetchone()
-            self._lastrowid = row[0] if row and row[0] else None
-        except Exception:
-            pass
-
-    @property
-    def lastrowid(self):
-        return self._lastrowid
 
     @property
     def rowcount(self):
@@ -89,6 +85,12 @@ def _pg_quote_user_table(sql: str) -> str:
     return sql
 
 
+@lru_cache(maxsize=512)
+def _pg_translate(sql: str) -> str:
+    """SQL de SQLite a PostgreSQL (? -> %s, tabla User entre comillas). Memoizado: las sentencias se repiten en cada rerun."""
+    return _pg_quote_user_table(sql.replace("?", "%s"))
+
+
 class _PgConnWrapper:
     def __init__(self, conn):
         self._conn = conn
@@ -99,8 +101,7 @@ class _PgConnWrapper:
         return self._conn
 
     def execute(self, sql, params=None):
-        sql = sql.replace("?", "%s")
-        sql = _pg_quote_user_table(sql)
+        sql = _pg_translate(sql)
         cur = self._conn.cursor(cursor_factory=pg_extras.RealDictCursor)
         try:
             cur.execute(sql, params or ())
@@ -112,6 +113,9 @@ class _PgConnWrapper:
     def commit(self):
         self._conn.commit()
 
+    def rollback(self):
+        self._conn.rollback()
+
     def close(self):
         self._conn.close()
 
@@ -122,17 +126,176 @@ class _PgConnWrapper:
                 self.execute(stmt)
 
 
+def _pg_connect():
+    """Conexión psycopg2 instrumentada (latencia, filas y origen de cada consulta; ver database.instrumentation)."""
+    return psycopg2.connect(config.DATABASE_URL, connection_factory=InstrumentedPgConnection)
+
+
 def get_conn():
-    """Conexión a SQLite o PostgreSQL según config. Misma API: conn.execute(sql, params), cur.lastrowid, cur.fetchone() (dict)."""
+    """Conexión a SQLite o PostgreSQL según config. Misma API: conn.execute(sql, params), cur.fetchone() (dict).
+    Para obtener la clave de un INSERT usar _insert_returning (RETURNING en PostgreSQL, lastrowid en SQLite)."""
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True  # Evita InFailedSqlTransaction: cada sentencia es su propia transacción
         return _PgConnWrapper(conn)
-    conn = sqlite3.connect(config.DB_PATH)
+    conn = sqlite3.connect(config.DB_PATH, factory=InstrumentedSqliteConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def _insert_returning(conn, sql: str, params, pk: str):
+    """Ejecuta un INSERT y devuelve la clave generada: RETURNING <pk> en PostgreSQL (un solo viaje), cursor.lastrowid en SQLite."""
+    if _is_postgres():
+        row = conn.execute(f"{sql} RETURNING {pk}", params).fetchone()
+        return row[pk] if row else None
+    return conn.execute(sql, params).lastrowid
+
+
+# --- Unidad de trabajo: varias escrituras en una sola conexión y un solo commit ---
+_tx_local = threading.local()
+
+
+def _active_tx():
+    """Conexión de la transacción abierta en este hilo con transaction(), o None."""
+    return getattr(_tx_local, "conn", None)
+
+
+@contextmanager
+def transaction():
+    """
+    Agrupa varias escrituras en una transacción: una conexión, un commit al salir y rollback si hay excepción.
+    Las funciones de escritura de trades (insert_trade, close_trade, close_trade_by_expiration, update_trade,
+    set_trade_buyback, delete_trade, upsert_campaign_adjustment) usan la conexión activa en lugar de abrir y confirmar la suya. Anidable: el bloque interno se une al externo.
+
+        with db.transaction():
+            db.close_trade(...)
+            db.insert_trade(...)
+    """
+    active = _active_tx()
+    if active is not None:
+        yield active
+        return
+    conn = get_conn()
+    if _is_postgres():
+        conn.raw_conn.autocommit = False
+    _tx_local.conn = conn
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _tx_local.conn = None
+        conn.close()
+
+
+@contextmanager
+def _unit_conn():
+    """Conexión de la transacción activa (sin commit ni cierre) o una propia que se confirma y cierra al salir."""
+    active = _active_tx()
+    if active is not None:
+        yield active
+        return
+    conn = get_conn()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# --- Versión de datos por cuenta (invalidación exacta de cachés) ---
+# Cada escritura de trades, dividendos, ajustes, comentarios o comisiones de campaña suma 1 a DataVersion en
+# su misma transacción. Las lecturas cacheadas de la UI reciben la versión como argumento: la caché no necesita
+# TTL y una escritura (de este proceso, de otra réplica o de la CLI) se ve en el siguiente rerun.
+# La configuración de la cuenta también cuenta (cap_total es el capital de referencia del resumen fiscal);
+# el token y el estado de conexión no, porque no entran en esas lecturas.
+_DATA_VERSION_BUMP = """INSERT INTO DataVersion (account_id, version) VALUES (?, 1)
+    ON CONFLICT (account_id) DO UPDATE SET version = DataVersion.version + 1"""
+
+
+def _bump_data_version(conn, account_id: int) -> None:
+    """Suma 1 a la versión de datos de la cuenta en la conexión (y transacción) de la escritura."""
+    conn.execute(_DATA_VERSION_BUMP, (account_id,))
+
+
+def get_data_version(account_id: int) -> int:
+    """Versión actual de los datos de la cuenta (0 si nunca se escribió). Una lectura por clave primaria."""
+    if not account_id:
+        return 0
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT version FROM DataVersion WHERE account_id = ?", (account_id,)).fetchone()
+        return int(row["version"] or 0) if row else 0
+    finally:
+        conn.close()
+
+
+# --- Caché de metadatos (usuarios, cuentas, búnkeres, ajustes del screener) ---
+# Son filas que cambian muy poco pero se leen en cada rerun (selector de cuenta, token, búnkeres del screener).
+# Se guardan en memoria del proceso por (BD, tipo, user_id), compartidas por todas las sesiones del usuario; cada
+# escritura de este módulo sobre esas filas descarta su entrada al confirmar (el estado de conexión se escribe
+# también en la copia cacheada). Escrituras de otra réplica o de la CLI se ven al caducar config.METADATA_CACHE_TTL.
+# _meta_epoch cuenta invalidaciones: una lectura que empezó antes de una escritura no se guarda.
+_meta_lock = threading.Lock()
+_meta_cache = {}  # (BD, tipo, user_id) -> (instante, valor)
+_meta_epoch = 0
+
+
+def _meta_key(kind: str, user_id) -> tuple:
+    return (config.DATABASE_URL or config.DB_PATH, kind, int(user_id))
+
+
+def _meta_copy(value):
+    """Copia de lo cacheado (lista de dicts, dict o None) para que quien la reciba pueda modificarla."""
+    if isinstance(value, list):
+        return [dict(r) for r in value]
+    return dict(value) if isinstance(value, dict) else value
+
+
+def _meta_cached(kind: str, user_id, load):
+    """Metadatos del usuario (user_id 0: listas globales) desde la caché; si no están o caducaron, load() y se guardan."""
+    ttl = config.METADATA_CACHE_TTL
+    if user_id is None or ttl <= 0:
+        return load()
+    key = _meta_key(kind, user_id)
+    with _meta_lock:
+        hit = _meta_cache.get(key)
+        epoch = _meta_epoch
+    if hit is not None and time.monotonic() - hit[0] < ttl:
+        return _meta_copy(hit[1])
+    value = load()
+    with _meta_lock:
+        if _meta_epoch == epoch:
+            _meta_cache[key] = (time.monotonic(), value)
+    return _meta_copy(value)
+
+
+def invalidate_metadata(kind: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """
+    Descarta metadatos cacheados: kind "users", "accounts", "bunkers" o "settings" (None = todos) de user_id
+    (None = todos).
+    Las escrituras de este módulo ya lo llaman; sirve para cambios hechos por fuera (SQL directo, scripts).
+    """
+    global _meta_epoch
+    with _meta_lock:
+        _meta_epoch += 1
+        for key in list(_meta_cache):
+            if (kind is None or key[1] == kind) and (user_id is None or key[2] == int(user_id)):
+                del _meta_cache[key]
+
+
+def _patch_cached_account(account_id: int, **fields) -> None:
+    """Escribe fields en la fila cacheada de la cuenta (la de cualquier usuario que la tenga en caché)."""
+    with _meta_lock:
+        for key, (_at, accounts) in _meta_cache.items():
+            if key[1] == "accounts":
+                for a in accounts:
+                    if a.get("account_id") == account_id:
+                        a.update(fields)
+
+
 def _run_pg_schema(conn):
     path = _schema_path("schema_pg.sql")
     if not path.exists():
@@ -187,11 +350,13 @@ def init_db():
             try:
                 conn.execute("ALTER TABLE Trade ADD COLUMN IF NOT EXISTS close_type TEXT")
                 conn.execute("ALTER TABLE Trade ADD COLUMN IF NOT EXISTS buyback_debit REAL")
+                conn.execute("ALTER TABLE MonthlyRollup DROP COLUMN IF EXISTS commissions_fees")
                 conn.commit()
             except Exception:
                 pass
         finally:
             conn.close()
+        _ensure_monthly_rollup()
         return
 
     schema_path = _schema_path("schema.sql")
@@ -233,6 +398,12 @@ def init_db():
             conn.commit()
         except sqlite3.OperationalError:
             pass
+        try:
+            # MonthlyRollup ya no guarda comisiones/fees (tax_efficiency_summary las suma por campaña en el rango)
+            conn.execute("ALTER TABLE MonthlyRollup DROP COLUMN commissions_fees")
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass
         conn.execute("""
             CREATE TABLE IF NOT EXISTS UserBunker (
                 bunker_id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -274,6 +445,7 @@ def init_db():
             pass
     finally:
         conn.close()
+    _ensure_monthly_rollup()
 
 # --- Usuarios (aislamiento raíz) ---
 def ensure_user(email: str, display_name: str = None):
@@ -286,12 +458,15 @@ def ensure_user(email: str, display_name: str = None):
         row = cur.fetchone()
         if row:
             return row["user_id"]
-        cur = conn.execute(
+        user_id = _insert_returning(
+            conn,
             "INSERT INTO User (email, display_name) VALUES (?, ?)",
             (email.strip(), display_name or email),
+            "user_id",
         )
         conn.commit()
-        return cur.lastrowid
+        invalidate_metadata("users")
+        return user_id
     finally:
         conn.close()
 
@@ -299,7 +474,7 @@ def get_user_by_email(email: str):
     """Obtiene usuario por email (para login)."""
     if _is_postgres():
         # Ruta directa con psycopg2 para evitar ProgrammingError en fetchone con el wrapper
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         try:
             cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
             cur.execute(
@@ -323,7 +498,12 @@ def get_user_by_email(email: str):
 
 
 def get_users():
-    """Lista todos los usuarios (para selector en UI)."""
+    """Lista todos los usuarios (para selector en UI). Caché de metadatos."""
+    return _meta_cached("users", 0, _load_users)
+
+
+def _load_users():
+    """Lectura de get_users (sin caché)."""
     conn = get_conn()
     try:
         cur = conn.execute("SELECT user_id, email, display_name FROM User ORDER BY email")
@@ -336,14 +516,17 @@ def create_user_with_password(email: str, display_name: str, password_hash: str)
     """Crea usuario con contraseña hasheada. Devuelve user_id."""
     conn = get_conn()
     try:
-        cur = conn.execute(
+        user_id = _insert_returning(
+            conn,
             "INSERT INTO User (email, display_name, password_hash) VALUES (?, ?, ?)",
             (email.strip().lower(), (display_name or email).strip(), password_hash),
+            "user_id",
         )
         conn.commit()
-        return cur.lastrowid
+        return user_id
     finally:
         conn.close()
+        invalidate_metadata("users")
 
 
 def update_user_password(user_id: int, password_hash: str):
@@ -357,11 +540,18 @@ def update_user_password(user_id: int, password_hash: str):
 
 
 def get_user_screener_settings(user_id: int) -> dict:
-    """Devuelve av_api_key y screener_watchlist del usuario (screener es por usuario, no por cuenta)."""
+    """Devuelve av_api_key y screener_watchlist del usuario (screener es por usuario, no por cuenta). Caché de metadatos."""
+    if not user_id:
+        return {"av_api_key": "", "screener_watchlist": ""}
+    return _meta_cached("settings", user_id, lambda: _load_user_screener_settings(user_id))
+
+
+def _load_user_screener_settings(user_id: int) -> dict:
+    """Lectura de get_user_screener_settings (sin caché)."""
     if not user_id:
         return {"av_api_key": "", "screener_watchlist": ""}
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
@@ -399,13 +589,14 @@ def get_user_screener_settings(user_id: int) -> dict:
 def update_user_av_key(user_id: int, av_api_key: str) -> None:
     """Guarda la clave Alpha Vantage del usuario (screener)."""
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor()
             cur.execute('UPDATE "User" SET av_api_key = %s WHERE user_id = %s', (av_api_key or "", user_id))
         finally:
             conn.close()
+            invalidate_metadata("settings", user_id)
         return
     conn = get_conn()
     try:
@@ -413,6 +604,7 @@ def update_user_av_key(user_id: int, av_api_key: str) -> None:
         conn.commit()
     finally:
         conn.close()
+        invalidate_metadata("settings", user_id)
 
 
 def update_user_screener_watchlist(user_id: int, watchlist: str) -> None:
@@ -423,15 +615,24 @@ def update_user_screener_watchlist(user_id: int, watchlist: str) -> None:
         conn.commit()
     finally:
         conn.close()
+        invalidate_metadata("settings", user_id)
+        invalidate_metadata("bunkers", user_id)
 
 
 # --- Búnkeres por usuario (varios por usuario para búsquedas selectivas) ---
 def get_user_bunkers(user_id: int) -> list:
-    """Lista de búnkeres del usuario: [{"bunker_id", "name", "tickers_text", "created_at"}, ...]."""
+    """Lista de búnkeres del usuario: [{"bunker_id", "name", "tickers_text", "created_at"}, ...]. Caché de metadatos."""
+    if not user_id:
+        return []
+    return _meta_cached("bunkers", user_id, lambda: _load_user_bunkers(user_id))
+
+
+def _load_user_bunkers(user_id: int) -> list:
+    """Lectura de get_user_bunkers (sin caché)."""
     if not user_id:
         return []
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
@@ -455,32 +656,10 @@ def get_user_bunkers(user_id: int) -> list:
 
 
 def get_bunker_by_id(bunker_id: int, user_id: int) -> Optional[dict]:
-    """Un búnker por ID (solo si pertenece al usuario)."""
+    """Un búnker por ID (solo si pertenece al usuario); de la lista cacheada de get_user_bunkers."""
     if not bunker_id or not user_id:
         return None
-    if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
-        conn.autocommit = True
-        try:
-            cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
-            cur.execute(
-                "SELECT bunker_id, user_id, name, tickers_text, created_at FROM UserBunker WHERE bunker_id = %s AND user_id = %s",
-                (bunker_id, user_id),
-            )
-            row = cur.fetchone()
-            return dict(row) if row else None
-        finally:
-            conn.close()
-    conn = get_conn()
-    try:
-        cur = conn.execute(
-            "SELECT bunker_id, user_id, name, tickers_text, created_at FROM UserBunker WHERE bunker_id = ? AND user_id = ?",
-            (bunker_id, user_id),
-        )
-        row = cur.fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    return next((b for b in get_user_bunkers(user_id) if str(b["bunker_id"]) == str(bunker_id)), None)
 
 
 def create_bunker(user_id: int, name: str, tickers_text: str = "") -> Optional[int]:
@@ -488,7 +667,7 @@ def create_bunker(user_id: int, name: str, tickers_text: str = "") -> Optional[i
     if not user_id or not (name or "").strip():
         return None
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
@@ -505,6 +684,7 @@ def create_bunker(user_id: int, name: str, tickers_text: str = "") -> Optional[i
             raise
         finally:
             conn.close()
+            invalidate_metadata("bunkers", user_id)
     conn = get_conn()
     try:
         cur = conn.execute(
@@ -521,6 +701,7 @@ def create_bunker(user_id: int, name: str, tickers_text: str = "") -> Optional[i
         raise
     finally:
         conn.close()
+        invalidate_metadata("bunkers", user_id)
 
 
 def update_bunker(bunker_id: int, user_id: int, name: Optional[str] = None, tickers_text: Optional[str] = None) -> bool:
@@ -528,7 +709,7 @@ def update_bunker(bunker_id: int, user_id: int, name: Optional[str] = None, tick
     if not bunker_id or not user_id:
         return False
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor()
@@ -552,6 +733,7 @@ def update_bunker(bunker_id: int, user_id: int, name: Optional[str] = None, tick
             return cur.rowcount > 0
         finally:
             conn.close()
+            invalidate_metadata("bunkers", user_id)
     conn = get_conn()
     try:
         if name is not None and tickers_text is not None:
@@ -575,6 +757,7 @@ def update_bunker(bunker_id: int, user_id: int, name: Optional[str] = None, tick
         return True
     finally:
         conn.close()
+        invalidate_metadata("bunkers", user_id)
 
 
 def delete_bunker(bunker_id: int, user_id: int) -> bool:
@@ -582,7 +765,7 @@ def delete_bunker(bunker_id: int, user_id: int) -> bool:
     if not bunker_id or not user_id:
         return False
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor()
@@ -590,6 +773,7 @@ def delete_bunker(bunker_id: int, user_id: int) -> bool:
             return cur.rowcount > 0
         finally:
             conn.close()
+            invalidate_metadata("bunkers", user_id)
     conn = get_conn()
     try:
         cur = conn.execute("DELETE FROM UserBunker WHERE bunker_id = ? AND user_id = ?", (bunker_id, user_id))
@@ -597,13 +781,20 @@ def delete_bunker(bunker_id: int, user_id: int) -> bool:
         return cur.rowcount > 0
     finally:
         conn.close()
+        invalidate_metadata("bunkers", user_id)
 
 
 # --- Cuentas (siempre filtradas por user_id) ---
 def get_accounts_by_user(user_id: int):
-    """Cuentas del usuario. Los datos de otro usuario nunca se exponen."""
+    """Cuentas del usuario. Los datos de otro usuario nunca se exponen. Caché de metadatos."""
+    if not user_id:
+        return []
+    return _meta_cached("accounts", user_id, lambda: _load_accounts_by_user(user_id))
+
+def _load_accounts_by_user(user_id: int):
+    """Lectura de get_accounts_by_user (sin caché)."""
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         try:
             cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
             cur.execute(
@@ -625,30 +816,10 @@ def get_accounts_by_user(user_id: int):
         conn.close()
 
 def get_account_by_id(account_id: int, user_id: int):
-    """Una cuenta por ID, solo si pertenece al user_id."""
-    if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
-        conn.autocommit = True
-        try:
-            cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
-            cur.execute(
-                "SELECT * FROM Account WHERE account_id = %s AND user_id = %s",
-                (account_id, user_id),
-            )
-            row = cur.fetchone()
-            return dict(row) if row else None
-        finally:
-            conn.close()
-    conn = get_conn()
-    try:
-        cur = conn.execute(
-            "SELECT * FROM Account WHERE account_id = ? AND user_id = ?",
-            (account_id, user_id),
-        )
-        row = cur.fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    """Una cuenta por ID, solo si pertenece al user_id; de la lista cacheada de get_accounts_by_user."""
+    if not account_id or not user_id:
+        return None
+    return next((a for a in get_accounts_by_user(user_id) if str(a["account_id"]) == str(account_id)), None)
 
 def update_account_token(account_id: int, user_id: int, access_token: str, environment: str = "sandbox"):
     conn = get_conn()
@@ -660,6 +831,7 @@ def update_account_token(account_id: int, user_id: int, access_token: str, envir
         conn.commit()
     finally:
         conn.close()
+        invalidate_metadata("accounts", user_id)
 
 def set_account_connection_status(account_id: int, status: str):
     """status: 'online' | 'offline'."""
@@ -678,17 +850,26 @@ def set_account_connection_status(account_id: int, status: str):
         conn.commit()
     finally:
         conn.close()
+    # Escritura también en la copia cacheada: se llama en cada rerun con token y no debe vaciar la caché
+    checked_at = datetime.now(timezone.utc)
+    _patch_cached_account(
+        account_id,
+        connection_status=status,
+        connection_checked_at=checked_at if _is_postgres() else checked_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    )
 
 def create_account(user_id: int, name: str, cap_total: float = 100000.0, target_ann: float = 20.0, max_per_ticker: float = 10.0):
     """Crea una cuenta. Devuelve account_id o None si ya existe una cuenta con ese nombre (UniqueViolation)."""
     conn = get_conn()
     try:
-        cur = conn.execute(
+        account_id = _insert_returning(
+            conn,
             "INSERT INTO Account (user_id, name, cap_total, target_ann, max_per_ticker) VALUES (?, ?, ?, ?, ?)",
             (user_id, name, cap_total, target_ann, max_per_ticker),
+            "account_id",
         )
         conn.commit()
-        return cur.lastrowid
+        return account_id
     except sqlite3.IntegrityError:
         return None
     except Exception as e:
@@ -697,17 +878,20 @@ def create_account(user_id: int, name: str, cap_total: float = 100000.0, target_
         raise
     finally:
         conn.close()
+        invalidate_metadata("accounts", user_id)
 
 def update_account_config(account_id: int, user_id: int, cap_total: float, target_ann: float, max_per_ticker: float):
-    conn = get_conn()
+    """Capital y objetivos de la cuenta. Sube DataVersion: cap_total entra en tax_efficiency_summary (capital de referencia)."""
     try:
-        conn.execute(
-            "UPDATE Account SET cap_total = ?, target_ann = ?, max_per_ticker = ? WHERE account_id = ? AND user_id = ?",
-            (cap_total, target_ann, max_per_ticker, account_id, user_id),
-        )
-        conn.commit()
+        with _unit_conn() as conn:
+            cur = conn.execute(
+                "UPDATE Account SET cap_total = ?, target_ann = ?, max_per_ticker = ? WHERE account_id = ? AND user_id = ?",
+                (cap_total, target_ann, max_per_ticker, account_id, user_id),
+            )
+            if cur.rowcount:
+                _bump_data_version(conn, account_id)
     finally:
-        conn.close()
+        invalidate_metadata("accounts", user_id)
 
 
 def update_account_av_key(account_id: int, user_id: int, av_api_key: str) -> None:
@@ -721,6 +905,7 @@ def update_account_av_key(account_id: int, user_id: int, av_api_key: str) -> Non
         conn.commit()
     finally:
         conn.close()
+        invalidate_metadata("accounts", user_id)
 
 
 def delete_account(account_id: int, user_id: int) -> bool:
@@ -734,6 +919,8 @@ def delete_account(account_id: int, user_id: int) -> bool:
         if trade_ids:
             placeholders = ",".join("?" * len(trade_ids))
             conn.execute(f"DELETE FROM TradeComment WHERE trade_id IN ({placeholders})", trade_ids)
+        conn.execute("DELETE FROM MonthlyRollup WHERE account_id = ?", (account_id,))
+        conn.execute("DELETE FROM DataVersion WHERE account_id = ?", (account_id,))
         conn.execute("DELETE FROM Trade WHERE account_id = ?", (account_id,))
         conn.execute("DELETE FROM Dividend WHERE account_id = ?", (account_id,))
         conn.execute("DELETE FROM PositionAdjustment WHERE account_id = ?", (account_id,))
@@ -742,22 +929,23 @@ def delete_account(account_id: int, user_id: int) -> bool:
         return True
     finally:
         conn.close()
+        invalidate_metadata("accounts", user_id)
 
 
 # --- Trades (siempre por account_id; la cuenta ya está ligada al user) ---
-def get_trade_by_id(account_id: int, trade_id: int):
-    """Un trade por ID, solo si pertenece a la cuenta."""
+def get_trade_by_id(account_id: int, trade_id: int, record: type = TradeRecord):
+    """Un trade por ID (TradeRecord), solo si pertenece a la cuenta."""
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
-            cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
+            cur = conn.cursor()
             cur.execute(
                 "SELECT * FROM Trade WHERE account_id = %s AND trade_id = %s",
                 (account_id, trade_id),
             )
             row = cur.fetchone()
-            return dict(row) if row else None
+            return row_factory(record)(cur, row) if row else None
         finally:
             conn.close()
     conn = get_conn()
@@ -766,19 +954,19 @@ def get_trade_by_id(account_id: int, trade_id: int):
             "SELECT * FROM Trade WHERE account_id = ? AND trade_id = ?",
             (account_id, trade_id),
         )
-        row = cur.fetchone()
-        return dict(row) if row else None
+        cur.row_factory = row_factory(record)
+        return cur.fetchone()
     finally:
         conn.close()
 
 
-def get_trades_by_account(account_id: int, status: str = None, ticker: str = None):
-    """Trades de la cuenta. Opcional: filtrar por status y/o ticker."""
+def get_trades_by_account(account_id: int, status: str = None, ticker: str = None, record: type = TradeRecord):
+    """Trades de la cuenta (TradeRecord). Opcional: filtrar por status y/o ticker."""
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
-            cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
+            cur = conn.cursor()
             q = "SELECT * FROM Trade WHERE account_id = %s"
             params = [account_id]
             if status:
@@ -789,8 +977,8 @@ def get_trades_by_account(account_id: int, status: str = None, ticker: str = Non
                 params.append(ticker)
             q += " ORDER BY trade_date DESC, trade_id DESC"
             cur.execute(q, params)
-            rows = cur.fetchall()
-            return [dict(r) for r in rows] if rows else []
+            make = row_factory(record)
+            return [make(cur, r) for r in cur.fetchall()]
         finally:
             conn.close()
     conn = get_conn()
@@ -805,52 +993,172 @@ def get_trades_by_account(account_id: int, status: str = None, ticker: str = Non
             params.append(ticker)
         q += " ORDER BY trade_date DESC, trade_id DESC"
         cur = conn.execute(q, params)
-        return [dict(r) for r in cur.fetchall()]
+        cur.row_factory = row_factory(record)
+        return cur.fetchall()
     finally:
         conn.close()
 
+def get_trade_parent_map(account_id: int):
+    """{trade_id: (parent_trade_id, trade_date)} de todos los trades de la cuenta (solo columnas de la cadena de campaña)."""
+    if _is_postgres():
+        conn = _pg_connect()
+        conn.autocommit = True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT trade_id, parent_trade_id, trade_date FROM Trade WHERE account_id = %s", (account_id,))
+            return {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+        finally:
+            conn.close()
+    conn = get_conn()
+    try:
+        cur = conn.execute("SELECT trade_id, parent_trade_id, trade_date FROM Trade WHERE account_id = ?", (account_id,))
+        return {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+    finally:
+        conn.close()
+
+
+def _trades_in_range_query(account_id: int, date_from: Optional[str], date_to: Optional[str], ticker: str = None,
+                           strategy: str = None, status: str = None):
+    """SQL (placeholders ?) y parámetros de get_trades_in_range / iter_trades_in_range."""
+    q = "SELECT * FROM Trade WHERE account_id = ?"
+    params = [account_id]
+    if date_from and date_to:
+        date_to_next = (datetime.fromisoformat(date_to[:10]) + timedelta(days=1)).date().isoformat()
+        q += " AND ((trade_date >= ? AND trade_date < ?) OR (closed_date >= ? AND closed_date < ?))"
+        params.extend([date_from[:10], date_to_next, date_from[:10], date_to_next])
+    for col, val in (("ticker", ticker), ("strategy_type", strategy), ("status", status)):
+        if val:
+            q += f" AND UPPER(TRIM({col})) = ?"
+            params.append(val.strip().upper())
+    q += " ORDER BY trade_date DESC, trade_id DESC"
+    return q, params
+
+
+def get_trades_in_range(account_id: int, date_from: Optional[str], date_to: Optional[str], ticker: str = None,
+                        strategy: str = None, status: str = None, record: type = TradeRecord):
+    """
+    Trades de la cuenta que abrieron O cerraron en [date_from, date_to] (fechas ISO 'YYYY-MM-DD'), filtrado en SQL.
+    Rango semiabierto [date_from, date_to + 1 día) sobre el texto: incluye valores con hora ('2026-02-10T15:30')
+    y usa los índices (account_id, trade_date) / (account_id, closed_date). Sin fechas no filtra por rango.
+    Filtros opcionales ticker / estrategia / estado sin distinguir mayúsculas. Mismo orden que get_trades_by_account.
+    Filas como record (TradeRecord o una subclase con campos extra, p. ej. las filas de reporte).
+    """
+    q, params = _trades_in_range_query(account_id, date_from, date_to, ticker, strategy, status)
+    if _is_postgres():
+        conn = _pg_connect()
+        conn.autocommit = True
+        try:
+            cur = conn.cursor()
+            cur.execute(q.replace("?", "%s"), params)
+            make = row_factory(record)
+            return [make(cur, r) for r in cur.fetchall()]
+        finally:
+            conn.close()
+    conn = get_conn()
+    try:
+        cur = conn.execute(q, params)
+        cur.row_factory = row_factory(record)
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def count_trades_in_range(account_id: int, date_from: Optional[str], date_to: Optional[str], ticker: str = None,
+                          strategy: str = None, status: str = None) -> int:
+    """Número de filas que devolvería get_trades_in_range (mismo filtro, sin traer filas). Para progreso de exportaciones."""
+    q, params = _trades_in_range_query(account_id, date_from, date_to, ticker, strategy, status)
+    q = "SELECT COUNT(*) AS n FROM Trade WHERE " + q.split(" WHERE ", 1)[1].rsplit(" ORDER BY ", 1)[0]
+    conn = get_conn()
+    try:
+        row = conn.execute(q, params).fetchone()
+        return int(row["n"] or 0) if row else 0
+    finally:
+        conn.close()
+
+
+def iter_trades_in_range(account_id: int, date_from: Optional[str], date_to: Optional[str], ticker: str = None,
+                         strategy: str = None, status: str = None, batch_size: int = 500, record: type = TradeRecord):
+    """
+    Como get_trades_in_range pero en streaming: genera records por lotes de batch_size sin cargar el resultado entero.
+    PostgreSQL: cursor con nombre (del lado del servidor). SQLite: fetchmany sobre el cursor.
+    La conexión se cierra al agotar o cerrar el generador.
+    """
+    q, params = _trades_in_range_query(account_id, date_from, date_to, ticker, strategy, status)
+    if _is_postgres():
+        conn = _pg_connect()  # sin autocommit: los cursores con nombre viven dentro de una transacción
+        try:
+            cur = conn.cursor(name="alphawheel_trades_range")
+            cur.itersize = batch_size
+            cur.execute(q.replace("?", "%s"), params)
+            make = row_factory(record)
+            while True:
+                batch = cur.fetchmany(batch_size)
+                if not batch:
+                    break
+                for r in batch:
+                    yield make(cur, r)
+        finally:
+            conn.close()
+        return
+    conn = get_conn()
+    try:
+        cur = conn.execute(q, params)
+        cur.row_factory = row_factory(record)
+        while True:
+            batch = cur.fetchmany(batch_size)
+            if not batch:
+                break
+            yield from batch
+    finally:
+        conn.close()
+
+
 def insert_trade(account_id: int, ticker: str, asset_type: str, quantity: int, price: float,
                 strategy_type: str, status: str, entry_type: str, trade_date: str,
                 strike: float = None, expiration_date: str = None, closed_date: str = None,
                 parent_trade_id: int = None, comment: str = None):
-    if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+    closes = status == "CLOSED" and bool(closed_date)
+    if _is_postgres() and _active_tx() is None and not closes:
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor(cursor_factory=pg_extras.RealDictCursor)
+            # Versión + INSERT en un solo envío: PostgreSQL ejecuta ambas sentencias en una transacción implícita
             cur.execute(
-                """INSERT INTO Trade (account_id, ticker, asset_type, quantity, price, strike, expiration_date,
+                _pg_translate(_DATA_VERSION_BUMP) + """;
+                INSERT INTO Trade (account_id, ticker, asset_type, quantity, price, strike, expiration_date,
                  strategy_type, status, entry_type, trade_date, closed_date, parent_trade_id, comment)
                  VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                  RETURNING trade_id""",
-                (account_id, ticker, asset_type, quantity, price, strike, expiration_date,
+                (account_id, account_id, ticker, asset_type, quantity, price, strike, expiration_date,
                  strategy_type, status, entry_type, trade_date, closed_date, parent_trade_id, comment),
             )
             row = cur.fetchone()
             return row["trade_id"] if row else None
         finally:
             conn.close()
-    conn = get_conn()
-    try:
-        cur = conn.execute(
+    with transaction() as conn:
+        trade_id = _insert_returning(
+            conn,
             """INSERT INTO Trade (account_id, ticker, asset_type, quantity, price, strike, expiration_date,
              strategy_type, status, entry_type, trade_date, closed_date, parent_trade_id, comment)
              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
             (account_id, ticker, asset_type, quantity, price, strike, expiration_date,
              strategy_type, status, entry_type, trade_date, closed_date, parent_trade_id, comment),
+            "trade_id",
         )
-        conn.commit()
-        return cur.lastrowid
-    finally:
-        conn.close()
+        _bump_data_version(conn, account_id)
+        if closes:
+            _refresh_monthly_rollup(conn, [(account_id, str(closed_date)[:7], ticker, strategy_type)])
+        return trade_id
 
 def close_trade(trade_id: int, account_id: int, closed_date: str, buyback_debit: float = None):
     """
     Cierra un trade (CSP/CC o otro). Si buyback_debit es distinto de None, se registra cierre por recompra:
     close_type='buyback' y buyback_debit=importe pagado. Resultado: CSP → cash; CC → acciones libres.
     """
-    conn = get_conn()
-    try:
+    with transaction() as conn:
+        before = _closed_bucket(conn, trade_id, account_id)
         if buyback_debit is not None:
             conn.execute(
                 "UPDATE Trade SET status = 'CLOSED', closed_date = ?, close_type = 'buyback', buyback_debit = ? WHERE trade_id = ? AND account_id = ?",
@@ -861,9 +1169,8 @@ def close_trade(trade_id: int, account_id: int, closed_date: str, buyback_debit:
                 "UPDATE Trade SET status = 'CLOSED', closed_date = ? WHERE trade_id = ? AND account_id = ?",
                 (closed_date, trade_id, account_id),
             )
-        conn.commit()
-    finally:
-        conn.close()
+        _refresh_monthly_rollup(conn, [before, _closed_bucket(conn, trade_id, account_id)])
+        _bump_data_version(conn, account_id)
 
 
 def close_trade_by_expiration(trade_id: int, account_id: int, closed_date: str):
@@ -871,22 +1178,20 @@ def close_trade_by_expiration(trade_id: int, account_id: int, closed_date: str):
     Cierra un trade por vencimiento (opción expira sin valor, OTM). Registra close_type='expiration'
     y buyback_debit=NULL. El P&L del trade es solo la prima recibida (sin restar débito).
     """
-    conn = get_conn()
-    try:
+    with transaction() as conn:
+        before = _closed_bucket(conn, trade_id, account_id)
         conn.execute(
             "UPDATE Trade SET status = 'CLOSED', closed_date = ?, close_type = 'expiration', buyback_debit = NULL WHERE trade_id = ? AND account_id = ?",
             (closed_date, trade_id, account_id),
         )
-        conn.commit()
-    finally:
-        conn.close()
+        _refresh_monthly_rollup(conn, [before, _closed_bucket(conn, trade_id, account_id)])
+        _bump_data_version(conn, account_id)
 
 
 def update_trade(trade_id: int, account_id: int, price: float = None, strike: float = None, expiration_date: str = None,
                  comment: str = None, quantity: int = None, trade_date: str = None):
     """Actualiza campos editables de un trade. OPTION: price, strike, expiration_date, comment. STOCK: price, quantity, trade_date, comment."""
-    conn = get_conn()
-    try:
+    with transaction() as conn:
         updates, params = [], []
         if price is not None:
             updates.append("price = ?")
@@ -913,34 +1218,134 @@ def update_trade(trade_id: int, account_id: int, price: float = None, strike: fl
             f"UPDATE Trade SET {', '.join(updates)} WHERE trade_id = ? AND account_id = ?",
             params,
         )
-        conn.commit()
-    finally:
-        conn.close()
+        _bump_data_version(conn, account_id)
+        # Precio o cantidad cambian el realizado si el trade ya está cerrado
+        if price is not None or quantity is not None:
+            _refresh_monthly_rollup(conn, [_closed_bucket(conn, trade_id, account_id)])
+
+
+def delete_trade(trade_id: int, account_id: int) -> None:
+    """Borra un trade de la cuenta y recalcula su cubo de MonthlyRollup si estaba cerrado."""
+    with transaction() as conn:
+        bucket = _closed_bucket(conn, trade_id, account_id)
+        conn.execute("DELETE FROM Trade WHERE trade_id = ? AND account_id = ?", (trade_id, account_id))
+        _refresh_monthly_rollup(conn, [bucket])
+        _bump_data_version(conn, account_id)
 
 
 def set_trade_buyback(trade_id: int, account_id: int, buyback_debit: float) -> None:
     """Registra en un trade (p. ej. recompra) close_type='buyback' y el débito pagado. Evita perder precisión en débitos pequeños."""
-    if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+    if _is_postgres() and _active_tx() is None:
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             cur = conn.cursor()
             cur.execute(
-                "UPDATE Trade SET close_type = 'buyback', buyback_debit = %s WHERE trade_id = %s AND account_id = %s",
-                (round(float(buyback_debit), 2), trade_id, account_id),
+                _pg_translate(_DATA_VERSION_BUMP)
+                + "; UPDATE Trade SET close_type = 'buyback', buyback_debit = %s WHERE trade_id = %s AND account_id = %s",
+                (account_id, round(float(buyback_debit), 2), trade_id, account_id),
             )
         finally:
             conn.close()
         return
-    conn = get_conn()
-    try:
+    with _unit_conn() as conn:
         conn.execute(
             "UPDATE Trade SET close_type = 'buyback', buyback_debit = ? WHERE trade_id = ? AND account_id = ?",
             (round(float(buyback_debit), 2), trade_id, account_id),
         )
-        conn.commit()
+        _bump_data_version(conn, account_id)
+
+
+# --- Resumen mensual de P&L realizado (MonthlyRollup) ---
+# Un cubo por (cuenta, mes de cierre 'YYYY-MM', ticker, estrategia) con los trades CLOSED de ese mes:
+# realizado = precio × cantidad × (100 en opciones), misma fórmula que tax_efficiency_summary (las recompras
+# con precio negativo restan); premium / buyback_debits = parte positiva / negativa (en positivo) del realizado;
+# sin comisiones: se restan una vez por campaña con trades cerrados en el rango, algo que no se suma por meses;
+# first_closed_date / first_trade_id para ordenar igual que la consulta directa sobre Trade.
+# Cada escritura recalcula solo los cubos que toca (DELETE + INSERT ... SELECT en su transacción), así que no
+# acumula deriva; rebuild_monthly_rollup() (python -m database.rollup) lo reconstruye entero.
+_ROLLUP_AMOUNT = "CAST(t.price AS NUMERIC) * t.quantity * CASE WHEN t.asset_type = 'OPTION' THEN 100 ELSE 1 END"
+_ROLLUP_INSERT = f"""
+    INSERT INTO MonthlyRollup (account_id, month, ticker, strategy_type, closed_count, realized, premium,
+                               buyback_debits, first_closed_date, first_trade_id)
+    SELECT t.account_id, SUBSTR(t.closed_date, 1, 7), t.ticker, t.strategy_type, COUNT(*),
+           SUM({_ROLLUP_AMOUNT}),
+           SUM(CASE WHEN t.price > 0 THEN {_ROLLUP_AMOUNT} ELSE 0 END),
+           SUM(CASE WHEN t.price < 0 THEN -({_ROLLUP_AMOUNT}) ELSE 0 END),
+           MIN(t.closed_date), MIN(t.trade_id)
+    FROM Trade t
+    WHERE t.status = 'CLOSED' AND t.closed_date IS NOT NULL AND {{where}}
+    GROUP BY t.account_id, SUBSTR(t.closed_date, 1, 7), t.ticker, t.strategy_type"""
+
+
+def _next_month(month: str) -> str:
+    """'YYYY-MM' del mes siguiente."""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def _closed_bucket(conn, trade_id: int, account_id: int):
+    """Cubo de MonthlyRollup del trade si está cerrado: (account_id, 'YYYY-MM', ticker, strategy_type); si no, None."""
+    row = conn.execute(
+        "SELECT ticker, strategy_type, status, closed_date FROM Trade WHERE trade_id = ? AND account_id = ?",
+        (trade_id, account_id),
+    ).fetchone()
+    if not row or row["status"] != "CLOSED" or not row["closed_date"]:
+        return None
+    return (account_id, str(row["closed_date"])[:7], row["ticker"], row["strategy_type"])
+
+
+def _refresh_monthly_rollup(conn, buckets) -> None:
+    """Recalcula desde Trade los cubos indicados (None se ignora). Llamar dentro de la transacción de la escritura."""
+    for account_id, month, ticker, strategy_type in {b for b in buckets if b}:
+        conn.execute(
+            "DELETE FROM MonthlyRollup WHERE account_id = ? AND month = ? AND ticker = ? AND strategy_type = ?",
+            (account_id, month, ticker, strategy_type),
+        )
+        conn.execute(
+            _ROLLUP_INSERT.format(where="t.account_id = ? AND t.closed_date >= ? AND t.closed_date < ? "
+                                        "AND t.ticker = ? AND t.strategy_type = ?"),
+            (account_id, f"{month}-01", f"{_next_month(month)}-01", ticker, strategy_type),
+        )
+
+
+def rebuild_monthly_rollup(account_id: int = None) -> int:
+    """Reconstruye MonthlyRollup desde Trade (una cuenta o todas) en una transacción. Devuelve el nº de cubos."""
+    with transaction() as conn:
+        if account_id is None:
+            conn.execute("DELETE FROM MonthlyRollup")
+            conn.execute(_ROLLUP_INSERT.format(where="1 = 1"))
+            # Tras SQL manual o cargas masivas sobre Trade: invalidar también las cachés de todas las cuentas
+            conn.execute(
+                "INSERT INTO DataVersion (account_id, version) SELECT account_id, 1 FROM Account WHERE 1 = 1"
+                " ON CONFLICT (account_id) DO UPDATE SET version = DataVersion.version + 1"
+            )
+            row = conn.execute("SELECT COUNT(*) AS n FROM MonthlyRollup").fetchone()
+        else:
+            conn.execute("DELETE FROM MonthlyRollup WHERE account_id = ?", (account_id,))
+            conn.execute(_ROLLUP_INSERT.format(where="t.account_id = ?"), (account_id,))
+            _bump_data_version(conn, account_id)
+            row = conn.execute("SELECT COUNT(*) AS n FROM MonthlyRollup WHERE account_id = ?", (account_id,)).fetchone()
+    return int(row["n"] or 0) if row else 0
+
+
+_rollup_checked = set()
+
+
+def _ensure_monthly_rollup() -> None:
+    """Tras crear la tabla en una BD con historial: si está vacía y hay trades cerrados, construirla (una vez por proceso)."""
+    target = config.DATABASE_URL if _is_postgres() else config.DB_PATH
+    if target in _rollup_checked:
+        return
+    conn = get_conn()
+    try:
+        empty = conn.execute("SELECT 1 AS x FROM MonthlyRollup LIMIT 1").fetchone() is None
+        pending = empty and conn.execute("SELECT 1 AS x FROM Trade WHERE status = 'CLOSED' LIMIT 1").fetchone() is not None
     finally:
         conn.close()
+    if pending:
+        rebuild_monthly_rollup()
+    _rollup_checked.add(target)
 
 
 # --- Ajustes por campaña (comisiones y fees) ---
@@ -965,7 +1370,7 @@ def _ensure_campaign_adjustment_table(conn):
 def get_campaign_adjustment(account_id: int, campaign_root_id: int):
     """Devuelve {commissions, fees} para la campaña, o {commissions: 0, fees: 0} si no hay registro."""
     if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
+        conn = _pg_connect()
         conn.autocommit = True
         try:
             _ensure_campaign_adjustment_table(conn)
@@ -990,7 +1395,8 @@ def get_campaign_adjustment(account_id: int, campaign_root_id: int):
         if row:
             try:
                 return {"commissions": float(row.get("commissions") or 0), "fees": float(row.get("fees") or 0)}
-            except (TypeError, KeyError):
+            except (TypeError, KeyError, AttributeError):
+                # sqlite3.Row no tiene .get(): acceso por índice
                 return {"commissions": float(row[0] or 0), "fees": float(row[1] or 0)}
         return {"commissions": 0.0, "fees": 0.0}
     finally:
@@ -998,33 +1404,20 @@ def get_campaign_adjustment(account_id: int, campaign_root_id: int):
 
 
 def upsert_campaign_adjustment(account_id: int, campaign_root_id: int, commissions: float = 0, fees: float = 0):
-    """Crea o actualiza comisiones y fees de la campaña."""
-    if _is_postgres():
-        conn = psycopg2.connect(config.DATABASE_URL)
-        conn.autocommit = True
-        try:
-            _ensure_campaign_adjustment_table(conn)
-            cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO CampaignAdjustment (account_id, campaign_root_id, commissions, fees)
-                   VALUES (%s, %s, %s, %s)
-                   ON CONFLICT (account_id, campaign_root_id) DO UPDATE SET commissions = EXCLUDED.commissions, fees = EXCLUDED.fees""",
-                (account_id, campaign_root_id, round(float(commissions), 2), round(float(fees), 2)),
-            )
-        finally:
-            conn.close()
-        return
-    conn = get_conn()
-    try:
+    """
+    Crea o actualiza comisiones y fees de la campaña. Upsert y versión de datos en una sola transacción
+    (se une a la de db.transaction() si hay una abierta).
+    """
+    with transaction() as conn:
+        if _is_postgres():
+            _ensure_campaign_adjustment_table(conn.raw_conn)
         conn.execute(
             """INSERT INTO CampaignAdjustment (account_id, campaign_root_id, commissions, fees)
                VALUES (?, ?, ?, ?)
                ON CONFLICT (account_id, campaign_root_id) DO UPDATE SET commissions = excluded.commissions, fees = excluded.fees""",
             (account_id, campaign_root_id, round(float(commissions), 2), round(float(fees), 2)),
         )
-        conn.commit()
-    finally:
-        conn.close()
+        _bump_data_version(conn, account_id)
 
 
 # --- Dividendos ---
@@ -1045,12 +1438,15 @@ def get_dividends_by_account(account_id: int, ticker: str = None):
 def insert_dividend(account_id: int, ticker: str, amount: float, ex_date: str, pay_date: str = None, note: str = None):
     conn = get_conn()
     try:
-        cur = conn.execute(
+        dividend_id = _insert_returning(
+            conn,
             "INSERT INTO Dividend (account_id, ticker, amount, ex_date, pay_date, note) VALUES (?, ?, ?, ?, ?, ?)",
             (account_id, ticker, amount, ex_date, pay_date, note),
+            "dividend_id",
         )
+        _bump_data_version(conn, account_id)
         conn.commit()
-        return cur.lastrowid
+        return dividend_id
     finally:
         conn.close()
 
@@ -1072,13 +1468,16 @@ def get_adjustments_by_account(account_id: int, ticker: str = None):
 def insert_adjustment(account_id: int, ticker: str, adjustment_type: str, old_value: float = None, new_value: float = None, note: str = None, trade_id: int = None):
     conn = get_conn()
     try:
-        cur = conn.execute(
+        adjustment_id = _insert_returning(
+            conn,
             """INSERT INTO PositionAdjustment (account_id, trade_id, ticker, adjustment_type, old_value, new_value, note)
              VALUES (?, ?, ?, ?, ?, ?, ?)""",
             (account_id, trade_id, ticker, adjustment_type, old_value, new_value, note),
+            "adjustment_id",
         )
+        _bump_data_version(conn, account_id)
         conn.commit()
-        return cur.lastrowid
+        return adjustment_id
     finally:
         conn.close()
 
@@ -1094,8 +1493,13 @@ def get_trade_comments(trade_id: int):
 def add_trade_comment(trade_id: int, body: str):
     conn = get_conn()
     try:
-        cur = conn.execute("INSERT INTO TradeComment (trade_id, body) VALUES (?, ?)", (trade_id, body))
+        comment_id = _insert_returning(
+            conn, "INSERT INTO TradeComment (trade_id, body) VALUES (?, ?)", (trade_id, body), "comment_id"
+        )
+        owner = conn.execute("SELECT account_id FROM Trade WHERE trade_id = ?", (trade_id,)).fetchone()
+        if owner:
+            _bump_data_version(conn, owner["account_id"])
         conn.commit()
-        return cur.lastrowid
+        return comment_id
     finally:
         conn.close()
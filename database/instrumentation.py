@@ -0,0 +1,266 @@
+# AlphaWheel Pro - Instrumentación de consultas (latencia, filas, origen) y log de consultas lentas
+# Todas las conexiones de database.db pasan por aquí:
+#   - SQLite: sqlite3.connect(..., factory=InstrumentedSqliteConnection)
+#   - PostgreSQL: psycopg2.connect(..., connection_factory=InstrumentedPgConnection); cubre tanto
+#     _PgConnWrapper.execute como las rutas directas psycopg2 (RealDictCursor incluido).
+# Las estadísticas son por hilo: en Streamlit cada sesión ejecuta su script en su propio hilo, así que
+# begin_rerun() al inicio de la página deja los totales del rerun actual en current_stats().
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+try:
+    import psycopg2
+    from psycopg2 import extensions as pg_extensions
+    from psycopg2 import extras as pg_extras
+except ImportError:
+    psycopg2 = None
+    pg_extensions = None
+    pg_extras = None
+
+logger = logging.getLogger("alphawheel.db")
+
+_DB_DIR = os.path.dirname(os.path.abspath(__file__))
+_DB_FILE = os.path.join(_DB_DIR, "db.py")
+_WS_RE = re.compile(r"\s+")
+_MAX_SQL_LEN = 240
+
+
+def slow_query_threshold_ms() -> float:
+    """Umbral para el log de consultas lentas (ALPHAWHEEL_SLOW_QUERY_MS; por defecto 250 ms). 0 = desactivado."""
+    try:
+        return float(os.environ.get("ALPHAWHEEL_SLOW_QUERY_MS", "250"))
+    except ValueError:
+        return 250.0
+
+
+class QueryStats:
+    """Totales de un rerun: número de sentencias, tiempo, filas y agregado por (SQL normalizado, origen)."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.count = 0
+        self.total_ms = 0.0
+        self.rows = 0
+        self.by_query: Dict[tuple, Dict] = {}
+
+    def top(self, n: int = 15, key: str = "total_ms") -> List[Dict]:
+        """Las n consultas con más coste (total_ms, count o max_ms)."""
+        items = [dict(sql=k[0], site=k[1], **v) for k, v in self.by_query.items()]
+        items.sort(key=lambda x: x[key], reverse=True)
+        return items[:n]
+
+
+_local = threading.local()
+
+
+def begin_rerun() -> QueryStats:
+    """Reinicia los totales del hilo actual (llamar al inicio de cada rerun de la página)."""
+    _local.stats = QueryStats()
+    return _local.stats
+
+
+def current_stats() -> QueryStats:
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        stats = begin_rerun()
+    return stats
+
+
+def _normalize_sql(sql) -> str:
+    if not isinstance(sql, str):
+        sql = sql.decode("utf-8", "replace") if isinstance(sql, bytes) else str(sql)
+    sql = _WS_RE.sub(" ", sql).strip()
+    return sql if len(sql) <= _MAX_SQL_LEN else sql[:_MAX_SQL_LEN] + "…"
+
+
+def _call_site() -> str:
+    """Función de database.db que lanzó la consulta y primer llamador fuera del paquete database."""
+    f = sys._getframe(2)
+    db_func = None
+    while f is not None:
+        fname = f.f_code.co_filename
+        if fname == _DB_FILE:
+            # La más externa gana: get_trades_by_account en vez de _PgConnWrapper.execute
+            db_func = f.f_code.co_name
+        elif not fname.startswith(_DB_DIR):
+            caller = f"{os.path.basename(fname)}:{f.f_lineno} {f.f_code.co_name}"
+            return f"db.{db_func} ← {caller}" if db_func else caller
+        f = f.f_back
+    return f"db.{db_func}" if db_func else "?"
+
+
+class _Record:
+    __slots__ = ("key", "entry", "t0")
+
+    def __init__(self, sql):
+        self.key = (_normalize_sql(sql), _call_site())
+        self.entry = None
+        self.t0 = time.perf_counter()
+
+
+def _start(sql) -> _Record:
+    return _Record(sql)
+
+
+def _finish(rec: _Record, rowcount: Optional[int] = None) -> _Record:
+    elapsed_ms = (time.perf_counter() - rec.t0) * 1000.0
+    stats = current_stats()
+    entry = stats.by_query.get(rec.key)
+    if entry is None:
+        entry = stats.by_query[rec.key] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+    entry["count"] += 1
+    entry["total_ms"] += elapsed_ms
+    entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+    stats.count += 1
+    stats.total_ms += elapsed_ms
+    # Filas afectadas (DML); las filas leídas se suman al hacer fetch
+    if rowcount is not None and rowcount > 0:
+        entry["rows"] += rowcount
+        stats.rows += rowcount
+    rec.entry = entry
+    threshold = slow_query_threshold_ms()
+    if threshold and elapsed_ms >= threshold:
+        logger.warning("Consulta lenta %.1f ms [%s] %s", elapsed_ms, rec.key[1], rec.key[0])
+    return rec
+
+
+def _add_fetch(rec: Optional[_Record], rows: int, elapsed_s: float) -> None:
+    """Suma filas leídas y tiempo de fetch a la consulta que las produjo."""
+    if rec is None or rec.entry is None:
+        return
+    ms = elapsed_s * 1000.0
+    stats = current_stats()
+    rec.entry["rows"] += rows
+    rec.entry["total_ms"] += ms
+    stats.rows += rows
+    stats.total_ms += ms
+
+
+def _dml_rowcount(cur) -> Optional[int]:
+    try:
+        rc = cur.rowcount
+    except Exception:
+        return None
+    return rc if rc is not None and rc >= 0 and cur.description is None else None
+
+
+# --- SQLite ---
+class InstrumentedSqliteCursor(sqlite3.Cursor):
+    _qrec = None
+
+    def execute(self, sql, parameters=()):
+        rec = _start(sql)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._qrec = _finish(rec, _dml_rowcount(self))
+
+    def executemany(self, sql, seq_of_parameters):
+        rec = _start(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._qrec = _finish(rec, _dml_rowcount(self))
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = super().fetchone()
+        _add_fetch(self._qrec, 1 if row is not None else 0, time.perf_counter() - t0)
+        return row
+
+    def fetchmany(self, size=None):
+        t0 = time.perf_counter()
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        _add_fetch(self._qrec, len(rows), time.perf_counter() - t0)
+        return rows
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = super().fetchall()
+        _add_fetch(self._qrec, len(rows), time.perf_counter() - t0)
+        return rows
+
+
+class InstrumentedSqliteConnection(sqlite3.Connection):
+    """sqlite3.Connection cuyo execute() usa InstrumentedSqliteCursor (misma API que la conexión estándar)."""
+
+    def cursor(self, factory=InstrumentedSqliteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        cur = self.cursor()
+        cur.execute(sql, parameters)
+        return cur
+
+    def executemany(self, sql, seq_of_parameters):
+        cur = self.cursor()
+        cur.executemany(sql, seq_of_parameters)
+        return cur
+
+
+# --- PostgreSQL ---
+if psycopg2 is not None:
+
+    class _PgCursorMixin:
+        _qrec = None
+
+        def execute(self, query, vars=None):
+            rec = _start(query)
+            try:
+                return super().execute(query, vars)
+            finally:
+                self._qrec = _finish(rec, _dml_rowcount(self))
+
+        def executemany(self, query, vars_list):
+            rec = _start(query)
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                self._qrec = _finish(rec, _dml_rowcount(self))
+
+        def fetchone(self):
+            t0 = time.perf_counter()
+            row = super().fetchone()
+            _add_fetch(self._qrec, 1 if row is not None else 0, time.perf_counter() - t0)
+            return row
+
+        def fetchmany(self, size=None):
+            t0 = time.perf_counter()
+            rows = super().fetchmany(size) if size is not None else super().fetchmany()
+            _add_fetch(self._qrec, len(rows), time.perf_counter() - t0)
+            return rows
+
+        def fetchall(self):
+            t0 = time.perf_counter()
+            rows = super().fetchall()
+            _add_fetch(self._qrec, len(rows), time.perf_counter() - t0)
+            return rows
+
+    class InstrumentedPgCursor(_PgCursorMixin, pg_extensions.cursor):
+        pass
+
+    class InstrumentedPgRealDictCursor(_PgCursorMixin, pg_extras.RealDictCursor):
+        pass
+
+    _PG_CURSOR_MAP = {
+        None: InstrumentedPgCursor,
+        pg_extensions.cursor: InstrumentedPgCursor,
+        pg_extras.RealDictCursor: InstrumentedPgRealDictCursor,
+    }
+
+    class InstrumentedPgConnection(pg_extensions.connection):
+        """Conexión psycopg2 que sustituye los cursores estándar y RealDictCursor por versiones instrumentadas."""
+
+        def cursor(self, *args, **kwargs):
+            factory = kwargs.get("cursor_factory")
+            kwargs["cursor_factory"] = _PG_CURSOR_MAP.get(factory, factory)
+            return super().cursor(*args, **kwargs)
+
+else:
+    InstrumentedPgConnection = None
@@ -0,0 +1,82 @@
+# AlphaWheel Pro - Registros compactos (__slots__) para las filas de Trade
+# Las lecturas de trades construyen TradeRecord directamente en el row factory del cursor (sin dict intermedio ni
+# copias posteriores). Acceso por atributo en negocio y reportes; la UI sigue pudiendo usar t["x"] / t.get("x")
+# y convierte a dict (dict(t) o to_dict()) solo donde necesita uno (DataFrames, filas editables).
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+@dataclass(slots=True)
+class TradeRecord:
+    """Una fila de Trade (mismas columnas y orden que schema.sql)."""
+
+    trade_id: int
+    account_id: int
+    ticker: str
+    asset_type: str
+    quantity: int
+    price: float
+    strike: Optional[float]
+    expiration_date: Optional[str]
+    strategy_type: str
+    status: str
+    entry_type: str
+    trade_date: str
+    closed_date: Optional[str]
+    close_type: Optional[str]
+    buyback_debit: Optional[float]
+    parent_trade_id: Optional[int]
+    comment: Optional[str]
+    created_at: Optional[str]
+
+    # API de solo mapping (como sqlite3.Row / dict) para el código de UI que lee t["x"] o t.get("x")
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in field_names(type(self)):
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in field_names(type(self))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in field_names(type(self)) else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return field_names(type(self))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Copia como dict (frontera con la UI: DataFrames, filas que se modifican para mostrar)."""
+        return {name: getattr(self, name) for name in field_names(type(self))}
+
+
+@lru_cache(maxsize=None)
+def field_names(record_type: type) -> Tuple[str, ...]:
+    """Campos del registro en orden de declaración (también los de subclases, p. ej. filas de reporte)."""
+    return tuple(f.name for f in fields(record_type))
+
+
+def row_factory(record_type: type = TradeRecord) -> Callable[[Any, tuple], Any]:
+    """
+    Row factory (cursor, fila) → record_type, válido para sqlite3 (cursor.row_factory) y para tuplas de psycopg2.
+    Las columnas se casan por nombre con cursor.description (una vez por sentencia, no por fila): tolera bases
+    migradas con otro orden de columnas; las que no vienen en la consulta quedan en None.
+    Crear una factory por lectura (guarda el último description; no compartir entre hilos).
+    """
+    names = field_names(record_type)
+    layout = [None, ()]
+
+    def factory(cursor, row):
+        description = cursor.description
+        if description is not layout[0]:
+            positions = {d[0]: i for i, d in enumerate(description)}
+            layout[0], layout[1] = description, tuple(positions.get(n) for n in names)
+        return record_type(*[None if i is None else row[i] for i in layout[1]])
+
+    return factory
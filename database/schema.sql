@@ -100,10 +100,37 @@ CREATE TABLE IF NOT EXISTS CampaignAdjustment (
     FOREIGN KEY (campaign_root_id) REFERENCES Trade(trade_id)
 );
 
+-- Resumen mensual de P&L realizado por (cuenta, mes de cierre, ticker, estrategia).
+-- Mantenido por database.db en cada escritura de trades; reconstruible con: python -m database.rollup
+CREATE TABLE IF NOT EXISTS MonthlyRollup (
+    account_id INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    strategy_type TEXT NOT NULL,
+    closed_count INTEGER NOT NULL DEFAULT 0,
+    realized REAL NOT NULL DEFAULT 0,
+    premium REAL NOT NULL DEFAULT 0,
+    buyback_debits REAL NOT NULL DEFAULT 0,
+    first_closed_date TEXT,
+    first_trade_id INTEGER,
+    PRIMARY KEY (account_id, month, ticker, strategy_type),
+    FOREIGN KEY (account_id) REFERENCES Account(account_id)
+);
+
+-- Versión de datos por cuenta: +1 en cada escritura de trades, dividendos, ajustes o comentarios
+-- (en la misma transacción). Las lecturas cacheadas de la app se indexan por (account_id, version).
+CREATE TABLE IF NOT EXISTS DataVersion (
+    account_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (account_id) REFERENCES Account(account_id)
+);
+
 -- Índices para filtrado por usuario/cuenta
 CREATE INDEX IF NOT EXISTS idx_account_user ON Account(user_id);
 CREATE INDEX IF NOT EXISTS idx_trade_account ON Trade(account_id);
 CREATE INDEX IF NOT EXISTS idx_trade_status_account ON Trade(status, account_id);
 CREATE INDEX IF NOT EXISTS idx_trade_ticker_account ON Trade(ticker, account_id);
+CREATE INDEX IF NOT EXISTS idx_trade_account_trade_date ON Trade(account_id, trade_date);
+CREATE INDEX IF NOT EXISTS idx_trade_account_closed_date ON Trade(account_id, closed_date);
 CREATE INDEX IF NOT EXISTS idx_dividend_account ON Dividend(account_id);
 CREATE INDEX IF NOT EXISTS idx_adjustment_account ON PositionAdjustment(account_id);
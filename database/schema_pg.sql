@@ -96,9 +96,33 @@ CREATE TABLE IF NOT EXISTS CampaignAdjustment (
     PRIMARY KEY (account_id, campaign_root_id)
 );
 
+-- Resumen mensual de P&L realizado (mantenido por database.db; reconstruible con python -m database.rollup)
+CREATE TABLE IF NOT EXISTS MonthlyRollup (
+    account_id INTEGER NOT NULL REFERENCES Account(account_id),
+    month TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    strategy_type TEXT NOT NULL,
+    closed_count INTEGER NOT NULL DEFAULT 0,
+    realized NUMERIC NOT NULL DEFAULT 0,
+    premium NUMERIC NOT NULL DEFAULT 0,
+    buyback_debits NUMERIC NOT NULL DEFAULT 0,
+    first_closed_date TEXT,
+    first_trade_id INTEGER,
+    PRIMARY KEY (account_id, month, ticker, strategy_type)
+);
+
+-- Versión de datos por cuenta: +1 en cada escritura de trades, dividendos, ajustes o comentarios
+-- (en la misma transacción). Las lecturas cacheadas de la app se indexan por (account_id, version).
+CREATE TABLE IF NOT EXISTS DataVersion (
+    account_id INTEGER PRIMARY KEY REFERENCES Account(account_id),
+    version INTEGER NOT NULL DEFAULT 0
+);
+
 CREATE INDEX IF NOT EXISTS idx_account_user ON Account(user_id);
 CREATE INDEX IF NOT EXISTS idx_trade_account ON Trade(account_id);
 CREATE INDEX IF NOT EXISTS idx_trade_status_account ON Trade(status, account_id);
 CREATE INDEX IF NOT EXISTS idx_trade_ticker_account ON Trade(ticker, account_id);
+CREATE INDEX IF NOT EXISTS idx_trade_account_trade_date ON Trade(account_id, trade_date);
+CREATE INDEX IF NOT EXISTS idx_trade_account_closed_date ON Trade(account_id, closed_date);
 CREATE INDEX IF NOT EXISTS idx_dividend_account ON Dividend(account_id);
 CREATE INDEX IF NOT EXISTS idx_adjustment_account ON PositionAdjustment(account_id);
@@ -1,6 +1,7 @@
 # AlphaWheel Pro - Motor de cálculos
 from .calculations import (
     round2,
+    round2_array,
     safe_float,
     calculate_dte,
     calculate_breakeven,
@@ -8,10 +9,12 @@ from .calculations import (
     calculate_return_on_capital,
     net_cost_basis,
     realized_pnl_buyback,
+    occ_symbol,
 )
 
 __all__ = [
     "round2",
+    "round2_array",
     "safe_float",
     "calculate_dte",
     "calculate_breakeven",
@@ -19,4 +22,5 @@ __all__ = [
     "calculate_return_on_capital",
     "net_cost_basis",
     "realized_pnl_buyback",
+    "occ_symbol",
 ]
@@ -1,6 +1,9 @@
 # AlphaWheel Pro - Motor de cálculos (regla: máximo 2 decimales)
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+import numpy as np
 
 import config
 
@@ -18,6 +21,19 @@ def round2(value):
         return 0.0
 
 
+def round2_array(values) -> np.ndarray:
+    """
+    round2 sobre un array (NumPy), con el mismo resultado que round2 elemento a elemento.
+    Sube si |v| >= k.xx5, comparando contra el double más cercano al empate decimal: el 2.675 escrito
+    (267.4999… al multiplicar) es un empate y sube, como Decimal(str(v)); NaN se conserva.
+    """
+    a = np.asarray(values, dtype=float)
+    mag = np.abs(a)
+    cents = np.floor(mag * 100.0)
+    up = mag >= (cents + 0.5) / 100.0
+    return np.copysign((cents + up) / 100.0, a)
+
+
 def safe_float(val, default=0.0):
     """Convierte a float seguro; si falla devuelve default (redondeado a 2 decimales)."""
     if val is None:
@@ -133,3 +149,21 @@ def delta_approx_itm_otm(strike: float, spot: float, is_put: bool) -> str:
     if is_put:
         return "ITM" if spot < strike else "OTM"
     return "ITM" if spot > strike else "OTM"
+
+
+def occ_symbol(root: str, expiration, option_type: str, strike: float) -> Optional[str]:
+    """
+    Símbolo OCC compacto (formato de cotización de Tradier): ROOT + YYMMDD + C/P + strike × 1000 en 8 dígitos,
+    sin espacios (ej. NVDA250919C00175000). expiration: date o 'YYYY-MM-DD'; option_type: 'put'/'call' o 'P'/'C'.
+    Devuelve None si falta algún dato o la fecha no es válida.
+    """
+    root = (root or "").strip().upper()
+    pc = (option_type or "").strip().upper()[:1]
+    if not root or pc not in ("P", "C") or not strike or float(strike) <= 0:
+        return None
+    if not isinstance(expiration, date):
+        try:
+            expiration = datetime.strptime(str(expiration or "").strip()[:10], "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    return f"{root}{expiration:%y%m%d}{pc}{int(round(float(strike) * 1000)):08d}"
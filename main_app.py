@@ -18,10 +18,7 @@ from engine.calculations import (
     round2,
     safe_float,
     calculate_dte,
-    calculate_breakeven,
     calculate_annualized_return,
-    calculate_return_on_capital,
-    delta_approx_itm_otm,
 )
 from providers.tradier import TradierProvider
 from business.wheel import (
@@ -31,15 +28,29 @@ from business.wheel import (
     register_cc_opening,
     register_dividend,
     register_adjustment,
-    get_position_summary,
     get_stock_quantity,
     get_campaign_root_id,
     get_campaign_premiums,
 )
-from reports.bitacora import export_trades_csv, export_trades_excel, export_trades_pdf, tax_efficiency_summary, get_trades_for_report, get_trade_filter_options
-from app.cockpit import render_screener_page, _render_screener_sidebar_form, _render_tutorial_tab, get_tradier_quote_cached
+from reports.bitacora import open_trades_csv_stream, export_trades_excel, tax_efficiency_summary, get_trades_for_report, get_trade_filter_options
+from dashboard import collateral_total, dashboard_frame, free_shares_by_ticker, market_value
+# Cockpit y Screener se importan donde se usan: el Screener (yfinance) solo al abrir esa vista
+from app.data_cache import (
+    get_market_quotes,
+    get_position_summary_cached,
+    get_open_trades_cached,
+    get_pnl_at_expiry_cached,
+)
+from app.debug_panel import render_query_debug_panel
+from database import instrumentation
+from app import profiler
 import config
 
+# Totales de consultas SQL por rerun (panel de depuración: ?debug=db o ALPHAWHEEL_DB_DEBUG=1)
+instrumentation.begin_rerun()
+# Perfil por tramos del rerun (cascada al pie: ?debug=profile o ALPHAWHEEL_PROFILE=1)
+profiler.begin_rerun("main_app")
+
 # Inicializar BD al arranque
 init_db()
 
@@ -263,6 +274,8 @@ with st.sidebar:
     acc_data = {}
     token = ""
     if show_screener_page:
+        from app.screener import _render_screener_sidebar_form
+
         st.caption("**Filtros del Screener** — Configura y pulsa **Iniciar barrido**.")
         try:
             run_scan = _render_screener_sidebar_form(user_id)
@@ -322,11 +335,13 @@ with st.sidebar:
                     new_premium = st.number_input("Nueva prima por contrato", value=float(tr.get("price") or 0), min_value=0.0, step=0.01, format="%.2f", key="roll_new_premium")
                     roll_comment = st.text_area("Comentario (bitácora)", value=f"Roll desde Strike {fmt2(tr.get('strike'))}", key="roll_comment")
                     if st.button("Ejecutar roll-over"):
-                        close_trade(tr["trade_id"], account_id, date.today().isoformat())
-                        if roll_type == "CSP":
-                            register_csp_opening(account_id, user_id, tr["ticker"], tr["quantity"], new_strike, new_premium, new_exp_d.isoformat(), date.today().isoformat(), roll_comment or None, parent_trade_id=tr["trade_id"])
-                        else:
-                            register_cc_opening(account_id, user_id, tr["ticker"], tr["quantity"], new_strike, new_premium, new_exp_d.isoformat(), date.today().isoformat(), roll_comment or None, parent_trade_id=tr["trade_id"])
+                        # Cierre de la pierna anterior y apertura de la nueva en una sola transacción
+                        with db.transaction():
+                            close_trade(tr["trade_id"], account_id, date.today().isoformat())
+                            if roll_type == "CSP":
+                                register_csp_opening(account_id, user_id, tr["ticker"], tr["quantity"], new_strike, new_premium, new_exp_d.isoformat(), date.today().isoformat(), roll_comment or None, parent_trade_id=tr["trade_id"])
+                            else:
+                                register_cc_opening(account_id, user_id, tr["ticker"], tr["quantity"], new_strike, new_premium, new_exp_d.isoformat(), date.today().isoformat(), roll_comment or None, parent_trade_id=tr["trade_id"])
                         for k in ["roll_new_strike", "roll_new_exp", "roll_new_premium", "roll_comment"]:
                             if k in st.session_state:
                                 del st.session_state[k]
@@ -470,7 +485,7 @@ with st.sidebar:
                                 st.error(f"No se pudo registrar: {e}")
 
                 elif reg_type == "Dividendo":
-                    tickers_owned = [s["ticker"] for s in get_position_summary(account_id)] if account_id else []
+                    tickers_owned = [s["ticker"] for s in get_position_summary_cached(account_id, db.get_data_version(account_id))] if account_id else []
                     if not tickers_owned:
                         st.caption("Solo puedes registrar dividendos de tickers que posees. No tienes posiciones en la cuenta; registra antes una compra directa o CSP/CC.")
                         ticker = ""
@@ -521,34 +536,40 @@ with st.sidebar:
 
 # --- Vista Screener (por usuario) o tabs de cuenta ---
 if show_screener_page:
-    render_screener_page(user_id, run_scan)
+    from app.screener import render_screener_page
+
+    with profiler.span("screener: render_screener_page"):
+        render_screener_page(user_id, run_scan)
+    profiler.render_profile_waterfall()
+    render_query_debug_panel()
     st.stop()
 
+# Versión de datos de la cuenta: clave de las lecturas cacheadas de este rerun (una consulta por PK)
+data_version = db.get_data_version(account_id) if account_id else 0
+
 tab_dash, tab_tutorial, tab_report, tab_settings = st.tabs(
     ["📊 Dashboard", "📖 Tutorial", "📑 Reportes", "✏️ Editar Cuenta"]
 )
 
 with tab_tutorial:
+    from app.cockpit import _render_tutorial_tab
+
     _render_tutorial_tab()
 
 with tab_dash:
     if not account_id:
         st.info("Crea o selecciona una cuenta en **Editar Cuenta** para ver el dashboard.")
     else:
-        trades_open = get_trades_by_account(account_id, status="OPEN")
-        summaries = get_position_summary(account_id)
+        with profiler.span("db: trades abiertos"):
+            trades_open = get_open_trades_cached(account_id, data_version)
+        with profiler.span("negocio: get_position_summary"):
+            summaries = get_position_summary_cached(account_id, data_version)
         cap_total = safe_float(acc_data.get("cap_total"))
         target_ann = safe_float(acc_data.get("target_ann"))
         target_usd = round2(cap_total * (target_ann / 100))
 
         # Colateral y utilización
-        colateral = 0.0
-        for s in summaries:
-            if s.get("strategy_type") == "CSP" and s.get("strike"):
-                colateral += safe_float(s["strike"]) * 100 * s.get("option_contracts", 0)
-            elif s.get("stock_quantity", 0) > 0:
-                colateral += safe_float(s.get("stock_cost_total") or 0)
-        colateral = round2(colateral)
+        colateral = collateral_total(summaries)
         cash_libre = round2(max(0, cap_total - colateral))
         max_per_ticker_pct = safe_float(acc_data.get("max_per_ticker"))
 
@@ -581,36 +602,13 @@ with tab_dash:
             st.info("No hay posiciones abiertas. Usa el sidebar para registrar CSP, CC o compra directa.")
         else:
             # Precios en tiempo real (Tradier) — caché 5 min para no saturar API en cada rerun
-            unique_tickers = list({t["ticker"] for t in trades_open})
-            mkt_prices = {}
-            if token:
-                api_base = "https://api.tradier.com/v1/" if (acc_data.get("environment") or "").lower() == "prod" else "https://sandbox.tradier.com/v1/"
-                for t in unique_tickers:
-                    q_res = get_tradier_quote_cached(t, api_base, token)
-                    quote_data = (q_res or {}).get("quotes", {}).get("quote")
-                    mkt_prices[t] = float(quote_data.get("last", 0) or 0) if quote_data else 0.0
-            else:
-                mkt_prices = {t: 0.0 for t in unique_tickers}
+            # Subyacentes y opciones vendidas (símbolos OCC) en una sola tanda de peticiones de hasta 100 símbolos
+            mkt_prices, option_marks, leg_symbols = get_market_quotes(
+                {t["ticker"] for t in trades_open}, summaries, token, acc_data.get("environment")
+            )
 
-            # Valor a precios actuales vs invertido (realidad del dinero)
-            valor_actual = cash_libre
-            for s in summaries:
-                ticker_s = s["ticker"]
-                mkt_s = mkt_prices.get(ticker_s, 0.0)
-                stock_q = s.get("stock_quantity") or 0
-                opt_q = s.get("option_contracts") or 0
-                strk = s.get("strike") or 0
-                is_put_s = (s.get("strategy_type") or "").upper() in ("CSP", "PUT")
-                valor_actual += stock_q * mkt_s
-                if opt_q and strk:
-                    if is_put_s:
-                        collat_s = strk * 100 * opt_q
-                        intrinsic_put = max(0.0, strk - mkt_s) * 100 * opt_q
-                        valor_actual += collat_s - intrinsic_put
-                    else:
-                        intrinsic_call = max(0.0, mkt_s - strk) * 100 * opt_q
-                        valor_actual -= intrinsic_call
-            valor_actual = round2(valor_actual)
+            # Valor a precios actuales vs invertido (realidad del dinero); opciones al medio bid/ask si hay cotización
+            valor_actual = market_value(summaries, mkt_prices, cash_libre, option_marks=option_marks)
             pnl_real = round2(valor_actual - cap_total)
             pnl_pct = (100.0 * (valor_actual - cap_total) / cap_total) if cap_total else 0.0
             pnl_pct = round2(pnl_pct)
@@ -622,139 +620,24 @@ with tab_dash:
                 f'Capital cuenta (invertido) <strong>${fmt2(cap_total)}</strong> · '
                 f'P&L no realizado <strong style="color:{"#3fb950" if pnl_real >= 0 else "#f85149"}">${fmt2(pnl_real)} ({fmt2(pnl_pct)}%)</strong>'
                 f'</div>'
-                f'<div class="timeline-section-sub">Efectivo disponible + valor de posiciones a precio de mercado (acciones y opciones).</div></div>',
+                f'<div class="timeline-section-sub">Efectivo disponible + valor de posiciones a precio de mercado (acciones y opciones; {len(option_marks)} de {len(leg_symbols)} opciones al medio bid/ask, el resto a valor intrínseco).</div></div>',
                 unsafe_allow_html=True,
             )
 
+            _sp_rows = profiler.start("cálculo: filas del dashboard")
+            df_dash = dashboard_frame(summaries, mkt_prices, cap_total, free_shares=free_shares_by_ticker(trades_open))
+            profiler.stop(_sp_rows)
+
             total_primas = sum((s.get("premiums_received") or 0) for s in summaries)
             total_primas = round2(total_primas)
             # Anualizado global: (RoC% / días promedio posición) * 365; usamos DTE como proxy si no tenemos días posición
-            dte_list = [calculate_dte(s.get("expiration_date")) for s in summaries]
-            avg_dte = sum(dte_list) / len(dte_list) if dte_list else 0
+            avg_dte = float(df_dash["_DTE"].mean())
             total_roc_pct = (total_primas / colateral * 100) if colateral else 0.0
             ann_ret_approx = calculate_annualized_return(total_roc_pct, int(avg_dte)) if avg_dte else 0.0
             total_return_pct = (total_primas / colateral * 100) if colateral else 0.0
             utilization_pct = (colateral / cap_total * 100) if cap_total else 0.0
             on_track = ann_ret_approx >= target_ann if target_ann else False
 
-            rows = []
-            for s in summaries:
-                ticker = s["ticker"]
-                mkt = mkt_prices.get(ticker, 0.0)
-                strike = s.get("strike")
-                prems = s.get("premiums_received", 0) or 0
-                contracts = s.get("option_contracts", 0) or 0
-                dte = calculate_dte(s.get("expiration_date"))
-                is_put = (s.get("strategy_type") or "").upper() in ("CSP", "PUT")
-                stock_qty_s = s.get("stock_quantity") or 0
-                net_cost_s = s.get("net_cost_basis_total") or 0
-                cost_per_share_s = (net_cost_s / max(1, stock_qty_s)) if stock_qty_s else None
-                # CC: BE real = coste neto por acción - prima por acción (incluye rolls)
-                be = calculate_breakeven(
-                    strike or 0, prems, contracts, is_put,
-                    cost_basis_per_share=cost_per_share_s if not is_put and cost_per_share_s else None,
-                ) if strike else 0.0
-                zone = delta_approx_itm_otm(strike or 0, mkt, is_put) if strike else "—"
-                collat = (strike or 0) * 100 * contracts if is_put else (s.get("stock_cost_total") or 0)
-                alloc_pct = (collat / cap_total * 100) if cap_total else 0.0
-                prem_per_contract = (prems / (contracts * 100)) if contracts else 0
-                net_prem = prems
-                open_date = s.get("trade_date") or ""
-                exp_date = s.get("expiration_date") or ""
-                try:
-                    open_short = datetime.strptime(str(open_date)[:10], "%Y-%m-%d").strftime("%b %d") if open_date else "—"
-                except Exception:
-                    open_short = str(open_date)[:10] if open_date else "—"
-                try:
-                    exp_short = datetime.strptime(str(exp_date)[:10], "%Y-%m-%d").strftime("%b %d") if exp_date else "—"
-                except Exception:
-                    exp_short = str(exp_date)[:10] if exp_date else "—"
-                fecha_inicio = str(open_date)[:10] if open_date else "—"
-                fecha_exp = str(exp_date)[:10] if exp_date else "—"
-                campaign_days = s.get("campaign_days")
-                if campaign_days is not None and campaign_days >= 0:
-                    dias_posicion = int(campaign_days)
-                else:
-                    try:
-                        d0 = datetime.strptime(str(open_date)[:10], "%Y-%m-%d").date()
-                        d1 = datetime.strptime(str(exp_date)[:10], "%Y-%m-%d").date()
-                        dias_posicion = max(0, (d1 - d0).days)
-                    except (ValueError, TypeError):
-                        dias_posicion = 0
-                roc = calculate_return_on_capital(prems, collat) if collat else 0.0
-                # Anualizado: días desde inicio de campaña hasta expiración (no DTE desde hoy)
-                try:
-                    d0 = datetime.strptime(str(open_date)[:10], "%Y-%m-%d").date()
-                    d1 = datetime.strptime(str(exp_date)[:10], "%Y-%m-%d").date()
-                    dias_para_anualizado = max(0, (d1 - d0).days)
-                except (ValueError, TypeError):
-                    dias_para_anualizado = dte if dte and dte > 0 else 0
-                ann_ret = calculate_annualized_return(roc, dias_para_anualizado) if dias_para_anualizado else 0.0
-                stock_qty = s.get("stock_quantity") or 0
-                net_cost_total = s.get("net_cost_basis_total") or 0
-                cost_per_share = (net_cost_total / max(1, stock_qty)) if stock_qty else 0
-                if stock_qty:
-                    diagnostico = "Riesgo" if zone == "ITM" else ("Ganando" if (mkt or 0) >= cost_per_share else "Perdiendo")
-                else:
-                    diagnostico = "Riesgo" if zone == "ITM" else "OK"
-                if zone == "—" or not strike:
-                    pop_label = "N/A"
-                else:
-                    dist_pct = abs((mkt or 0) - strike) / strike * 100
-                    pop_label = f"~{min(99, max(1, round2(50 + dist_pct * 0.5)))}%"
-                estrategia_raw = s.get("strategy_type") or "—"
-                is_cc = (estrategia_raw or "").upper() == "CC"
-                if stock_qty and contracts and is_cc:
-                    estrategia_label = "Propias + CC"
-                elif stock_qty and contracts and (estrategia_raw or "").upper() in ("CSP", "PUT"):
-                    estrategia_label = "Propias + CSP"
-                elif estrategia_raw == "PROPIAS":
-                    estrategia_label = "Propias"
-                else:
-                    estrategia_label = estrategia_raw
-                acciones_libres = get_stock_quantity(account_id, ticker)
-                # Costo real por acción (promedio si hay varias compras): (pagado/asignación − primas − dividendos + ajustes) / acciones
-                costo_real_acc = round2(cost_per_share) if stock_qty and cost_per_share else None
-                rows.append({
-                    "Activo": ticker,
-                    "Estrategia": estrategia_label,
-                    "Contratos": contracts,
-                    "Acciones libres": acciones_libres,
-                    "Fecha inicio": fecha_inicio,
-                    "Fecha exp.": fecha_exp,
-                    "Días posición": dias_posicion,
-                    "Precio MKT": round2(mkt),
-                    "Strike": round2(strike) if strike else "—",
-                    "Prima recibida": round2(net_prem),
-                    "Breakeven": round2(be),
-                    "Costo real ($/acc)": costo_real_acc if costo_real_acc is not None else "—",
-                    "Diagnostico": diagnostico,
-                    "Retorno": round2(roc),
-                    "Anualizado": round2(ann_ret),
-                    "POP": pop_label,
-                    "SYMBOL": ticker,
-                    "QTY": contracts,
-                    "NET PREM": round2(net_prem),
-                    "COLLAT": round2(collat),
-                    "ALLOC %": round2(alloc_pct),
-                    "OPEN": open_short,
-                    "EXP": exp_short,
-                    "DUR": f"{dte}d",
-                    "BE": round2(be),
-                    "MKT": round2(mkt),
-                    "Estrategia_raw": estrategia_raw,
-                    "Zona": zone,
-                    "Exp_Date": exp_date,
-                    "Open_Date": open_date,
-                    "_DTE": dte,
-                    "_collat": collat,
-                    "_prems": prems,
-                })
-            df_dash = pd.DataFrame(rows)
-            # Orden: en riesgo primero; resaltar con fondo rojo suave
-            df_dash["_sort_diag"] = df_dash["Diagnostico"].apply(lambda x: (0 if x == "Riesgo" else (1 if x == "Perdiendo" else 2)))
-            df_dash = df_dash.sort_values("_sort_diag").drop(columns=["_sort_diag"])
-
             used_pct = (colateral / cap_total * 100) if cap_total else 0
             max_per_ticker_pct = safe_float(acc_data.get("max_per_ticker"))
             ticker_collat = df_dash.groupby("Activo")["COLLAT"].sum()
@@ -796,7 +679,8 @@ with tab_dash:
                     fig_pie.add_annotation(text=f"Sin posiciones.<br>Disponible: ${fmt2(cash_libre)} (100%)", x=0.5, y=0.5, font=dict(size=14, color="#8b949e"), showarrow=False)
                     fig_pie.update_layout(template="plotly_dark", height=shared_chart_height, paper_bgcolor="rgba(22,27,34,0.98)", plot_bgcolor="rgba(22,27,34,0.98)")
                 st.markdown('<div class="dashboard-card"><h3>Capital por ticker y disponible</h3>', unsafe_allow_html=True)
-                st.plotly_chart(fig_pie, use_container_width=True)
+                with profiler.span("st.plotly_chart: capital por ticker"):
+                    st.plotly_chart(fig_pie, use_container_width=True)
                 st.markdown('</div>', unsafe_allow_html=True)
             with col_sym:
                 allocs_by_ticker = df_dash.groupby("Activo")["ALLOC %"].sum()
@@ -819,7 +703,8 @@ with tab_dash:
                 if max_per_ticker_pct and max_per_ticker_pct > 0:
                     fig_bars.add_vline(x=float(max_per_ticker_pct), line_dash="dash", line_color="#e3b341", line_width=2, annotation_text=f" Límite {fmt2(max_per_ticker_pct)}% ", annotation_position="top")
                 st.markdown('<div class="dashboard-card"><h3>Por símbolo (% del capital total)</h3>', unsafe_allow_html=True)
-                st.plotly_chart(fig_bars, use_container_width=True)
+                with profiler.span("st.plotly_chart: por símbolo"):
+                    st.plotly_chart(fig_bars, use_container_width=True)
                 st.markdown(f'<div class="card-sub">Máx. por ticker: {fmt2(max_per_ticker_pct)}%. En rojo: tickers que superan el límite.</div></div>', unsafe_allow_html=True)
 
             # Alertas expiración cercana (justo encima de la línea de vencimientos)
@@ -916,12 +801,13 @@ with tab_dash:
                     return ["background-color: #2d251a; color: #d29922"] * n
                 return [""] * n
             styled = df_show.style.apply(highlight_risk, axis=1)
-            st.dataframe(
-                styled,
-                width="stretch",
-                hide_index=True,
-                on_select="ignore",
-            )
+            with profiler.span("st.dataframe: posiciones abiertas"):
+                st.dataframe(
+                    styled,
+                    width="stretch",
+                    hide_index=True,
+                    on_select="ignore",
+                )
             st.markdown('</div>', unsafe_allow_html=True)  # dashboard-card Open Positions
 
             # Selección solo por desplegable + botón (sin columna de cuadro en la tabla)
@@ -1222,10 +1108,7 @@ with tab_dash:
                                     st.rerun()
                         with col_del:
                             if not is_recompra_trade and st.form_submit_button("Borrar este trade"):
-                                conn = db.get_conn()
-                                conn.execute("DELETE FROM Trade WHERE trade_id = ?", (selected_trade_id,))
-                                conn.commit()
-                                conn.close()
+                                db.delete_trade(selected_trade_id, account_id)
                                 st.success("Trade borrado.")
                                 st.rerun()
                         with col_close:
@@ -1268,15 +1151,31 @@ with tab_dash:
                 st.markdown('<div class="rad-card">', unsafe_allow_html=True)
                 st.markdown(f"**{ticker} ({estrategia}) · {contracts} contrato(s)**")
 
-                from app.position_chart_utils import risk_analysis_score, build_gauge_price_axis, build_copyable_summary_position
+                from app.position_chart_utils import (
+                    risk_analysis_score,
+                    build_gauge_price_axis,
+                    build_gauge_price_axis_svg,
+                    build_copyable_summary_position,
+                    build_pnl_expiry_figure,
+                    gauge_renderer_for,
+                )
                 health_main = risk_analysis_score(pnl_actual, mkt, be, is_put, dte, 0, True)
                 status_main = "Favorable" if health_main > 66 else ("Evaluar" if health_main > 33 else "Desfavorable")
-                fig_gauge_main = build_gauge_price_axis(
-                    strike or 0, be, mkt, dte, status_main,
-                    title="Análisis del riesgo",
-                    is_put=is_put,
-                )
-                st.plotly_chart(fig_gauge_main, use_container_width=True)
+                # Renderizador por vista (config.GAUGE_RENDERER o ?gauge=... en la URL): Plotly o SVG en línea
+                gauge_spec = ",".join(st.query_params.get_all("gauge")) or config.GAUGE_RENDERER
+                if gauge_renderer_for("posicion", gauge_spec) == "svg":
+                    st.markdown(
+                        build_gauge_price_axis_svg(strike or 0, be, mkt, dte, status_main, title="Análisis del riesgo", is_put=is_put),
+                        unsafe_allow_html=True,
+                    )
+                else:
+                    fig_gauge_main = build_gauge_price_axis(
+                        strike or 0, be, mkt, dte, status_main,
+                        title="Análisis del riesgo",
+                        is_put=is_put,
+                    )
+                    with profiler.span("st.plotly_chart: gauge posición"):
+                        st.plotly_chart(fig_gauge_main, use_container_width=True)
 
                 st.markdown(f"""
                 <div class="rad-metrics rad-metrics-grid">
@@ -1295,6 +1194,14 @@ with tab_dash:
                     copy_text_main = build_copyable_summary_position(ticker, estrategia, contracts, strike or 0, be, mkt, prems, dte, pnl_actual, max_ganancia, max_perdida_label, estado_texto, diagnostico)
                     st.text_area("Resumen (selecciona y copia)", value=copy_text_main, height=160, key="copy_main_pos", disabled=True, label_visibility="collapsed")
                     st.caption("Selecciona todo el texto y cópialo para compartir (móvil: mantén pulsado).")
+                # Radiografía P&L de la posición: fila de la matriz de la cuenta (el índice de df_dash es el del resumen)
+                pnl_exp = get_pnl_at_expiry_cached(account_id, data_version, tuple(sorted(mkt_prices.items())))
+                if 0 <= int(sel_data.name) < len(pnl_exp.tickers):
+                    x_pos, pnl_pos = pnl_exp.position(int(sel_data.name))
+                    st.plotly_chart(
+                        build_pnl_expiry_figure(x_pos, pnl_pos, marks={"Strike": strike or None, "BE": be or None, "Precio": mkt or None}),
+                        use_container_width=True,
+                    )
                 st.markdown('</div>', unsafe_allow_html=True)
 
 with tab_report:
@@ -1314,7 +1221,7 @@ with tab_report:
         account_name = acc_data.get("name", "")
 
         # Filtros: consulta ligera (solo tickers/estrategias) para no cargar todos los trades
-        filter_options = get_trade_filter_options(account_id)
+        filter_options = get_trade_filter_options(account_id, data_version)
         tickers_for_filter = filter_options.get("tickers") or []
         strategies_for_filter = filter_options.get("strategies") or []
         col_f1, col_f2, col_f3 = st.columns([1, 1, 1])
@@ -1341,14 +1248,16 @@ with tab_report:
             )
 
         # Vista previa de trades en el rango con filtros
-        report_trades = get_trades_for_report(
-            account_id,
-            date_from_s,
-            date_to_s,
-            ticker=ticker_filter or None,
-            strategy=strategy_filter or None,
-            status=status_filter or None,
-        )
+        with profiler.span("reportes: get_trades_for_report"):
+            report_trades = get_trades_for_report(
+                account_id,
+                date_from_s,
+                date_to_s,
+                ticker=ticker_filter or None,
+                strategy=strategy_filter or None,
+                status=status_filter or None,
+                data_version=data_version,
+            )
         st.markdown("**Vista previa** — trades en el rango / filtros aplicados")
         if report_trades:
             # Expandir "apertura cerrada por recompra" (formato antiguo, 1 fila en BD) en 2 filas: apertura + recompra
@@ -1361,17 +1270,17 @@ with tab_report:
             for t in report_trades:
                 if _is_opening_with_buyback(t):
                     # Fila apertura: mostrar Prima, sin Tipo_cierre ni Débito
-                    r_open = dict(t)
+                    r_open = t.to_dict()
                     r_open["close_type"] = None
                     r_open["buyback_debit"] = None
                     display_trades.append(r_open)
                     # Fila recompra: mostrar Tipo_cierre Recompra y Débito
-                    r_close = dict(t)
+                    r_close = t.to_dict()
                     r_close["total_usd"] = -round2(float(t.get("buyback_debit") or 0))
                     r_close["close_type"] = "buyback"
                     display_trades.append(r_close)
                 else:
-                    display_trades.append(dict(t))
+                    display_trades.append(t.to_dict())
             prev_df = pd.DataFrame(display_trades)
             prev_df = prev_df.rename(columns={
                 "trade_date": "Fecha", "ticker": "Ticker", "strategy_type": "Estrategia",
@@ -1466,7 +1375,8 @@ with tab_report:
 
         st.markdown("---")
         st.markdown("**Tax Efficiency & rendimiento del capital** (trades cerrados en el rango)")
-        tax = tax_efficiency_summary(account_id, date_from_s, date_to_s)
+        with profiler.span("reportes: tax_efficiency_summary"):
+            tax = tax_efficiency_summary(account_id, date_from_s, date_to_s, data_version)
         col_tx1, col_tx2, col_tx3 = st.columns(3)
         with col_tx1:
             st.metric("Total realizado", f"${fmt2(tax['total_realized_gain_loss'])}")
@@ -1509,23 +1419,25 @@ with tab_report:
         st.markdown("**Exportar bitácora** — hojas listas para combinar")
         col1, col2, col3 = st.columns(3)
         with col1:
-            csv_data = export_trades_csv(account_id, date_from_s, date_to_s, account_name)
-            if csv_data:
-                st.download_button("📥 Descargar CSV", csv_data, file_name=f"alphawheel_trades_{date_from_s}_{date_to_s}.csv", mime="text/csv")
-            else:
-                st.caption("Sin datos para CSV")
+            with profiler.span("reportes: export CSV"):
+                # CSV en streaming desde el cursor: sin DataFrame ni copia intermedia del contenido
+                csv_data = open_trades_csv_stream(account_id, date_from_s, date_to_s, account_name)
+                if csv_data:
+                    st.download_button("📥 Descargar CSV", csv_data, file_name=f"alphawheel_trades_{date_from_s}_{date_to_s}.csv", mime="text/csv")
+                else:
+                    st.caption("Sin datos para CSV")
         with col2:
-            excel_bytes = export_trades_excel(account_id, date_from_s, date_to_s, account_name)
+            with profiler.span("reportes: export Excel"):
+                excel_bytes = export_trades_excel(account_id, date_from_s, date_to_s, account_name)
             if excel_bytes:
                 st.download_button("📥 Descargar Excel", excel_bytes, file_name=f"alphawheel_bitacora_{date_from_s}_{date_to_s}.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
                 st.caption("Hojas: Trades, Resumen_por_ticker, Resumen_por_estrategia")
             else:
                 st.caption("Sin datos para Excel" if not csv_data else "Instala openpyxl: pip install openpyxl")
         with col3:
-            pdf_bytes = export_trades_pdf(account_id, date_from_s, date_to_s, account_name)
-            if pdf_bytes:
-                st.download_button("📥 Descargar PDF", pdf_bytes, file_name=f"alphawheel_bitacora_{date_from_s}_{date_to_s}.pdf", mime="application/pdf")
-            else:
+            from app.cockpit import render_pdf_export
+
+            if not render_pdf_export(account_id, date_from_s, date_to_s, account_name, label="📥 Descargar PDF", key="pdf_export_main", data_version=data_version):
                 st.caption("Sin datos para PDF")
     st.markdown('</div>', unsafe_allow_html=True)  # dashboard-card Reportes
 
@@ -1585,4 +1497,7 @@ with tab_settings:
                 st.error("Ya existe una cuenta con ese nombre. Elige otro.")
         else:
             st.warning("Escribe un nombre para la cuenta.")
-    st.markdown('</div>', unsafe_allow_html=True)  # dashboard-card Editar Cuenta
\ No newline at end of file
+    st.markdown('</div>', unsafe_allow_html=True)  # dashboard-card Editar Cuenta
+
+profiler.render_profile_waterfall()
+render_query_debug_panel()
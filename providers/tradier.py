@@ -1,6 +1,6 @@
 # AlphaWheel Pro - Integración Tradier (modular; tokens desde panel de configuración)
 import requests
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
 from engine.calculations import round2
 from .base import BaseProvider, ProviderStatus
@@ -52,6 +52,56 @@ class TradierProvider(BaseProvider):
         except Exception:
             return None
 
+    def get_quotes(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        """Cotizaciones en lote (hasta QUOTES_BATCH_SIZE símbolos por petición); ver fetch_quotes."""
+        return fetch_quotes(symbols, self.base_url, self.token)
+
+
+# Máximo de símbolos por petición a markets/quotes (subyacentes y opciones OCC mezclados)
+QUOTES_BATCH_SIZE = 100
+
+
+def fetch_quotes(symbols: Iterable[str], api_base: str, token: str, batch_size: int = QUOTES_BATCH_SIZE) -> Dict[str, dict]:
+    """
+    Cotizaciones de varios símbolos (tickers y/o OCC) en peticiones de hasta batch_size símbolos cada una.
+    Devuelve {SÍMBOLO: quote}; los símbolos sin respuesta (o de un lote que falla) no aparecen.
+    """
+    unique = sorted({(s or "").strip().upper() for s in symbols} - {""})
+    if not (unique and token and api_base):
+        return {}
+    headers = {"Authorization": f"Bearer {token.strip()}", "Accept": "application/json"}
+    out: Dict[str, dict] = {}
+    for i in range(0, len(unique), batch_size):
+        try:
+            r = requests.get(
+                f"{api_base}markets/quotes",
+                params={"symbols": ",".join(unique[i:i + batch_size])},
+                headers=headers,
+                timeout=10,
+            )
+            quotes = ((r.json() or {}).get("quotes") or {}).get("quote") or []
+        except Exception:
+            continue
+        # Un solo símbolo → dict; varios → lista
+        for q in quotes if isinstance(quotes, list) else [quotes]:
+            if isinstance(q, dict) and q.get("symbol"):
+                out[str(q["symbol"]).upper()] = q
+    return out
+
+
+def quote_mid(quote: Optional[dict]) -> Optional[float]:
+    """Precio medio bid/ask de una cotización; si falta un lado, el último precio; None si no hay ninguno."""
+    if not quote:
+        return None
+    try:
+        bid, ask = float(quote.get("bid") or 0), float(quote.get("ask") or 0)
+        if bid > 0 and ask > 0:
+            return (bid + ask) / 2.0
+        last = float(quote.get("last") or 0)
+    except (TypeError, ValueError):
+        return None
+    return last if last > 0 else None
+
 
 # Compatibilidad con código que importa TradierClient desde tradier_engine
 def TradierClient(token: str, environment: str = "sandbox"):
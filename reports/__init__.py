@@ -1,6 +1,8 @@
 # AlphaWheel Pro - Generador de bitácora (reportes)
 from .bitacora import (
     export_trades_csv,
+    iter_trades_csv,
+    open_trades_csv_stream,
     export_trades_excel,
     export_trades_pdf,
     tax_efficiency_summary,
@@ -8,6 +10,8 @@ from .bitacora import (
 
 __all__ = [
     "export_trades_csv",
+    "iter_trades_csv",
+    "open_trades_csv_stream",
     "export_trades_excel",
     "export_trades_pdf",
     "tax_efficiency_summary",
@@ -0,0 +1,51 @@
+# AlphaWheel Pro - Exportación de la bitácora desde línea de comandos
+# CSV en streaming desde el cursor de la BD (memoria constante sea cual sea el rango).
+#
+# Uso:
+#   python -m reports csv --account-id 3 --from 2024-01-01 --to 2024-12-31 --output trades.csv
+#   python -m reports csv --account-id 3 --from 2024-01-01 --to 2024-12-31 --database-url postgresql://... > trades.csv
+import argparse
+import sys
+
+import config
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m reports", description="Exporta la bitácora de una cuenta.")
+    parser.add_argument("format", choices=["csv"], help="Formato de salida.")
+    parser.add_argument("--account-id", type=int, required=True)
+    parser.add_argument("--from", dest="date_from", required=True, help="Fecha inicial (YYYY-MM-DD).")
+    parser.add_argument("--to", dest="date_to", required=True, help="Fecha final (YYYY-MM-DD).")
+    parser.add_argument("--account-name", default="")
+    parser.add_argument("--output", default="-", help="Archivo de salida ('-' = stdout).")
+    parser.add_argument("--db-path", default=None, help="Ruta SQLite (por defecto config.DB_PATH).")
+    parser.add_argument("--database-url", default=None, help="URL postgresql:// (tiene prioridad sobre --db-path).")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        config.DATABASE_URL = args.database_url
+    elif args.db_path:
+        config.DATABASE_URL = ""
+        config.DB_PATH = args.db_path
+
+    # Sin runtime de Streamlit, st.cache_data avisa en cada función decorada: silenciar
+    try:
+        from streamlit import logger as st_logger
+        st_logger.set_log_level("error")
+    except Exception:
+        pass
+    from reports.bitacora import iter_trades_csv
+
+    chunks = iter_trades_csv(args.account_id, args.date_from, args.date_to, args.account_name)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
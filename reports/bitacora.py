@@ -1,26 +1,102 @@
 # AlphaWheel Pro - Bitácora: PDF, Excel, CSV, Tax Efficiency, comentarios
 # Reportes flexibles por rango de fechas; hojas bien elaboradas para combinar con otras
+# CLI de exportación: python -m reports (ver reports/__main__.py)
+import csv
 import io
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import itertools
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from typing import List, Dict, Any, Callable, Iterator, Optional
 
-import pandas as pd
 import streamlit as st
 from database import db
+from database.records import TradeRecord
 from engine.calculations import round2, safe_float
-from business.wheel import get_campaign_root_id, get_campaign_start_date
+from business.wheel import resolve_campaigns
 
 
-def _trades_to_dataframe(trades: List[Dict], account_name: str) -> pd.DataFrame:
-    """Convierte lista de trades a DataFrame con columnas estándar y 2 decimales."""
-    if not trades:
-        return pd.DataFrame()
-    df = pd.DataFrame(trades)
-    for col in ("price", "strike"):
-        if col in df.columns:
-            df[col] = df[col].apply(lambda x: round2(x) if x is not None else None)
-    df["account_name"] = account_name
-    return df
+def _report_date_bounds(date_from: str, date_to: str):
+    """Fechas ISO normalizadas; (None, None) si no son válidas (entonces no se filtra por rango)."""
+    try:
+        return datetime.fromisoformat(date_from).date().isoformat(), datetime.fromisoformat(date_to).date().isoformat()
+    except Exception:
+        return None, None
+
+
+@dataclass(slots=True)
+class ReportRecord(TradeRecord):
+    """Fila de la bitácora: columnas de Trade + campaña, total USD y nombre de cuenta (solo CSV), en el mismo orden."""
+
+    campaign_root_id: Optional[int] = None
+    campaign_start_date: Optional[str] = None
+    total_usd: Optional[float] = None
+    account_name: Optional[str] = None
+
+
+def _enrich_report_row(r: ReportRecord, campaigns: Dict[int, tuple]) -> ReportRecord:
+    """Campaña (raíz y fecha de inicio), total USD y normalización de close_type/buyback_debit de una fila."""
+    root_id, start_date = campaigns.get(r.trade_id, (None, None))
+    r.campaign_root_id = root_id
+    r.campaign_start_date = start_date if root_id else None
+    atype = (r.asset_type or "").strip().upper()
+    qty = int(r.quantity or 0)
+    # No usar safe_float(price): redondea a 2 decimales y anula débitos pequeños (ej. 0.02 → price -0.0001 → 0)
+    try:
+        p_raw = float(r.price) if r.price is not None else 0.0
+    except (TypeError, ValueError):
+        p_raw = 0.0
+    # Total en USD: opciones = precio × 100 × contratos (prima positiva, débito negativo); acciones = precio × cantidad
+    mult = 100 if atype == "OPTION" else 1
+    r.total_usd = round2(p_raw * qty * mult)
+
+    # Recompra: trade de cierre. Débito = precio por acción × 100 × contratos (como la prima). Preferir BD; si no, derivar.
+    entry = (r.entry_type or "").strip().upper()
+    is_closing = (
+        entry == "CLOSING"
+        or (r.parent_trade_id and atype == "OPTION" and p_raw <= 0)
+        or (atype == "OPTION" and p_raw < 0)
+    )
+    if is_closing and atype == "OPTION":
+        # Cierre por vencimiento: prima queda como ganancia (total_usd positivo); no hay débito
+        if (r.close_type or "").lower() == "expiration":
+            r.close_type = "expiration"
+            r.buyback_debit = None
+            # total_usd ya es la prima (positiva)
+        else:
+            r.close_type = r.close_type or "buyback"
+            if r.buyback_debit is not None:
+                try:
+                    r.buyback_debit = round2(float(r.buyback_debit))
+                except (TypeError, ValueError):
+                    r.buyback_debit = round2(abs(p_raw) * qty * 100) if qty else 0.0
+            else:
+                r.buyback_debit = round2(abs(p_raw) * qty * 100) if qty else round2(abs(r.total_usd))
+            # Para que el neto del periodo sea correcto: recompra resta (total_usd negativo)
+            r.total_usd = -round2(float(r.buyback_debit))
+    return r
+
+
+def iter_trades_for_report(
+    account_id: int,
+    date_from: str,
+    date_to: str,
+    ticker: Optional[str] = None,
+    strategy: Optional[str] = None,
+    status: Optional[str] = None,
+) -> Iterator[ReportRecord]:
+    """
+    Filas de _get_trades_for_report en streaming (cursor del servidor, enriquecidas de una en una).
+    Solo el mapa de padres de la cuenta (trade_id → padre, fecha) se carga entero, para resolver campañas.
+    """
+    d_from, d_to = _report_date_bounds(date_from, date_to)
+    campaigns = None
+    for r in db.iter_trades_in_range(
+        account_id, d_from, d_to, ticker=ticker or None, strategy=strategy or None, status=status or None,
+        record=ReportRecord,
+    ):
+        if campaigns is None:
+            campaigns = resolve_campaigns(db.get_trade_parent_map(account_id))
+        yield _enrich_report_row(r, campaigns)
 
 
 def _get_trades_for_report(
@@ -30,127 +106,81 @@ def _get_trades_for_report(
     ticker: Optional[str] = None,
     strategy: Optional[str] = None,
     status: Optional[str] = None,
-) -> List[Dict]:
+) -> List[ReportRecord]:
     """
     Trades que abrieron O cerraron en el rango (para ver campaña completa).
     - Apertura en rango: trade_date >= date_from AND trade_date <= date_to
     - Cierre en rango: closed_date >= date_from AND closed_date <= date_to
     Así si cierras por recompra en febrero, el trade sale en el reporte de febrero.
 
-    Para que el comportamiento sea idéntico en SQLite y PostgreSQL y evitar problemas
-    con diferencias en SQL, obtenemos todos los trades de la cuenta y filtramos en Python.
+    El rango y los filtros se resuelven en SQL (db.get_trades_in_range, con índices por fecha);
+    si las fechas no son ISO válidas no se filtra por rango, como antes.
     """
-    # Obtener todos los trades de la cuenta
+    d_from, d_to = _report_date_bounds(date_from, date_to)
     try:
-        all_trades = db.get_trades_by_account(account_id)
+        rows: List[ReportRecord] = db.get_trades_in_range(
+            account_id, d_from, d_to, ticker=ticker or None, strategy=strategy or None, status=status or None,
+            record=ReportRecord,
+        )
     except Exception:
-        all_trades = []
+        rows = []
 
-    rows: List[Dict] = []
-    try:
-        d_from = datetime.fromisoformat(date_from).date()
-        d_to = datetime.fromisoformat(date_to).date()
-    except Exception:
-        d_from = None
-        d_to = None
-
-    for t in all_trades:
-        # Filtros opcionales por ticker / estrategia / estado
-        if ticker and (t.get("ticker") or "").strip().upper() != (ticker or "").strip().upper():
-            continue
-        if strategy and (t.get("strategy_type") or "").strip().upper() != (strategy or "").strip().upper():
-            continue
-        if status and (t.get("status") or "").strip().upper() != (status or "").strip().upper():
-            continue
-
-        td_str = (t.get("trade_date") or "")[:10]
-        cd_str = (t.get("closed_date") or "")[:10]
-        try:
-            td = datetime.fromisoformat(td_str).date() if td_str else None
-        except Exception:
-            td = None
-        try:
-            cd = datetime.fromisoformat(cd_str).date() if cd_str else None
-        except Exception:
-            cd = None
+    # Enriquecer en una pasada: campaña (mapa de padres precargado, una consulta) + total USD
+    campaigns = resolve_campaigns(db.get_trade_parent_map(account_id)) if rows else {}
+    for r in rows:
+        _enrich_report_row(r, campaigns)
+    return rows
 
-        # Condiciones de rango
-        cond_open = (d_from is None or d_to is None) or (td is not None and d_from <= td <= d_to)
-        cond_close = (d_from is None or d_to is None) or (cd is not None and d_from <= cd <= d_to)
-        if not (cond_open or cond_close):
-            continue
 
-        rows.append(dict(t))
+# Lecturas para la UI cacheadas por versión de datos de la cuenta (db.get_data_version): con data_version la
+# caché no caduca por tiempo y cualquier escritura en la cuenta cambia la clave; sin ella se lee directo de la BD.
+@st.cache_data(show_spinner=False, max_entries=256)
+def _count_trades_cached(account_id: int, data_version: int) -> int:
+    return count_trades_for_account(account_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _filter_options_cached(account_id: int, data_version: int) -> Dict[str, List[str]]:
+    return get_trade_filter_options(account_id)
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def _trades_for_report_cached(account_id: int, date_from: str, date_to: str, ticker: Optional[str],
+                              strategy: Optional[str], status: Optional[str], data_version: int) -> List[Dict]:
+    return _get_trades_for_report(account_id, date_from, date_to, ticker, strategy, status)
 
-    # Enriquecer: campaña + total USD (convención opciones: 1 contrato = 100, total = precio × 100 × contratos)
-    for r in rows:
-        root_id = get_campaign_root_id(account_id, r["trade_id"])
-        r["campaign_root_id"] = root_id
-        r["campaign_start_date"] = (
-            get_campaign_start_date(account_id, r["trade_id"]) if root_id else None
-        )
-        atype = (r.get("asset_type") or "").strip().upper()
-        qty = int(r.get("quantity") or 0)
-        # No usar safe_float(price): redondea a 2 decimales y anula débitos pequeños (ej. 0.02 → price -0.0001 → 0)
-        try:
-            p_raw = float(r.get("price")) if r.get("price") is not None else 0.0
-        except (TypeError, ValueError):
-            p_raw = 0.0
-        # Total en USD: opciones = precio × 100 × contratos (prima positiva, débito negativo); acciones = precio × cantidad
-        mult = 100 if atype == "OPTION" else 1
-        r["total_usd"] = round2(p_raw * qty * mult)
-
-        # Recompra: trade de cierre. Débito = precio por acción × 100 × contratos (como la prima). Preferir BD; si no, derivar.
-        entry = (r.get("entry_type") or "").strip().upper()
-        is_closing = (
-            entry == "CLOSING"
-            or (r.get("parent_trade_id") and atype == "OPTION" and p_raw <= 0)
-            or (atype == "OPTION" and p_raw < 0)
-        )
-        if is_closing and atype == "OPTION":
-            # Cierre por vencimiento: prima queda como ganancia (total_usd positivo); no hay débito
-            if (r.get("close_type") or "").lower() == "expiration":
-                r["close_type"] = "expiration"
-                r["buyback_debit"] = None
-                # total_usd ya es la prima (positiva)
-            else:
-                r["close_type"] = r.get("close_type") or "buyback"
-                if r.get("buyback_debit") is not None:
-                    try:
-                        r["buyback_debit"] = round2(float(r["buyback_debit"]))
-                    except (TypeError, ValueError):
-                        r["buyback_debit"] = round2(abs(p_raw) * qty * 100) if qty else 0.0
-                else:
-                    r["buyback_debit"] = round2(abs(p_raw) * qty * 100) if qty else round2(abs(r["total_usd"]))
-                # Para que el neto del periodo sea correcto: recompra resta (total_usd negativo)
-                r["total_usd"] = -round2(float(r["buyback_debit"]))
-    return rows
 
+@st.cache_data(show_spinner=False, max_entries=64)
+def _tax_summary_cached(account_id: int, date_from: str, date_to: str, data_version: int) -> Dict[str, Any]:
+    return tax_efficiency_summary(account_id, date_from, date_to)
 
-@st.cache_data(ttl=120, show_spinner=False)
-def count_trades_for_account(account_id: int) -> int:
+
+def count_trades_for_account(account_id: int, data_version: Optional[int] = None) -> int:
     """Número total de trades de la cuenta (cualquier fecha). Para mensajes cuando el rango devuelve vacío."""
+    if data_version is not None:
+        return _count_trades_cached(account_id, data_version)
     conn = db.get_conn()
     try:
         cur = conn.execute("SELECT COUNT(*) AS n FROM Trade WHERE account_id = ?", (account_id,))
         row = cur.fetchone()
-        return int(row.get("n", 0) or 0) if row else 0
+        return int(row["n"] or 0) if row else 0
     finally:
         conn.close()
 
 
-@st.cache_data(ttl=120, show_spinner=False)
-def get_trade_filter_options(account_id: int) -> Dict[str, List[str]]:
+def get_trade_filter_options(account_id: int, data_version: Optional[int] = None) -> Dict[str, List[str]]:
     """
     Opciones ligeras para los filtros de reporte (tickers y estrategias).
-    Cache 2 min para no repetir cálculo al cambiar solo filtros.
+    Con data_version se cachea hasta la próxima escritura en la cuenta (cambiar solo filtros no recalcula).
     """
+    if data_version is not None:
+        return _filter_options_cached(account_id, data_version)
     try:
         trades = db.get_trades_by_account(account_id) or []
     except Exception:
         trades = []
-    tickers = sorted({(t.get("ticker") or "").strip().upper() for t in trades if t.get("ticker")})
-    strategies = sorted({(t.get("strategy_type") or "").strip().upper() for t in trades if t.get("strategy_type")})
+    tickers = sorted({t.ticker.strip().upper() for t in trades if t.ticker})
+    strategies = sorted({t.strategy_type.strip().upper() for t in trades if t.strategy_type})
     return {"tickers": tickers, "strategies": strategies}
 
 
@@ -161,28 +191,168 @@ def get_trades_for_report(
     ticker: Optional[str] = None,
     strategy: Optional[str] = None,
     status: Optional[str] = None,
+    data_version: Optional[int] = None,
 ) -> List[Dict]:
     """
     API pública: lista de trades en el rango para preview y reportes.
-    Sin caché para que la web siempre muestre datos actuales (evitar resultado vacío cacheado).
+    Con data_version (db.get_data_version) el resultado se cachea y sigue siendo exacto: un trade nuevo, editado
+    o borrado cambia la versión. Sin ella, lectura directa (datos siempre actuales).
     """
+    if data_version is not None:
+        return _trades_for_report_cached(account_id, date_from, date_to, ticker, strategy, status, data_version)
     return _get_trades_for_report(account_id, date_from, date_to, ticker, strategy, status)
 
 
+def iter_trades_csv(
+    account_id: int,
+    date_from: str,
+    date_to: str,
+    account_name: str = "",
+    chunk_rows: int = 500,
+) -> Iterator[str]:
+    """
+    CSV de la bitácora en trozos de texto (cabecera + bloques de chunk_rows filas), directo desde el cursor:
+    memoria constante sea cual sea el rango. Mismas columnas que antes (trade + campaña + total_usd + account_name).
+    No genera nada si no hay trades en el rango.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    columns = None
+    pending = 0
+    for r in iter_trades_for_report(account_id, date_from, date_to):
+        r.price = round2(r.price) if r.price is not None else None
+        r.strike = round2(r.strike) if r.strike is not None else None
+        r.account_name = account_name
+        if columns is None:
+            columns = r.keys()
+            writer.writerow(columns)
+        writer.writerow(["" if v is None else v for v in (getattr(r, c) for c in columns)])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+            pending = 0
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _ChunkReader(io.RawIOBase):
+    """Archivo de solo lectura sobre un iterador de bytes (para st.download_button o copiar a disco)."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # st.download_button hace seek(0) antes de leer: solo se admite "no moverse" al inicio
+        if offset == 0 and whence == io.SEEK_SET and self._pos == 0:
+            return 0
+        raise io.UnsupportedOperation("stream no posicionable")
+
+    def tell(self) -> int:
+        return self._pos
+
+    def readinto(self, b) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        self._pos += n
+        return n
+
+
+def open_trades_csv_stream(
+    account_id: int,
+    date_from: str,
+    date_to: str,
+    account_name: str = "",
+) -> Optional[io.RawIOBase]:
+    """CSV de la bitácora como archivo de lectura en streaming (UTF-8), o None si no hay trades en el rango."""
+    chunks = (c.encode("utf-8") for c in iter_trades_csv(account_id, date_from, date_to, account_name))
+    first = next(chunks, None)
+    if first is None:
+        return None
+    return _ChunkReader(itertools.chain([first], chunks))
+
+
 def export_trades_csv(
     account_id: int,
     date_from: str,
     date_to: str,
     account_name: str = "",
 ) -> str:
-    """Exporta trades del rango de fechas a CSV (contenido como string)."""
-    rows = _get_trades_for_report(account_id, date_from, date_to)
-    df = _trades_to_dataframe(rows, account_name)
-    if df.empty:
-        return ""
-    buf = io.StringIO()
-    df.to_csv(buf, index=False, encoding="utf-8")
-    return buf.getvalue()
+    """Exporta trades del rango de fechas a CSV (contenido como string). Para rangos grandes usar iter_trades_csv."""
+    return "".join(iter_trades_csv(account_id, date_from, date_to, account_name))
+
+
+_EXCEL_TRADE_COLUMNS = [
+    "Fecha", "Ticker", "Activo_tipo", "Estrategia", "Cantidad", "Precio_por_accion", "Total_USD",
+    "Strike", "Fecha_exp", "Estado", "Fecha_cierre", "Tipo_entrada", "Debito_recompra", "Comentario",
+]
+
+
+def _excel_trade_row(r: ReportRecord) -> list:
+    """Fila de la hoja Trades: Total_USD = precio × 100 × contratos (opciones) o precio × cantidad (stock). Débito resta."""
+    total_usd = r.total_usd
+    if total_usd is None:
+        atype = (r.asset_type or "").strip().upper()
+        qty = int(r.quantity or 0)
+        p = safe_float(r.price)
+        total_usd = round2(p * qty * (100 if atype == "OPTION" else 1))
+    is_recompra = (r.close_type or "").lower() == "buyback" or ((r.entry_type or "").upper() == "CLOSING" and (r.asset_type or "").upper() == "OPTION")
+    debito = r.buyback_debit if is_recompra else ""
+    if debito is not None and debito != "":
+        debito = round2(float(debito))
+    return [
+        str(r.trade_date)[:10],
+        str(r.ticker),
+        str(r.asset_type),
+        str(r.strategy_type),
+        int(r.quantity),
+        round2(r.price),
+        total_usd,
+        round2(r.strike) if r.strike is not None else "",
+        str(r.expiration_date or "")[:10],
+        str(r.status),
+        str(r.closed_date or "")[:10],
+        str(r.entry_type),
+        debito if debito != "" else "",
+        (r.comment or "")[:200],
+    ]
+
+
+def _excel_sheet(wb, title: str, header: List[str]):
+    """Hoja write-only con cabecera en negrita centrada, panel congelado y anchos fijados antes de escribir filas."""
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment
+    from openpyxl.utils import get_column_letter
+
+    ws = wb.create_sheet(title)
+    ws.freeze_panes = "A2"
+    for col, name in enumerate(header, start=1):
+        ws.column_dimensions[get_column_letter(col)].width = max(12, min(24, len(str(name)) + 2))
+    font = Font(bold=True)
+    align = Alignment(horizontal="center", wrap_text=True)
+    cells = []
+    for name in header:
+        c = WriteOnlyCell(ws, value=name)
+        c.font = font
+        c.alignment = align
+        cells.append(c)
+    ws.append(cells)
+    return ws
 
 
 def export_trades_excel(
@@ -194,88 +364,103 @@ def export_trades_excel(
     """
     Exporta a Excel: hoja Trades (columnas claras para juntar con otras) y hoja Resumen.
     Flexible por rango de fechas; formato listo para operaciones.
+    Una sola pasada: libro write-only alimentado desde el cursor del reporte (sin DataFrame de trades
+    ni recarga del libro para dar formato); los resúmenes salen de groupby().agg sobre ticker/estrategia/total.
     """
     try:
         import openpyxl
-        from openpyxl.styles import Font, Alignment, Border, Side
-        from openpyxl.utils import get_column_letter
     except ImportError:
         return None
-    rows = _get_trades_for_report(account_id, date_from, date_to)
-    if not rows:
-        buf = io.BytesIO()
+    import pandas as pd
+
+    rows = iter_trades_for_report(account_id, date_from, date_to)
+    first = next(rows, None)
+    buf = io.BytesIO()
+    if first is None:
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "Trades"
-        ws.append(["Fecha", "Ticker", "Activo_tipo", "Estrategia", "Cantidad", "Precio_por_accion", "Total_USD", "Strike", "Fecha_exp", "Estado", "Fecha_cierre", "Tipo_entrada", "Debito_recompra", "Comentario"])
+        ws.append(_EXCEL_TRADE_COLUMNS)
         wb.save(buf)
         return buf.getvalue()
 
-    # Hoja Trades: Total_USD = precio × 100 × contratos (opciones) o precio × cantidad (stock). Débito resta (negativo en Total_USD).
-    data = []
-    for r in rows:
-        total_usd = r.get("total_usd")
-        if total_usd is None:
-            atype = (r.get("asset_type") or "").strip().upper()
-            qty = int(r.get("quantity") or 0)
-            p = safe_float(r.get("price"))
-            total_usd = round2(p * qty * (100 if atype == "OPTION" else 1))
-        is_recompra = (r.get("close_type") or "").lower() == "buyback" or ((r.get("entry_type") or "").upper() == "CLOSING" and (r.get("asset_type") or "").upper() == "OPTION")
-        debito = r.get("buyback_debit") if is_recompra else ""
-        if debito is not None and debito != "":
-            debito = round2(float(debito))
-        data.append([
-            str(r.get("trade_date", ""))[:10],
-            str(r.get("ticker", "")),
-            str(r.get("asset_type", "")),
-            str(r.get("strategy_type", "")),
-            int(r.get("quantity", 0)),
-            round2(r.get("price")),
-            total_usd,
-            round2(r.get("strike")) if r.get("strike") is not None else "",
-            str(r.get("expiration_date") or "")[:10],
-            str(r.get("status", "")),
-            str(r.get("closed_date") or "")[:10],
-            str(r.get("entry_type", "")),
-            debito if debito != "" else "",
-            (r.get("comment") or "")[:200],
-        ])
-    df_trades = pd.DataFrame(data, columns=[
-        "Fecha", "Ticker", "Activo_tipo", "Estrategia", "Cantidad", "Precio_por_accion", "Total_USD",
-        "Strike", "Fecha_exp", "Estado", "Fecha_cierre", "Tipo_entrada", "Debito_recompra", "Comentario"
-    ])
+    wb = openpyxl.Workbook(write_only=True)
+    ws = _excel_sheet(wb, "Trades", _EXCEL_TRADE_COLUMNS)
+    tickers: List[str] = []
+    estrategias: List[str] = []
+    totales: List[float] = []
+    for r in itertools.chain((first,), rows):
+        row = _excel_trade_row(r)
+        ws.append(row)
+        tickers.append(row[1])
+        estrategias.append(row[3])
+        totales.append(row[6])
+
+    # Resumen: Prima_neto_USD = suma de Total_USD (débitos ya vienen negativos, netean)
+    df = pd.DataFrame({"Ticker": tickers, "Estrategia": estrategias, "Total_USD": totales})
+    resumen_ticker = df.groupby("Ticker").agg(
+        Cantidad_trades=("Total_USD", "size"),
+        Prima_neto_USD=("Total_USD", "sum"),
+    ).round({"Prima_neto_USD": 2}).reset_index()
+    resumen_estrategia = df.groupby("Estrategia").agg(
+        Cantidad_trades=("Estrategia", "count"),
+    ).reset_index()
+    for title, summary in (("Resumen_por_ticker", resumen_ticker), ("Resumen_por_estrategia", resumen_estrategia)):
+        ws = _excel_sheet(wb, title, list(summary.columns))
+        for values in summary.itertuples(index=False, name=None):
+            ws.append([v.item() if hasattr(v, "item") else v for v in values])
+
+    wb.save(buf)
+    return buf.getvalue()
 
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df_trades.to_excel(writer, sheet_name="Trades", index=False)
-        # Resumen: Prima_total = suma de Total_USD (débitos ya vienen negativos, netean)
-        resumen_ticker = df_trades.groupby("Ticker").apply(
-            lambda g: pd.Series({
-                "Cantidad_trades": len(g),
-                "Prima_neto_USD": g["Total_USD"].sum(),
-            })
-        ).reset_index()
-        resumen_estrategia = df_trades.groupby("Estrategia").agg(
-            Cantidad_trades=("Estrategia", "count"),
-        ).reset_index()
-        resumen_ticker.to_excel(writer, sheet_name="Resumen_por_ticker", index=False)
-        resumen_estrategia.to_excel(writer, sheet_name="Resumen_por_estrategia", index=False)
-
-    buf.seek(0)
-    wb = openpyxl.load_workbook(buf)
-    thin = Side(style="thin")
-    header_font = Font(bold=True)
-    for sheet_name in wb.sheetnames:
-        ws = wb[sheet_name]
-        ws.freeze_panes = "A2"
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", wrap_text=True)
-        for col in range(1, ws.max_column + 1):
-            ws.column_dimensions[get_column_letter(col)].width = max(12, min(24, len(str(ws.cell(1, col).value or "")) + 2))
-    buf2 = io.BytesIO()
-    wb.save(buf2)
-    return buf2.getvalue()
+
+# PDF: una tabla de tamaño fijo por página (cabecera repetida), dibujada al canvas según llegan las filas.
+# 35 filas × 18 pt + cabecera caben en carta con título en la primera página y márgenes de media pulgada.
+PDF_ROWS_PER_PAGE = 35
+_PDF_HEADER = ["Fecha", "Ticker", "Tipo", "Estrategia", "Cant", "Prima (USD)", "Débito (USD)", "Strike", "Exp", "Estado", "Cierre", "Entrada", "Comentario"]
+_PDF_COL_WIDTHS = [48, 40, 32, 48, 24, 44, 44, 40, 48, 32, 48, 40, 72]
+
+
+def _pdf_amount_cells(r: ReportRecord) -> tuple:
+    """(prima, débito) en total USD: precio × 100 × contratos (misma fórmula; débito resta). '-' si no aplica."""
+    total_usd = r.total_usd
+    if total_usd is None:
+        atype = (r.asset_type or "").strip().upper()
+        qty = int(r.quantity or 0)
+        total_usd = round2(safe_float(r.price) * qty * (100 if atype == "OPTION" else 1))
+    is_recompra = (r.close_type or "").lower() == "buyback" or ((r.entry_type or "").upper() == "CLOSING" and (r.asset_type or "").upper() == "OPTION")
+    prima = str(round2(total_usd)) if not is_recompra and total_usd is not None else "-"
+    debito = str(round2(r.buyback_debit)) if is_recompra and r.buyback_debit is not None else "-"
+    return prima, debito
+
+
+def _pdf_row(r: ReportRecord) -> List[str]:
+    prima_cell, debito_cell = _pdf_amount_cells(r)
+    return [
+        str(r.trade_date)[:10],
+        str(r.ticker),
+        str(r.asset_type),
+        str(r.strategy_type),
+        str(r.quantity),
+        prima_cell,
+        debito_cell,
+        str(round2(r.strike) if r.strike is not None else "-"),
+        str(r.expiration_date or "-")[:10],
+        str(r.status),
+        str(r.closed_date or "-")[:10],
+        str(r.entry_type),
+        " ".join((r.comment or "")[:25].split()),  # una línea: altura de fila fija
+    ]
+
+
+def _chunked(it, size: int) -> Iterator[list]:
+    """Lotes de hasta size elementos de un iterador (sin materializarlo)."""
+    it = iter(it)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 def export_trades_pdf(
@@ -283,74 +468,78 @@ def export_trades_pdf(
     date_from: str,
     date_to: str,
     account_name: str = "",
+    progress: Optional[Callable[[int], None]] = None,
 ) -> bytes:
-    """Exporta bitácora a PDF (rango de fechas flexible). Columnas claras para bitácora exacta."""
+    """
+    Exporta bitácora a PDF (rango de fechas flexible). Columnas claras para bitácora exacta.
+    Paginado por bloques: cada página es una tabla de PDF_ROWS_PER_PAGE filas dibujada directamente al canvas
+    desde iter_trades_for_report, así que memoria y tiempo de maquetación no crecen con el rango.
+    progress(filas_hechas) se llama tras cada página (generación en segundo plano: reports.pdf_jobs).
+    """
     try:
         from reportlab.lib import colors
         from reportlab.lib.pagesizes import letter
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import Table, TableStyle, Paragraph
         from reportlab.lib.styles import getSampleStyleSheet
     except ImportError:
         try:
             from fpdf import FPDF
-            return _pdf_fpdf(account_id, date_from, date_to, account_name)
+            return _pdf_fpdf(account_id, date_from, date_to, account_name, progress)
         except ImportError:
             return b""
 
-    rows = _get_trades_for_report(account_id, date_from, date_to)
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=letter)
+    page_w, page_h = letter
+    margin = 36
     styles = getSampleStyleSheet()
-    story = []
-    story.append(Paragraph("AlphaWheel Pro — Bitácora de Trades", styles["Title"]))
-    story.append(Paragraph(f"Cuenta: {account_name} | Desde: {date_from} | Hasta: {date_to}", styles["Normal"]))
-    story.append(Spacer(1, 12))
-
-    if not rows:
-        story.append(Paragraph("No hay trades en este rango de fechas.", styles["Normal"]))
-    else:
-        # Prima/Débito en total USD: precio × 100 × contratos (misma fórmula; débito resta)
-        data = [["Fecha", "Ticker", "Tipo", "Estrategia", "Cant", "Prima (USD)", "Débito (USD)", "Strike", "Exp", "Estado", "Cierre", "Entrada", "Comentario"]]
-        for r in rows:
-            total_usd = r.get("total_usd")
-            if total_usd is None:
-                atype = (r.get("asset_type") or "").strip().upper()
-                qty = int(r.get("quantity") or 0)
-                total_usd = round2(safe_float(r.get("price")) * qty * (100 if atype == "OPTION" else 1))
-            is_recompra = (r.get("close_type") or "").lower() == "buyback" or ((r.get("entry_type") or "").upper() == "CLOSING" and (r.get("asset_type") or "").upper() == "OPTION")
-            prima_cell = str(round2(total_usd)) if not is_recompra and total_usd is not None else "-"
-            debito_cell = str(round2(r.get("buyback_debit"))) if is_recompra and r.get("buyback_debit") is not None else "-"
-            data.append([
-                str(r.get("trade_date", ""))[:10],
-                str(r.get("ticker", "")),
-                str(r.get("asset_type", "")),
-                str(r.get("strategy_type", "")),
-                str(r.get("quantity", "")),
-                prima_cell,
-                debito_cell,
-                str(round2(r.get("strike")) if r.get("strike") is not None else "-"),
-                str(r.get("expiration_date") or "-")[:10],
-                str(r.get("status", "")),
-                str(r.get("closed_date") or "-")[:10],
-                str(r.get("entry_type", "")),
-                (r.get("comment") or "")[:25],
-            ])
-        t = Table(data, colWidths=[48, 40, 32, 48, 24, 44, 44, 40, 48, 32, 48, 40, 72])
-        t.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-            ("FONTSIZE", (0, 0), (-1, -1), 8),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ]))
-        story.append(t)
-    doc.build(story)
+    table_style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ])
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=letter)
+    c.setTitle("AlphaWheel Pro — Bitácora de Trades")
+
+    def draw(flowable, y: float) -> float:
+        w, h = flowable.wrapOn(c, page_w - 2 * margin, y - margin)
+        flowable.drawOn(c, (page_w - w) / 2 if isinstance(flowable, Table) else margin, y - h)
+        return y - h
+
+    # Cabecera de la primera página
+    y = draw(Paragraph("AlphaWheel Pro — Bitácora de Trades", styles["Title"]), page_h - margin) - styles["Title"].spaceAfter
+    y = draw(Paragraph(f"Cuenta: {account_name} | Desde: {date_from} | Hasta: {date_to}", styles["Normal"]), y) - 12
+
+    page = 0
+    done = 0
+    for chunk in _chunked(iter_trades_for_report(account_id, date_from, date_to), PDF_ROWS_PER_PAGE):
+        if page:
+            c.showPage()
+            y = page_h - margin
+            c.setFont("Helvetica", 8)
+            c.drawString(margin, y - 8, f"AlphaWheel Pro — Bitácora · {account_name} · {date_from} a {date_to}")
+            y -= 18
+        t = Table([_PDF_HEADER] + [_pdf_row(r) for r in chunk], colWidths=_PDF_COL_WIDTHS)
+        t.setStyle(table_style)
+        draw(t, y)
+        page += 1
+        c.setFont("Helvetica", 8)
+        c.drawRightString(page_w - margin, margin / 2, f"Página {page}")
+        done += len(chunk)
+        if progress:
+            progress(done)
+    if not page:
+        draw(Paragraph("No hay trades en este rango de fechas.", styles["Normal"]), y)
+    c.showPage()
+    c.save()
     return buf.getvalue()
 
 
-def _pdf_fpdf(account_id: int, date_from: str, date_to: str, account_name: str) -> bytes:
+def _pdf_fpdf(account_id: int, date_from: str, date_to: str, account_name: str,
+              progress: Optional[Callable[[int], None]] = None) -> bytes:
     from fpdf import FPDF
-    rows = _get_trades_for_report(account_id, date_from, date_to)
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Helvetica", "B", 14)
@@ -358,49 +547,115 @@ def _pdf_fpdf(account_id: int, date_from: str, date_to: str, account_name: str)
     pdf.set_font("Helvetica", "", 10)
     pdf.cell(0, 6, f"Cuenta: {account_name} | {date_from} a {date_to}", ln=True)
     pdf.ln(6)
-    if rows:
+    done = 0
+    # Mismo paginado por bloques que reportlab: PDF_ROWS_PER_PAGE filas por página con la cabecera repetida
+    for chunk in _chunked(iter_trades_for_report(account_id, date_from, date_to), PDF_ROWS_PER_PAGE):
+        if done:
+            pdf.add_page()
         pdf.set_font("Helvetica", "B", 8)
         pdf.cell(20, 6, "Fecha"); pdf.cell(16, 6, "Ticker"); pdf.cell(12, 6, "Tipo"); pdf.cell(12, 6, "Cant"); pdf.cell(18, 6, "Prima USD"); pdf.cell(18, 6, "Debito USD"); pdf.cell(16, 6, "Strike"); pdf.cell(20, 6, "Exp"); pdf.cell(12, 6, "Estado"); pdf.cell(20, 6, "Cierre"); pdf.ln()
         pdf.set_font("Helvetica", "", 7)
-        for r in rows:
-            total_usd = r.get("total_usd")
-            if total_usd is None:
-                atype = (r.get("asset_type") or "").strip().upper()
-                qty = int(r.get("quantity") or 0)
-                total_usd = round2(safe_float(r.get("price")) * qty * (100 if atype == "OPTION" else 1))
-            is_recompra = (r.get("close_type") or "").lower() == "buyback" or ((r.get("entry_type") or "").upper() == "CLOSING" and (r.get("asset_type") or "").upper() == "OPTION")
-            prima_str = str(round2(total_usd)) if not is_recompra else "-"
-            debito_str = str(round2(r.get("buyback_debit"))) if is_recompra and r.get("buyback_debit") is not None else "-"
-            pdf.cell(20, 5, str(r.get("trade_date", ""))[:10]); pdf.cell(16, 5, str(r.get("ticker", ""))); pdf.cell(12, 5, str(r.get("asset_type", ""))); pdf.cell(12, 5, str(r.get("quantity", ""))); pdf.cell(18, 5, prima_str); pdf.cell(18, 5, debito_str); pdf.cell(16, 5, str(round2(r.get("strike")) if r.get("strike") else "-")); pdf.cell(20, 5, str(r.get("expiration_date") or "-")[:10]); pdf.cell(12, 5, str(r.get("status", ""))); pdf.cell(20, 5, str(r.get("closed_date") or "-")[:10]); pdf.ln()
+        for r in chunk:
+            prima_str, debito_str = _pdf_amount_cells(r)
+            pdf.cell(20, 5, str(r.trade_date)[:10]); pdf.cell(16, 5, str(r.ticker)); pdf.cell(12, 5, str(r.asset_type)); pdf.cell(12, 5, str(r.quantity)); pdf.cell(18, 5, prima_str); pdf.cell(18, 5, debito_str); pdf.cell(16, 5, str(round2(r.strike) if r.strike else "-")); pdf.cell(20, 5, str(r.expiration_date or "-")[:10]); pdf.cell(12, 5, str(r.status)); pdf.cell(20, 5, str(r.closed_date or "-")[:10]); pdf.ln()
+        done += len(chunk)
+        if progress:
+            progress(done)
     buf = io.BytesIO()
     pdf.output(buf)
     return buf.getvalue()
 
 
+def _rollup_full_months(date_from: str, date_to: str) -> tuple:
+    """
+    Meses completos del rango para leer de MonthlyRollup: ('YYYY-MM' inicial, 'YYYY-MM' final exclusivo), o (None, None).
+    Un mes es completo si su día 1 es >= date_from y el día 1 del mes siguiente es <= date_to (mismas
+    comparaciones de texto que closed_date >= date_from AND closed_date <= date_to).
+    """
+    try:
+        d0 = datetime.fromisoformat(str(date_from)[:10]).date()
+        d1 = datetime.fromisoformat(str(date_to)[:10]).date()
+    except ValueError:
+        return None, None
+    first = d0.replace(day=1)
+    if first.isoformat() < date_from:
+        first = (first + timedelta(days=32)).replace(day=1)
+    last = d1.replace(day=1)  # exclusivo: el mes de date_to no es completo (el siguiente empieza después)
+    if first >= last:
+        return None, None
+    return first.isoformat()[:7], last.isoformat()[:7]
+
+
+# Comisiones y fees de las campañas con algún trade cerrado en [date_from, date_to], en una consulta: desde esos
+# trades se sube por parent_trade_id (búsquedas por clave primaria, solo padres de la misma cuenta) hasta la raíz
+# (sin padre en la cuenta) y se suma CampaignAdjustment de cada raíz una vez. El trabajo crece con los trades
+# cerrados en el rango y la profundidad de sus cadenas, no con el total de la cuenta. UNION descarta repetidos
+# (cadenas compartidas y ciclos).
+_CAMPAIGN_FEES_IN_RANGE = """
+    WITH RECURSIVE chain (trade_id, parent_trade_id) AS (
+        SELECT trade_id, parent_trade_id FROM Trade
+        WHERE account_id = ? AND status = 'CLOSED' AND closed_date >= ? AND closed_date <= ?
+        UNION
+        SELECT p.trade_id, p.parent_trade_id
+        FROM chain c JOIN Trade p ON p.trade_id = c.parent_trade_id AND p.account_id = ?
+    )
+    SELECT SUM(COALESCE(ca.commissions, 0) + COALESCE(ca.fees, 0)) AS total
+    FROM CampaignAdjustment ca
+    WHERE ca.account_id = ?
+      AND ca.campaign_root_id IN (
+          SELECT c.trade_id FROM chain c
+          WHERE c.parent_trade_id IS NULL OR c.parent_trade_id = 0
+             OR NOT EXISTS (SELECT 1 FROM Trade p WHERE p.trade_id = c.parent_trade_id AND p.account_id = ?)
+      )"""
+
+
 def tax_efficiency_summary(
     account_id: int,
     date_from: str,
     date_to: str,
+    data_version: Optional[int] = None,
 ) -> Dict[str, Any]:
     """
     Resumen Tax Efficiency: ganancias/pérdidas cerradas en el rango.
-    Sin caché para que la web muestre datos actuales.
+    Con data_version se cachea hasta la próxima escritura en la cuenta; sin ella se calcula siempre.
+
+    Número constante de consultas: agregados por (ticker, estrategia) con GROUP BY, capital de la cuenta
+    y comisiones/fees de las campañas con trades cerrados en el rango (una consulta: _CAMPAIGN_FEES_IN_RANGE).
+    Los meses completos del rango salen de MonthlyRollup (unas pocas filas por mes); solo los meses parciales
+    de los extremos se agregan desde Trade.
     """
+    if data_version is not None:
+        return _tax_summary_cached(account_id, date_from, date_to, data_version)
+    full_from, full_to = _rollup_full_months(date_from, date_to)
+    # Extremos leídos de Trade: [date_from, inicio del primer mes completo) y [fin del último, date_to]
+    edge_lo = f"{full_from}-01" if full_from else date_from
+    edge_hi = f"{full_to}-01" if full_to else date_from
     conn = db.get_conn()
     try:
-        # Trades cerrados en el rango. No usar close_type/buyback_debit en SELECT (pueden no existir en BD antigua).
+        # P&L por trade: prima recibida (positivo) o débito recompra (price negativo) × cantidad × multiplicador.
+        # No usar close_type/buyback_debit (pueden no existir en BD antigua). CAST: en PostgreSQL price es REAL (float4);
+        # NUMERIC conserva el valor decimal que ve Python (1.3 y no 1.2999999523).
         cur = conn.execute(
-            """SELECT trade_id, ticker, asset_type, strategy_type, quantity, price, strike,
-                      trade_date, closed_date, entry_type
-               FROM Trade
-               WHERE account_id = ?
-                 AND status = 'CLOSED'
-                 AND closed_date >= ?
-                 AND closed_date <= ?
-               ORDER BY closed_date""",
-            (account_id, date_from, date_to),
+            """SELECT ticker, strategy_type, SUM(n) AS n, SUM(amt) AS amt
+               FROM (
+                   SELECT ticker, strategy_type, closed_count AS n, realized AS amt,
+                          first_closed_date AS first_closed, first_trade_id AS first_id
+                   FROM MonthlyRollup
+                   WHERE account_id = ? AND month >= ? AND month < ?
+                   UNION ALL
+                   SELECT ticker, strategy_type, 1, CAST(price AS NUMERIC) * quantity
+                          * CASE WHEN asset_type = 'OPTION' THEN 100 ELSE 1 END,
+                          closed_date, trade_id
+                   FROM Trade
+                   WHERE account_id = ?
+                     AND status = 'CLOSED'
+                     AND ((closed_date >= ? AND closed_date < ?) OR (closed_date >= ? AND closed_date <= ?))
+               ) u
+               GROUP BY ticker, strategy_type
+               ORDER BY MIN(first_closed), MIN(first_id)""",
+            (account_id, full_from or "", full_to or "", account_id, date_from, edge_lo, edge_hi, date_to),
         )
-        rows = [dict(r) for r in cur.fetchall()]
+        groups = [dict(r) for r in cur.fetchall()]
 
         # Capital de referencia de la cuenta (para ratios)
         cur_acc = conn.execute(
@@ -409,38 +664,36 @@ def tax_efficiency_summary(
         )
         acc_row = cur_acc.fetchone()
         cap_total = float(acc_row["cap_total"]) if acc_row and acc_row["cap_total"] is not None else 0.0
+
+        campaign_fees = 0.0
+        if groups:
+            row = conn.execute(
+                _CAMPAIGN_FEES_IN_RANGE, (account_id, date_from, date_to, account_id, account_id, account_id)
+            ).fetchone()
+            campaign_fees = float(row["total"] or 0.0) if row else 0.0
     finally:
         conn.close()
 
     total_realized = 0.0
+    closed_count = 0
     by_ticker: Dict[str, float] = {}
     by_strategy: Dict[str, float] = {}
     closed_by_strategy: Dict[str, int] = {}
 
-    for r in rows:
-        # P&L por trade: prima recibida (positivo) o débito recompra (negativo). Preferir buyback_debit si está en BD (precisión).
-        mult = 100 if r["asset_type"] == "OPTION" else 1
-        if (r.get("close_type") or "").lower() == "buyback" and r.get("buyback_debit") is not None:
-            amt = -float(r["buyback_debit"])
-        else:
-            amt = float(r["price"]) * int(r["quantity"]) * mult
+    for g in groups:
+        amt = float(g["amt"] or 0.0)
+        n = int(g["n"] or 0)
         total_realized += amt
+        closed_count += n
 
-        tk = r["ticker"]
-        strat = r.get("strategy_type") or "OTHER"
+        tk = g["ticker"]
+        strat = g.get("strategy_type") or "OTHER"
         by_ticker[tk] = by_ticker.get(tk, 0.0) + amt
         by_strategy[strat] = by_strategy.get(strat, 0.0) + amt
-        closed_by_strategy[strat] = closed_by_strategy.get(strat, 0) + 1
+        closed_by_strategy[strat] = closed_by_strategy.get(strat, 0) + n
 
-    # Restar comisiones y fees por campaña (una vez por campaña cerrada en el rango)
-    campaign_roots = set()
-    for r in rows:
-        root_id = get_campaign_root_id(account_id, r["trade_id"])
-        if root_id:
-            campaign_roots.add(root_id)
-    for root_id in campaign_roots:
-        adj = db.get_campaign_adjustment(account_id, root_id)
-        total_realized -= safe_float(adj.get("commissions", 0)) + safe_float(adj.get("fees", 0))
+    # Restar comisiones y fees por campaña (una vez por campaña con algún trade cerrado en el rango)
+    total_realized -= campaign_fees
 
     total_realized = round2(total_realized)
     realized_pct_of_capital = round2((total_realized / cap_total * 100) if cap_total else 0.0)
@@ -456,7 +709,7 @@ def tax_efficiency_summary(
 
     return {
         "total_realized_gain_loss": total_realized,
-        "closed_trades_count": len(rows),
+        "closed_trades_count": closed_count,
         "by_ticker": {k: round2(v) for k, v in by_ticker.items()},
         "by_strategy": {k: round2(v) for k, v in by_strategy.items()},
         "closed_trades_by_strategy": closed_by_strategy,
@@ -0,0 +1,92 @@
+# AlphaWheel Pro - PDF de bitácora en segundo plano para rangos grandes
+# Un pool pequeño de hilos genera export_trades_pdf fuera del rerun de Streamlit; el progreso (filas hechas / total)
+# se lee desde la página y el PDF terminado queda en caché del proceso para descargarlo sin regenerarlo.
+# Clave del artefacto: cuenta, rango, nombre de cuenta y versión de datos de la cuenta (db.get_data_version:
+# cualquier alta, edición o borrado cambia la clave); caduca a los PDF_ARTIFACT_TTL segundos para liberar memoria.
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from reports.bitacora import export_trades_pdf
+
+PDF_BACKGROUND_MIN_ROWS = 5000  # por debajo, en línea (~2 s en SQLite)
+PDF_ARTIFACT_TTL = 120
+_MAX_JOBS = 8
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alphawheel-pdf")
+_lock = threading.Lock()
+_jobs: "OrderedDict[Tuple, PdfJob]" = OrderedDict()
+
+
+class PdfJob:
+    """Generación de un PDF: progreso por filas, resultado (bytes) o error. Lo escribe el hilo de trabajo."""
+
+    def __init__(self, key: Tuple, total: int):
+        self.key = key
+        self.total = total
+        self.done_rows = 0
+        self.result: Optional[bytes] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self.finished_at is None
+
+    @property
+    def fraction(self) -> float:
+        if not self.running:
+            return 1.0
+        return min(1.0, self.done_rows / self.total) if self.total else 0.0
+
+    def _expired(self, now: float) -> bool:
+        return self.finished_at is not None and (self.error is not None or now - self.finished_at > PDF_ARTIFACT_TTL)
+
+    def _run(self, account_id: int, date_from: str, date_to: str, account_name: str) -> None:
+        def progress(done: int) -> None:
+            self.done_rows = done
+
+        try:
+            self.result = export_trades_pdf(account_id, date_from, date_to, account_name, progress=progress)
+        except Exception as e:
+            self.error = str(e) or e.__class__.__name__
+        finally:
+            self.finished_at = time.time()
+
+
+def _job_key(account_id: int, date_from: str, date_to: str, account_name: str, data_version: int) -> Tuple:
+    return (int(account_id), str(date_from)[:10], str(date_to)[:10], account_name or "", int(data_version))
+
+
+def _purge(now: float) -> None:
+    for key in [k for k, job in _jobs.items() if job._expired(now)]:
+        del _jobs[key]
+    while len(_jobs) > _MAX_JOBS:
+        key = next((k for k, job in _jobs.items() if not job.running), None)
+        if key is None:
+            break
+        del _jobs[key]
+
+
+def find_pdf_job(account_id: int, date_from: str, date_to: str, account_name: str, data_version: int) -> Optional[PdfJob]:
+    """Trabajo en curso o PDF terminado (no caducado) para esta cuenta/rango y versión de datos, o None."""
+    key = _job_key(account_id, date_from, date_to, account_name, data_version)
+    with _lock:
+        _purge(time.time())
+        return _jobs.get(key)
+
+
+def start_pdf_job(account_id: int, date_from: str, date_to: str, account_name: str, total: int,
+                  data_version: int) -> PdfJob:
+    """Lanza la generación en segundo plano (o devuelve la que ya existe para la misma clave). total: filas, para el progreso."""
+    key = _job_key(account_id, date_from, date_to, account_name, data_version)
+    with _lock:
+        _purge(time.time())
+        job = _jobs.get(key)
+        if job is None:
+            job = _jobs[key] = PdfJob(key, total)
+            _executor.submit(job._run, account_id, date_from, date_to, account_name)
+        return job
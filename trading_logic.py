@@ -33,4 +33,6 @@ def calculate_dte(exp_date):
         return max(0, (exp - datetime.now()).days)
     except: return 0
 
-init_db()
\ No newline at end of file
+if __name__ == "__main__":
+    # Crear las tablas solo al ejecutarlo como script (importar el módulo ya no crea trading_app.db)
+    init_db()